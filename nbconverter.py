@@ -4,45 +4,130 @@
 
 """Programmatic conversion of notebooks."""
 
-# pylint: disable=invalid-name
+# pylint: disable=invalid-name,broad-except
 
 
+import hashlib
+import json
 import os
-import shlex
-import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from glob import glob
-from typing import List
+from typing import Dict, List
+
+from nbconvert import HTMLExporter
+
+
+def get_file_hash(filepath: str) -> str:
+    """Get SHA-256 hash of file contents."""
+    with open(filepath, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_html_exporter() -> HTMLExporter:
+    """Get HTML exporter, created once per worker process."""
+    return HTMLExporter()
+
+
+def export_notebook_to_html(notebook: str, output_filepath: str) -> str:
+    """Convert single notebook to HTML file, in the current process."""
+    body, _ = get_html_exporter().from_filename(notebook)
+    tmp_filepath = f"{output_filepath}.tmp"
+    with open(tmp_filepath, "w", encoding="utf-8") as f:
+        f.write(body)
+    os.replace(tmp_filepath, output_filepath)
+    return output_filepath
+
+
+def load_conversion_cache(cache_filepath: str) -> Dict:
+    """Load hashes and outputs of previously converted notebooks."""
+    if not os.path.exists(cache_filepath):
+        return {}
+    with open(cache_filepath) as f:
+        return json.load(f)
+
+
+def save_conversion_cache(conversion_cache: Dict, cache_filepath: str) -> None:
+    """Save hashes and outputs of converted notebooks."""
+    with open(cache_filepath, "w") as f:
+        json.dump(conversion_cache, f, indent=1, sort_keys=True)
+
+
+def is_converted(nb: str, nb_hash: str, conversion_cache: Dict) -> bool:
+    """Check if notebook contents are unchanged since last conversion."""
+    nb_record = conversion_cache.get(nb, {})
+    return nb_record.get("sha256") == nb_hash and os.path.exists(
+        nb_record.get("output", "")
+    )
 
 
 def convert_notebooks_to_html(
-    notebooks_list: List, output_notebook_directory: str = "executed_notebooks"
-):
-    """Convert list of notebooks to HTML files."""
-    for nb in notebooks_list:
-        now = datetime.now().strftime("%Y%m%d-%H%M%S")
-        fname = os.path.splitext(nb)[0]
-        run_cmd(
-            "jupyter nbconvert "
-            f"--output-dir='{output_notebook_directory}' "
-            f"--output='{fname}__{now}.ipynb' "
-            f"{fname}.ipynb --to html"
-        )
-
-
-def run_cmd(cmd: str) -> None:
-    """Run a shell command using Python."""
-    print(cmd)
-    process = subprocess.Popen(
-        shlex.split(cmd), shell=False, stdout=subprocess.PIPE
+    notebooks_list: List,
+    output_notebook_directory: str = "executed_notebooks",
+    max_workers: int = None,
+    use_cache: bool = True,
+) -> Dict:
+    """Convert list of notebooks to HTML files, skipping unchanged notebooks.
+
+    Parameters
+    ----------
+    notebooks_list : List
+        paths to notebooks to be converted
+    output_notebook_directory : str
+        directory in which HTML files are saved
+    max_workers : int
+        number of worker processes (defaults to the number of CPU cores)
+    use_cache : bool
+        whether to skip notebooks whose contents are unchanged since they
+        were last converted
+    Notes
+    -----
+    1. Notebooks are converted with the nbconvert Python API, in a pool of
+       worker processes, instead of starting one `jupyter nbconvert` process
+       per notebook.
+    """
+    os.makedirs(output_notebook_directory, exist_ok=True)
+    cache_filepath = os.path.join(
+        output_notebook_directory, ".nbconvert_cache.json"
+    )
+    conversion_cache = (
+        load_conversion_cache(cache_filepath) if use_cache else {}
     )
-    while True:
-        output = process.stdout.readline()
-        if process.poll() is not None:
-            break
-        if output:
-            print(str(output.strip(), "utf-8"))
-    _ = process.poll()
+    status = {}
+    futures = {}
+    nb_hashes = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for nb in notebooks_list:
+            nb_hashes[nb] = get_file_hash(nb)
+            if use_cache and is_converted(nb, nb_hashes[nb], conversion_cache):
+                status[nb] = "skipped"
+                print(f"Skipped unchanged notebook {nb}")
+                continue
+            now = datetime.now().strftime("%Y%m%d-%H%M%S")
+            fname = os.path.basename(os.path.splitext(nb)[0])
+            output_filepath = os.path.join(
+                output_notebook_directory, f"{fname}__{now}.html"
+            )
+            futures[nb] = executor.submit(
+                export_notebook_to_html, nb, output_filepath
+            )
+        for nb, future in futures.items():
+            try:
+                conversion_cache[nb] = {
+                    "sha256": nb_hashes[nb],
+                    "output": future.result(),
+                }
+                status[nb] = "converted"
+                print(f"Converted notebook {nb}")
+            except Exception as e:
+                status[nb] = "failed"
+                conversion_cache.pop(nb, None)
+                print(f"Error converting notebook {nb}: {str(e)}")
+    if use_cache:
+        save_conversion_cache(conversion_cache, cache_filepath)
+    return status
 
 
 if __name__ == "__main__":
@@ -52,6 +137,6 @@ if __name__ == "__main__":
 
     raw_data_path = os.path.join(data_dir, "raw")
 
-    notebook_list = glob("*.ipynb")
+    notebook_list = sorted(glob("*.ipynb"))
 
     convert_notebooks_to_html(notebook_list, output_notebook_dir)
@@ -6,8 +6,13 @@
 
 # pylint: disable=invalid-name
 
+import fnmatch
+import hashlib
+import json
 import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
+from glob import glob
 from typing import Dict, List
 
 import papermill as pm
@@ -24,8 +29,8 @@ ssl_cert_url = (
 
 six_dict_nb_name = "6_merge_searches_listings.ipynb"
 seven_dict_nb_name = "7_eda_v2.ipynb"
-nine_dict_nb_name = "9_download_cloud.ipynb"
-ten_dict_nb_name = "10_selenium_to_db.ipynb"
+nine_dict_nb_name = os.path.join("v1", "9_download_cloud.ipynb")
+ten_dict_nb_name = os.path.join("v1", "10_selenium_to_db.ipynb")
 
 six_dict = dict(proc_data_filename="processed_data.csv")
 seven_dict = dict(proc_data_filename="processed_data.csv")
@@ -46,6 +51,45 @@ ten_dict = dict(
     drop_table=True,
 )
 
+# Inputs and outputs (paths or glob patterns, relative to PROJ_ROOT_DIR) of
+# each notebook, used to determine the order of execution and whether a
+# notebook needs to be re-executed
+notebooks_dag = {
+    nine_dict_nb_name: dict(
+        parameters=nine_dict,
+        inputs=[],
+        outputs=[
+            "data/raw/selenium/*.parquet.gzip",
+            "data/raw/selenium/p*_*.csv",
+            "data/raw/requests/*.parquet.gzip",
+            "data/raw/requests/p*_*.csv",
+        ],
+    ),
+    six_dict_nb_name: dict(
+        parameters=six_dict,
+        inputs=[
+            "data/raw/selenium/*.parquet.gzip",
+            "data/raw/selenium/p*_*.csv",
+            "data/raw/requests/*.parquet.gzip",
+            "data/raw/requests/p*_*.csv",
+        ],
+        outputs=[f"data/processed/{six_dict['proc_data_filename']}"],
+    ),
+    seven_dict_nb_name: dict(
+        parameters=seven_dict,
+        inputs=[f"data/processed/{seven_dict['proc_data_filename']}"],
+        outputs=[],
+    ),
+    ten_dict_nb_name: dict(
+        parameters=ten_dict,
+        inputs=[
+            "data/raw/selenium/*.parquet.gzip",
+            "data/raw/selenium/p*_*.csv",
+        ],
+        outputs=[],
+    ),
+}
+
 
 def papermill_run_notebook(
     nb_dict: Dict, output_notebook_directory: str = "executed_notebooks"
@@ -96,24 +140,189 @@ def run_notebooks(
         )
 
 
+def get_dependencies(dag: Dict) -> Dict:
+    """Get notebooks that each notebook depends on, from inputs/outputs."""
+    dependencies = {}
+    for notebook, nb_spec in dag.items():
+        depends_on = set(nb_spec.get("depends_on", []))
+        for other_notebook, other_nb_spec in dag.items():
+            if other_notebook == notebook:
+                continue
+            # A notebook depends on another if one of its inputs can match
+            # one of the outputs of the other notebook
+            if any(
+                fnmatch.fnmatch(nb_input, nb_output)
+                or fnmatch.fnmatch(nb_output, nb_input)
+                for nb_input in nb_spec.get("inputs", [])
+                for nb_output in other_nb_spec.get("outputs", [])
+            ):
+                depends_on.add(other_notebook)
+        dependencies[notebook] = depends_on
+    return dependencies
+
+
+def get_notebook_hash(notebook: str, nb_spec: Dict, root_dir: str) -> str:
+    """Get hash of notebook source, parameters and input files."""
+    nb_hash = hashlib.sha256()
+    with open(os.path.join(root_dir, notebook), "rb") as f:
+        nb_hash.update(f.read())
+    nb_hash.update(
+        json.dumps(nb_spec.get("parameters", {}), sort_keys=True).encode()
+    )
+    for nb_input in nb_spec.get("inputs", []):
+        for fpath in sorted(glob(os.path.join(root_dir, nb_input))):
+            # size and modification time stand in for file contents, since
+            # inputs can be thousands of raw data files
+            file_stat = os.stat(fpath)
+            nb_hash.update(
+                f"{fpath}|{file_stat.st_size}|{file_stat.st_mtime_ns}".encode()
+            )
+    return nb_hash.hexdigest()
+
+
+def outputs_exist(nb_spec: Dict, root_dir: str) -> bool:
+    """Check that every output of a notebook exists on disk."""
+    return all(
+        glob(os.path.join(root_dir, nb_output))
+        for nb_output in nb_spec.get("outputs", [])
+    )
+
+
+def load_run_cache(cache_filepath: str) -> Dict:
+    """Load hashes of previously executed notebooks."""
+    if not os.path.exists(cache_filepath):
+        return {}
+    with open(cache_filepath) as f:
+        return json.load(f)
+
+
+def save_run_cache(run_cache: Dict, cache_filepath: str) -> None:
+    """Save hashes of executed notebooks."""
+    with open(cache_filepath, "w") as f:
+        json.dump(run_cache, f, indent=1, sort_keys=True)
+
+
+def get_notebook_status(upstream: set, status: Dict) -> str:
+    """Check if notebook is ready to run, given status of its upstream."""
+    if any(status.get(nb) == "failed" for nb in upstream):
+        return "failed"
+    if all(status.get(nb) in ["executed", "skipped"] for nb in upstream):
+        return "ready"
+    return "waiting"
+
+
+def run_notebook_dag(
+    dag: Dict,
+    output_notebook_directory: str = "executed_notebooks",
+    root_dir: str = PROJ_ROOT_DIR,
+    max_workers: int = None,
+    use_cache: bool = True,
+) -> Dict:
+    """Execute a DAG of notebooks concurrently, skipping unchanged notebooks.
+
+    Parameters
+    ----------
+    dag : Dict
+        notebook path (relative to root_dir) mapped to a dict of
+        parameters, inputs, outputs and (optionally) depends_on
+    output_notebook_directory : str
+        directory in which executed notebooks are saved
+    root_dir : str
+        directory relative to which notebooks, inputs and outputs are found
+    max_workers : int
+        maximum number of notebooks to be executed at the same time
+    use_cache : bool
+        whether to skip notebooks whose source, parameters and inputs are
+        unchanged since their last successful execution
+    Usage
+    -----
+    > run_notebook_dag(
+          {
+              "a.ipynb": dict(parameters={}, inputs=[], outputs=["x.csv"]),
+              "b.ipynb": dict(parameters={}, inputs=["x.csv"], outputs=[]),
+          }
+      )
+    Notes
+    -----
+    1. A notebook is only executed after all notebooks it depends on have
+       finished, and is hashed at that point so that it picks up any inputs
+       that were just re-created. Dependents of a failed notebook are not
+       executed.
+    """
+    cache_filepath = os.path.join(
+        output_notebook_directory, ".papermill_cache.json"
+    )
+    run_cache = load_run_cache(cache_filepath) if use_cache else {}
+    dependencies = get_dependencies(dag)
+    status = {}
+    running = {}
+    nb_hashes = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while len(status) < len(dag):
+            # Skipping a notebook can make notebooks listed before it ready,
+            # so notebooks are scanned until a pass changes nothing
+            is_updated = True
+            while is_updated:
+                is_updated = False
+                for notebook in dag:
+                    if notebook in status or notebook in running.values():
+                        continue
+                    nb_status = get_notebook_status(
+                        dependencies[notebook], status
+                    )
+                    if nb_status == "waiting":
+                        continue
+                    if nb_status == "failed":
+                        status[notebook] = "failed"
+                        is_updated = True
+                        print(f"Did not execute {notebook} (upstream failed)")
+                        continue
+                    nb_hashes[notebook] = get_notebook_hash(
+                        notebook, dag[notebook], root_dir
+                    )
+                    if (
+                        use_cache
+                        and run_cache.get(notebook) == nb_hashes[notebook]
+                        and outputs_exist(dag[notebook], root_dir)
+                    ):
+                        status[notebook] = "skipped"
+                        is_updated = True
+                        print(f"Skipped unchanged notebook {notebook}")
+                        continue
+                    future = executor.submit(
+                        papermill_run_notebook,
+                        {
+                            os.path.join(root_dir, notebook): dag[
+                                notebook
+                            ].get("parameters", {})
+                        },
+                        output_notebook_directory,
+                    )
+                    running[future] = notebook
+            if not running:
+                # Notebooks still waiting on each other after a full scan
+                if len(status) < len(dag):
+                    raise ValueError("Found circular dependency in notebooks")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                notebook = running.pop(future)
+                try:
+                    future.result()
+                    status[notebook] = "executed"
+                    run_cache[notebook] = nb_hashes[notebook]
+                    print(f"Executed notebook {notebook}")
+                except Exception as e:
+                    status[notebook] = "failed"
+                    run_cache.pop(notebook, None)
+                    print(f"Error executing notebook {notebook}: {str(e)}")
+                if use_cache:
+                    save_run_cache(run_cache, cache_filepath)
+    return status
+
+
 if __name__ == "__main__":
-    nb_dict_list = [
-        nine_dict,
-        six_dict,
-        seven_dict,
-        ten_dict,
-    ]
-    nb_name_list = [
-        nine_dict_nb_name,
-        six_dict_nb_name,
-        seven_dict_nb_name,
-        ten_dict_nb_name,
-    ]
-    notebook_list = [
-        {os.path.join(PROJ_ROOT_DIR, nb_name): nb_dict}
-        for nb_dict, nb_name in zip(nb_dict_list, nb_name_list)
-    ]
-    run_notebooks(
-        notebooks_list=notebook_list,
+    run_notebook_dag(
+        dag=notebooks_dag,
         output_notebook_directory=output_notebook_dir,
     )
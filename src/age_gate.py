@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Age verification shared by the WebDriver and requests sessions of a worker.
+
+The Steam store does not show its age gate if the birthtime,
+lastagecheckage and mature_content cookies are set. These cookies are
+generated once per worker identity, saved to a JSON file, and added to
+every WebDriver and requests session of that worker, so that gated
+listings are loaded without entering a date of birth.
+
+Usage
+-----
+> cookies = load_age_check_cookies("data/raw/age_check_cookies.json")
+> add_cookies_to_session(session, cookies)
+> driver.get("https://store.steampowered.com")
+> add_cookies_to_driver(driver, cookies)
+"""
+
+
+# pylint: disable=invalid-name,broad-except
+
+
+import datetime
+import json
+import os
+
+from src.requests_scrapers import random_human_readable_timestamp_to_unix
+
+# Domain for which age-check cookies are set in the browser
+STORE_DOMAIN = "store.steampowered.com"
+
+# Class of the element holding the date of birth selectors of an age gate
+AGE_GATE_CLASS = "agegate_birthday_selector"
+
+
+def get_age_check_cookies(birthtime=None):
+    """Get cookies with which age gates are not shown (random birth date)."""
+    birthtime = birthtime or random_human_readable_timestamp_to_unix()
+    birth_date = datetime.datetime.fromtimestamp(birthtime)
+    return {
+        "birthtime": str(birthtime),
+        # day-month-year, with months numbered from 0
+        "lastagecheckage": (
+            f"{birth_date.day}-{birth_date.month - 1}-{birth_date.year}"
+        ),
+        "mature_content": "1",
+    }
+
+
+def load_age_check_cookies(state_filepath=None, identity="default"):
+    """
+    Get age-check cookies of a worker identity, creating them only once.
+
+    Parameters
+    ----------
+    state_filepath : str
+        (Optional) JSON file with the cookies of each identity, shared by
+        all workers (if not specified, new cookies are created)
+    identity : str
+        Name of worker identity (eg. one per user agent or proxy)
+    """
+    state = {}
+    if state_filepath and os.path.exists(state_filepath):
+        with open(state_filepath) as f:
+            state = json.load(f)
+    if identity not in state:
+        state[identity] = get_age_check_cookies()
+        if state_filepath:
+            os.makedirs(
+                os.path.dirname(os.path.abspath(state_filepath)), exist_ok=True
+            )
+            tmp_filepath = f"{state_filepath}.tmp"
+            with open(tmp_filepath, "w") as f:
+                json.dump(state, f, indent=1)
+            os.replace(tmp_filepath, state_filepath)
+    return state[identity]
+
+
+def add_cookies_to_session(session, cookies, domain=None):
+    """Add cookies to requests session (for all domains if not specified)."""
+    for name, value in cookies.items():
+        session.cookies.set(name, value, domain=domain or "", path="/")
+    return session
+
+
+def add_cookies_to_driver(driver, cookies, domain=STORE_DOMAIN):
+    """Add cookies to browser.
+
+    A page of the cookie domain must be loaded, and cookies apply from the
+    next page loaded.
+    """
+    for name, value in cookies.items():
+        cookie = {"name": name, "value": value, "path": "/"}
+        if domain:
+            cookie["domain"] = domain
+        driver.add_cookie(cookie)
+    return driver
+
+
+def is_age_gate_html(page_source):
+    """Check if page (HTML string or bytes) is an age gate."""
+    if isinstance(page_source, bytes):
+        return AGE_GATE_CLASS.encode() in page_source
+    return AGE_GATE_CLASS in page_source
+
+
+def is_age_gate_page(driver):
+    """Check if page loaded in browser is an age gate (single lookup)."""
+    return bool(driver.find_elements_by_class_name(AGE_GATE_CLASS))
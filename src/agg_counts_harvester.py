@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Concurrent HTTP harvester of aggregated listing counts by search filter.
+
+Each filter (eg. OS = Windows) is expressed as search query parameters
+(eg. os=win) and the filtered search page is fetched with requests, instead
+of clicking on the filter in a browser.
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from random import choice, uniform
+
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+
+from src.webscraping_utils import get_custom_headers_list
+
+SEARCH_URL = "https://store.steampowered.com/search/"
+
+SEARCH_RESULTS_URL = "https://store.steampowered.com/search/results/"
+
+# Query parameters applied to every search (only show games)
+BASE_PARAMS = {"category1": "998"}
+
+# CSS selector of the search page section holding each type of filter
+FILTER_SECTIONS = {
+    "OS": 'div[data-collapse-name="os"]',
+    "Language": "div#narrow_language",
+    "number of players": 'div[data-collapse-name="category3"]',
+    "feature": 'div[data-collapse-name="category2"]',
+    "tag": 'div[data-collapse-name="tags"]',
+    "VR Support": 'div[data-collapse-name="vrsupport"]',
+}
+
+thread_local = threading.local()
+
+
+def get_session():
+    """Get requests session of the current thread (one per thread)."""
+    if not hasattr(thread_local, "session"):
+        thread_local.session = requests.Session()
+    return thread_local.session
+
+
+def get_search_page(params, headers_list, timeout=30):
+    """Get search page filtered by query parameters, as soup."""
+    response = get_session().get(
+        SEARCH_URL,
+        params={**BASE_PARAMS, **params},
+        headers=choice(headers_list),
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    return BeautifulSoup(response.content, "html.parser")
+
+
+def get_total_count(params, headers_list, timeout=30):
+    """Get number of search results from the JSON search results endpoint."""
+    response = get_session().get(
+        SEARCH_RESULTS_URL,
+        params={
+            **BASE_PARAMS,
+            **params,
+            "start": 0,
+            "count": 1,
+            "infinite": 1,
+        },
+        headers=choice(headers_list),
+        timeout=timeout,
+    )
+    response.raise_for_status()
+    return int(response.json()["total_count"])
+
+
+def get_count_from_str(count_str):
+    """Convert count with thousands separators (eg. 38,213) to int."""
+    count = re.sub(r"[^\d]", "", count_str or "")
+    return int(count) if count else 0
+
+
+def get_filter_rows(soup, filter_type):
+    """Get label, query parameter, value and count of filters in a section."""
+    section = soup.select_one(FILTER_SECTIONS[filter_type])
+    if section is None:
+        return []
+    rows = []
+    for row in section.select("div.tab_filter_control_row[data-param]"):
+        count = row.select_one("span.tab_filter_control_count")
+        rows.append(
+            {
+                "label": row.get("data-loc", "").strip(),
+                "param": row["data-param"],
+                "value": row["data-value"],
+                "count": get_count_from_str(count.text if count else ""),
+            }
+        )
+    return rows
+
+
+def get_tag_counts(soup, num_tags=16):
+    """Get number of listings by tag, for the top num_tags tags."""
+    return {
+        row["label"]: row["count"]
+        for row in get_filter_rows(soup, "tag")[:num_tags]
+    }
+
+
+def get_num_listings_text(soup):
+    """Get text stating the number of filtered search results (if shown)."""
+    for selector in [
+        "div.search_results_filtered_warning div",
+        "div.search_results_count",
+    ]:
+        element = soup.select_one(selector)
+        if element and element.text.strip():
+            return " ".join(element.text.split())
+    return None
+
+
+def get_filters(soup, filter_type, indexes=None):
+    """Get search filters of single type, from the (unfiltered) search page.
+
+    Returns list of dicts with filter_type, filtered_by (filter label) and
+    params (query parameters applying the filter).
+    """
+    rows = get_filter_rows(soup, filter_type)
+    if indexes is not None:
+        rows = [rows[k] for k in indexes if k < len(rows)]
+    return [
+        {
+            "filter_type": filter_type,
+            "filtered_by": row["label"],
+            "params": {row["param"]: row["value"]},
+        }
+        for row in rows
+    ]
+
+
+def get_price_filters(price_filters, filter_type="Price"):
+    """Get search filters by maximum price.
+
+    Parameters
+    ----------
+    price_filters : Dict
+        Label of each price filter (eg. position of the price slider)
+        mapped to the maxprice query value (eg. "free", 5, or None for any
+        price)
+    """
+    return [
+        {
+            "filter_type": filter_type,
+            "filtered_by": filtered_by,
+            "params": {} if maxprice is None else {"maxprice": maxprice},
+        }
+        for filtered_by, maxprice in price_filters.items()
+    ]
+
+
+def get_counts_for_filter(
+    search_filter, headers_list, num_tags=16, min_pause=0, max_pause=0
+):
+    """Get number of listings (overall and by tag) for single filter."""
+    time.sleep(uniform(min_pause, max_pause))
+    soup = get_search_page(search_filter["params"], headers_list)
+    num_listings = get_num_listings_text(soup)
+    if num_listings is None:
+        num_listings = (
+            f"{get_total_count(search_filter['params'], headers_list):,} "
+            "results match your search."
+        )
+    return [get_tag_counts(soup, num_tags), num_listings]
+
+
+def harvest_aggregated_counts(
+    search_filters,
+    max_workers=8,
+    num_tags=16,
+    min_pause=0.5,
+    max_pause=1.5,
+    count_tags_filter_types=None,
+):
+    """
+    Get number of listings overall and by tag, for many search filters.
+
+    Parameters
+    ----------
+    search_filters : List
+        Filters (see get_filters and get_price_filters)
+    max_workers : int
+        Number of filtered search pages fetched at the same time
+    num_tags : int
+        Number of (most popular) tags for which counts are retrieved
+    min_pause, max_pause : float
+        Range of random pause before each request, in seconds
+    count_tags_filter_types : List
+        (Optional) Filter types for which counts by tag are kept (defaults
+        to all filter types, except tag)
+
+    Usage
+    -----
+    > soup = get_search_page({}, get_custom_headers_list())
+    > search_filters = get_filters(soup, "OS") + get_price_filters({72: None})
+    > df_tag_counts, df_listings = harvest_aggregated_counts(search_filters)
+
+    Notes
+    -----
+    1. Outputs have the same columns as the tag counts (tag, num_listings,
+       filtered_by, filter_type) and listings (filtered_by, filter_type,
+       num_listings) scraped by clicking on filters with Selenium.
+    """
+    headers_list = get_custom_headers_list()
+    if count_tags_filter_types is None:
+        count_tags_filter_types = {
+            f["filter_type"] for f in search_filters
+        } - {"tag"}
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                get_counts_for_filter,
+                search_filter,
+                headers_list,
+                num_tags,
+                min_pause,
+                max_pause,
+            )
+            for search_filter in search_filters
+        ]
+        tag_counts, listings_counts = [], []
+        for search_filter, future in zip(search_filters, futures):
+            filter_info = {
+                "filtered_by": search_filter["filtered_by"],
+                "filter_type": search_filter["filter_type"],
+            }
+            try:
+                tags_by_filter, num_listings = future.result()
+            except Exception as e:
+                print(f"Could not get counts for {filter_info}. Got {str(e)}")
+                continue
+            print(
+                f"After filtering by {filter_info['filtered_by']}, "
+                f"{num_listings}"
+            )
+            listings_counts.append(
+                {**filter_info, "num_listings": num_listings}
+            )
+            if search_filter["filter_type"] in count_tags_filter_types:
+                tag_counts.extend(
+                    {"tag": tag, "num_listings": count, **filter_info}
+                    for tag, count in tags_by_filter.items()
+                )
+    duration = time.time() - start_time
+    print(
+        f"Got counts for {len(listings_counts):,} of {len(search_filters):,} "
+        f"filters in {duration:.3f} sec."
+    )
+    df_tag_counts = pd.DataFrame.from_records(
+        tag_counts,
+        columns=["tag", "num_listings", "filtered_by", "filter_type"],
+    )
+    df_listings = pd.DataFrame.from_records(
+        listings_counts, columns=["filtered_by", "filter_type", "num_listings"]
+    )
+    return [df_tag_counts, df_listings]
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Discovery of listing URLs from Steam's app list and store sitemaps.
+
+Instead of paging through search results (25 listings per request), the
+full catalog is discovered with a few bulk requests: the public app-list
+JSON (one request) and the store sitemaps listed in robots.txt. Both are
+parsed as they are streamed, so the whole file is never held in memory.
+Apps that are already known (eg. from earlier crawls) are dropped, and the
+remaining apps form the crawl frontier, with the last-modified date of
+the listing when the sitemap gives one.
+
+Usage
+-----
+> with requests.Session() as session:
+      df_frontier = discover_apps(session, known_app_ids=[10, 20])
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import codecs
+import gzip
+import json
+import re
+import xml.etree.ElementTree as ET
+from glob import glob
+
+import pandas as pd
+
+STORE_URL = "https://store.steampowered.com"
+
+APP_LIST_URL = "https://api.steampowered.com/ISteamApps/GetAppList/v2/"
+
+ROBOTS_URL = f"{STORE_URL}/robots.txt"
+
+APP_URL_PATTERN = re.compile(r"/app/(\d+)")
+
+FRONTIER_COLUMNS = ["app_id", "url", "name", "lastmod", "source"]
+
+
+def get_app_id(url):
+    """Get app id from listing URL (None if not a listing URL)."""
+    match = APP_URL_PATTERN.search(url or "")
+    return int(match.group(1)) if match else None
+
+
+def get_listing_url(app_id, store_url=STORE_URL):
+    """Get URL of listing page of app."""
+    return f"{store_url}/app/{app_id}/"
+
+
+def iter_text(chunks, encoding="utf-8"):
+    """Decode chunks of bytes (or str) into chunks of text."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
+
+
+def iter_json_array_items(chunks, key):
+    """
+    Stream items of the first JSON array named key, from chunks of text.
+
+    Notes
+    -----
+    1. Items are decoded one at a time, as soon as they are complete, so
+       only the current (incomplete) item is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    marker = f'"{key}"'
+    buffer, in_array = "", False
+    for chunk in chunks:
+        buffer += chunk
+        if not in_array:
+            marker_start = buffer.find(marker)
+            array_start = buffer.find("[", max(marker_start, 0))
+            if marker_start == -1 or array_start == -1:
+                continue
+            array_start += 1
+            buffer, in_array = buffer[array_start:], True
+        while True:
+            buffer = buffer.lstrip(" \t\r\n,")
+            if buffer.startswith("]"):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Item is incomplete, wait for next chunk
+                break
+            yield item
+            buffer = buffer[end:]
+
+
+def iter_app_list(chunks):
+    """Stream app id and name of each app in app-list JSON."""
+    for app in iter_json_array_items(iter_text(chunks), "apps"):
+        yield {"app_id": int(app["appid"]), "name": app.get("name")}
+
+
+def get_app_list(session, url=APP_LIST_URL, timeout=60):
+    """Stream apps of the public app-list JSON (a single request)."""
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        yield from iter_app_list(response.iter_content(chunk_size=65536))
+
+
+def iter_sitemap_entries(f):
+    """
+    Stream entries (url or child sitemap) of sitemap XML file.
+
+    Notes
+    -----
+    1. Returns dicts with the kind of entry (url or sitemap), its location
+       (loc) and last-modified date (lastmod, if any).
+    2. Each entry is cleared once parsed, to keep memory constant.
+    """
+    for _, element in ET.iterparse(f, events=("end",)):
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag not in ["url", "sitemap"]:
+            continue
+        entry = {"kind": tag, "loc": None, "lastmod": None}
+        for child in element:
+            child_tag = child.tag.rsplit("}", 1)[-1]
+            if child_tag in ["loc", "lastmod"]:
+                entry[child_tag] = (child.text or "").strip() or None
+        element.clear()
+        yield entry
+
+
+def get_sitemap_urls(session, robots_url=ROBOTS_URL, timeout=30):
+    """Get URLs of sitemaps listed in robots.txt."""
+    response = session.get(robots_url, timeout=timeout)
+    response.raise_for_status()
+    return [
+        line.split(":", 1)[1].strip()
+        for line in response.text.splitlines()
+        if line.lower().startswith("sitemap:")
+    ]
+
+
+def open_sitemap(session, url, timeout=60):
+    """Open sitemap (possibly gzipped) as a stream."""
+    response = session.get(url, stream=True, timeout=timeout)
+    response.raise_for_status()
+    response.raw.decode_content = True
+    if url.endswith(".gz"):
+        return gzip.GzipFile(fileobj=response.raw)
+    return response.raw
+
+
+def get_sitemap_apps(session, sitemap_urls, max_sitemaps=None):
+    """
+    Stream apps found in sitemaps, following sitemap indexes.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Session used for requests
+    sitemap_urls : List
+        URLs of sitemaps or sitemap indexes (see get_sitemap_urls)
+    max_sitemaps : int
+        (Optional) Maximum number of sitemaps requested
+    """
+    queue, num_requests = list(sitemap_urls), 0
+    while queue and (max_sitemaps is None or num_requests < max_sitemaps):
+        sitemap_url = queue.pop(0)
+        num_requests += 1
+        try:
+            f = open_sitemap(session, sitemap_url)
+            for entry in iter_sitemap_entries(f):
+                if entry["kind"] == "sitemap":
+                    queue.append(entry["loc"])
+                    continue
+                app_id = get_app_id(entry["loc"])
+                if app_id is not None:
+                    yield {
+                        "app_id": app_id,
+                        "url": entry["loc"],
+                        "lastmod": entry["lastmod"],
+                    }
+        except Exception as e:
+            print(f"Could not get sitemap {sitemap_url}. Got {str(e)}")
+
+
+def get_known_app_ids(raw_data_dir):
+    """Get ids of apps found in exported search results and listings."""
+    urls = []
+    for filepath in glob(f"{raw_data_dir}/search_results_page_*.parquet*"):
+        urls += pd.read_parquet(filepath, columns=["url"])["url"].tolist()
+    for filepath in glob(f"{raw_data_dir}/p*_l*_*.csv"):
+        try:
+            urls += pd.read_csv(filepath, usecols=["url"])["url"].tolist()
+        except ValueError:
+            # Listings scraped with selenium have no url column
+            continue
+    return {get_app_id(url) for url in urls if isinstance(url, str)} - {None}
+
+
+def discover_apps(
+    session,
+    sources=("app_list", "sitemaps"),
+    known_app_ids=(),
+    store_url=STORE_URL,
+    max_sitemaps=None,
+    app_list_url=APP_LIST_URL,
+    robots_url=ROBOTS_URL,
+):
+    """
+    Get crawl frontier of apps not already known, from bulk sources.
+
+    Parameters
+    ----------
+    session : requests.Session
+        Session used for requests
+    sources : List
+        Sources of apps (app_list and/or sitemaps)
+    known_app_ids : List
+        Ids of apps already known (eg. see get_known_app_ids)
+    store_url : str
+        Host of listing URLs of apps only found in the app list
+    max_sitemaps : int
+        (Optional) Maximum number of sitemaps requested
+    app_list_url, robots_url : str
+        URLs of app-list JSON and of robots.txt listing the sitemaps
+
+    Notes
+    -----
+    1. Returns a DataFrame with one row per new app (app_id, url, name,
+       lastmod, source), most recently modified first.
+    2. Apps in both sources get the name from the app list, and the URL
+       and last-modified date from the sitemap.
+    """
+    known_app_ids = set(known_app_ids)
+    apps = {}
+    if "app_list" in sources:
+        for app in get_app_list(session, app_list_url):
+            if app["app_id"] not in known_app_ids:
+                apps[app["app_id"]] = dict(
+                    app,
+                    url=get_listing_url(app["app_id"], store_url),
+                    lastmod=None,
+                    source="app_list",
+                )
+    if "sitemaps" in sources:
+        sitemap_urls = get_sitemap_urls(session, robots_url)
+        for app in get_sitemap_apps(session, sitemap_urls, max_sitemaps):
+            if app["app_id"] in known_app_ids:
+                continue
+            previous = apps.get(app["app_id"], {"name": None})
+            apps[app["app_id"]] = dict(
+                app,
+                name=previous["name"],
+                source="sitemaps",
+            )
+    df = pd.DataFrame.from_records(
+        list(apps.values()), columns=FRONTIER_COLUMNS
+    )
+    return (
+        df.assign(lastmod=pd.to_datetime(df["lastmod"], errors="coerce"))
+        .sort_values(
+            by=["lastmod", "app_id"],
+            ascending=[False, True],
+            na_position="last",
+        )
+        .reset_index(drop=True)
+    )
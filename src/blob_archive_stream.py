@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Stream members of zipped archives in Azure blob storage, without unzipping.
+
+Combined archives (combo_batched_*.zip) hold batched archives
+(batched_*.zip), which in turn hold the raw search results (.parquet.gzip)
+or listings (.csv) files.
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import fnmatch
+import io
+import os
+from collections import OrderedDict
+from zipfile import ZipFile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from azure.storage.blob import BlobServiceClient
+
+import src.bulk_listings_reader as blr
+import src.streaming_merge as sm
+
+MB = 1024 * 1024
+
+
+class BlobRangeReader(io.RawIOBase):
+    """Seekable, read-only file object over a blob, using ranged downloads.
+
+    Blocks of block_size bytes are downloaded on demand and the most recent
+    max_blocks blocks are kept in memory, so that the many small reads made
+    by ZipFile do not each send a request.
+    """
+
+    def __init__(self, blob_client, block_size=4 * MB, max_blocks=8):
+        self.blob_client = blob_client
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.size = blob_client.get_blob_properties().size
+        self.position = 0
+        self.blocks = OrderedDict()
+        self.num_bytes_downloaded = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        return self.position
+
+    def get_block(self, block_num):
+        """Get single block of blob, downloading it if not cached."""
+        if block_num in self.blocks:
+            self.blocks.move_to_end(block_num)
+            return self.blocks[block_num]
+        offset = block_num * self.block_size
+        length = min(self.block_size, self.size - offset)
+        block = self.blob_client.download_blob(
+            offset=offset, length=length
+        ).readall()
+        self.num_bytes_downloaded += len(block)
+        self.blocks[block_num] = block
+        if len(self.blocks) > self.max_blocks:
+            self.blocks.popitem(last=False)
+        return block
+
+    def readinto(self, b):
+        num_bytes = min(len(b), max(self.size - self.position, 0))
+        num_read = 0
+        while num_read < num_bytes:
+            block_num, block_offset = divmod(self.position, self.block_size)
+            block = self.get_block(block_num)
+            chunk_end = block_offset + num_bytes - num_read
+            chunk = block[block_offset:chunk_end]
+            next_num_read = num_read + len(chunk)
+            b[num_read:next_num_read] = chunk
+            self.position += len(chunk)
+            num_read = next_num_read
+        return num_read
+
+
+def get_blob_client(conn_str, az_container_name, az_blob_name):
+    """Get client for a single blob (eg. Azurite connection string)."""
+    blob_service_client = BlobServiceClient.from_connection_string(
+        conn_str=conn_str
+    )
+    return blob_service_client.get_blob_client(
+        container=az_container_name, blob=az_blob_name
+    )
+
+
+def iter_archive_members(zip_file, search_str=None):
+    """Yield name and contents of every file in archive and nested archives.
+
+    Nested archives are read into memory one at a time.
+    """
+    for member in zip_file.infolist():
+        if member.is_dir():
+            continue
+        if member.filename.endswith(".zip"):
+            with ZipFile(io.BytesIO(zip_file.read(member))) as nested_zip:
+                yield from iter_archive_members(nested_zip, search_str)
+            continue
+        filename = os.path.basename(member.filename)
+        if search_str and not fnmatch.fnmatch(filename, search_str):
+            continue
+        yield [filename, zip_file.read(member)]
+
+
+def extract_blob_archive_members(
+    blob_client, data_dir, search_str=None, block_size=4 * MB
+):
+    """
+    Extract files from (nested) zipped archive in blob storage to disk.
+
+    Parameters
+    ----------
+    blob_client : azure.storage.blob.BlobClient
+        Client for the combined archive blob
+    data_dir : str
+        Directory to which extracted files are written
+    search_str : str
+        (Optional) Glob pattern of names of files to be extracted
+    block_size : int
+        Size of each ranged download
+
+    Notes
+    -----
+    1. Only the final files are written to disk. Neither the combined nor
+       the batched archives are downloaded to disk.
+    2. Files that already exist in data_dir are not overwritten.
+    """
+    extracted_files = []
+    with BlobRangeReader(blob_client, block_size) as f, ZipFile(f) as zip_file:
+        for filename, contents in iter_archive_members(zip_file, search_str):
+            filepath = os.path.join(data_dir, filename)
+            if os.path.exists(filepath):
+                continue
+            with open(filepath, "wb") as f_out:
+                f_out.write(contents)
+            extracted_files.append(filepath)
+        num_mb_downloaded = f.num_bytes_downloaded / MB
+    print(
+        f"Extracted {len(extracted_files):,} files to {data_dir} "
+        f"(downloaded {num_mb_downloaded:.2f} MB)"
+    )
+    return extracted_files
+
+
+def read_search_results_member(filename, contents):
+    """Read search results file from archive into DataFrame."""
+    return pd.read_parquet(io.BytesIO(contents)).assign(filename=filename)
+
+
+def read_listing_member(filename, contents, schema):
+    """Read listing CSV file from archive into Arrow table."""
+    table = blr.read_single_listing_csv(
+        io.BytesIO(contents), schema, source_file=filename
+    )
+    return table.rename_columns(schema.names + ["filename"])
+
+
+def stream_blob_archive_to_parquet(
+    blob_client,
+    output_filepath,
+    file_type,
+    block_size=4 * MB,
+    max_rows_per_row_group=50_000,
+):
+    """
+    Combine files in (nested) zipped archive in blob storage into parquet.
+
+    Parameters
+    ----------
+    blob_client : azure.storage.blob.BlobClient
+        Client for the combined archive blob
+    output_filepath : str
+        Path to combined parquet file
+    file_type : str
+        Type of files in archive (listings or search_results)
+    block_size : int
+        Size of each ranged download
+    max_rows_per_row_group : int
+        Number of rows buffered before being written to the output file
+
+    Usage
+    -----
+    > blob_client = get_blob_client(conn_str, "mycontainer", "myblob80")
+    > stream_blob_archive_to_parquet(
+          blob_client, "data/processed/listings.parquet.gzip", "listings"
+      )
+
+    Notes
+    -----
+    1. Archive members are read straight from ranged downloads of the blob
+       and appended to the output file, so no archives or intermediate
+       files are written to disk.
+    2. A filename column, holding the name of each file in the archive, is
+       appended to the output.
+    3. Files are converted to a fixed schema (see
+       src.bulk_listings_reader.get_listings_schema and
+       src.streaming_merge.get_search_results_schema), so the schema of the
+       output does not depend on the order of files in the archive.
+    4. Returns the path to the output file and the number of files in the
+       archive that could not be read (and were skipped).
+    """
+    if file_type == "listings":
+        search_str = "p*_l*_*.csv"
+        member_schema = blr.get_listings_schema()
+    else:
+        search_str = "search_results_*.parquet.gzip"
+        member_schema = sm.get_search_results_schema()
+    schema = member_schema.append(pa.field("filename", pa.string()))
+    tmp_filepath = f"{output_filepath}.tmp"
+    writer = None
+    tables, num_rows_buffered = [], 0
+    num_files, num_rows, num_errors = 0, 0, 0
+    with BlobRangeReader(blob_client, block_size) as f, ZipFile(f) as zip_file:
+        for filename, contents in iter_archive_members(zip_file, search_str):
+            try:
+                if file_type == "listings":
+                    table = read_listing_member(
+                        filename, contents, member_schema
+                    )
+                else:
+                    df = read_search_results_member(filename, contents)
+                    table = sm.conform_to_schema(df, schema)
+            except Exception as e:
+                num_errors += 1
+                print(f"Skipped {filename}. Got {str(e)}")
+                continue
+            tables.append(table)
+            num_rows_buffered += table.num_rows
+            num_files += 1
+            if num_rows_buffered >= max_rows_per_row_group:
+                writer = writer or pq.ParquetWriter(tmp_filepath, schema)
+                writer.write_table(pa.concat_tables(tables))
+                num_rows += num_rows_buffered
+                tables, num_rows_buffered = [], 0
+        num_mb_downloaded = f.num_bytes_downloaded / MB
+    writer = writer or pq.ParquetWriter(tmp_filepath, schema)
+    if tables:
+        writer.write_table(pa.concat_tables(tables))
+        num_rows += num_rows_buffered
+    writer.close()
+    os.replace(tmp_filepath, output_filepath)
+    print(
+        f"Combined {num_rows:,} rows from {num_files:,} {file_type} files "
+        f"into {os.path.basename(output_filepath)} (downloaded "
+        f"{num_mb_downloaded:.2f} MB, skipped {num_errors:,} files)"
+    )
+    return [output_filepath, num_errors]
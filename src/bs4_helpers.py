@@ -9,12 +9,38 @@
 
 
 import os
+from io import StringIO
 
 import numpy as np
 import pandas as pd
 
 from src.utils import regex_get_num_from_str
 
+# Fields of the release details block of a listing page
+RELEASE_SUMMARY_FIELDS = [
+    "Title",
+    "Genre",
+    "Release Date",
+    "Early Access Release Date",
+    "Developer",
+    "Publisher",
+    "Franchise",
+]
+
+# Values returned by extractors when an attribute is not found
+MISSING_VALUE_SENTINELS = ["Unknown", ""]
+
+# Attributes found on every listing page (others, such as reviews, franchise
+# or rating, are legitimately missing from many listings)
+REQUIRED_LISTING_FIELDS = [
+    "Title",
+    "Release Date",
+    "Developer",
+    "Publisher",
+    "platforms",
+    "languages",
+]
+
 
 def get_price_from_listings_page(soup):
     """Get listing price from search results page."""
@@ -41,6 +67,38 @@ def get_price_from_listings_page(soup):
     return [price, sale]
 
 
+def get_price_from_listing_page(soup):
+    """Get original price, discount price and discount from listing page.
+
+    Prices are in the same fields as in search results (discount price and
+    discount are None if the listing is not on sale).
+    """
+    prices = dict.fromkeys(
+        ["original_price", "discount_price", "discount_pct"]
+    )
+    try:
+        purchase_div = soup.find("div", class_="game_area_purchase_game")
+        discount_div = purchase_div.find("div", class_="discount_block")
+        if discount_div is not None and discount_div.find(
+            "div", class_="discount_pct"
+        ):
+            for field, class_name in [
+                ["discount_pct", "discount_pct"],
+                ["original_price", "discount_original_price"],
+                ["discount_price", "discount_final_price"],
+            ]:
+                prices[field] = discount_div.find(
+                    "div", class_=class_name
+                ).text.strip()
+        else:
+            prices["original_price"] = purchase_div.find(
+                "div", class_="game_purchase_price"
+            ).text.strip()
+    except Exception:
+        pass
+    return prices
+
+
 def get_overall_review_rating(soup):
     """Get rating for listing from listing page."""
     try:
@@ -133,22 +191,14 @@ def get_all_reviews_count(soup):
 
 def get_release_summary_details(soup, listing_info):
     """Get essential release information from listing page."""
-    for field in [
-        "Title",
-        "Genre",
-        "Release Date",
-        "Early Access Release Date",
-        "Developer",
-        "Publisher",
-        "Franchise",
-    ]:
-        block_text = (
-            soup.find("div", {"class": "details_block"})
-            .text.strip()
-            .replace(":\n", ": ")
-            .replace("\n\n", "\n")
-            .replace("\n\n", "\n")
-        )
+    block_text = (
+        soup.find("div", {"class": "details_block"})
+        .text.strip()
+        .replace(":\n", ": ")
+        .replace("\n\n", "\n")
+        .replace("\n\n", "\n")
+    )
+    for field in RELEASE_SUMMARY_FIELDS:
         block_text_value = block_text.partition(f"{field}: ")[-1]
         field_val = (
             np.nan if not block_text_value else block_text_value.split("\n")[0]
@@ -160,7 +210,7 @@ def get_release_summary_details(soup, listing_info):
 def get_languages(soup, listing_info):
     """Get languages supported by listing from listing page."""
     df_lang = pd.read_html(
-        str(soup.find("div", {"id": "languageTable"}).find("table")),
+        StringIO(str(soup.find("div", {"id": "languageTable"}).find("table"))),
         displayed_only=False,
     )[0]
     langs_str = ", ".join(df_lang["Unnamed: 0"].tolist())
@@ -309,39 +359,135 @@ def get_drm(soup):
     return eula_str
 
 
+def is_missing_value(value):
+    """Check if attribute value is missing (None, NaN or a sentinel)."""
+    if isinstance(value, str):
+        return value.strip() in MISSING_VALUE_SENTINELS
+    try:
+        return value is None or bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def extract_fields(
+    soup, listing_info, failed_fields, missing_fields, fields, extractor
+):
+    """
+    Add attributes returned by a single extractor to listing attributes.
+
+    Parameters
+    ----------
+    soup : bs4.BeautifulSoup
+        Listing page
+    listing_info : Dict
+        Listing attributes, updated in-place
+    failed_fields : List
+        Names of attributes whose extractor raised an error, or of required
+        attributes that are missing, updated in-place
+    missing_fields : List
+        Names of optional attributes that are missing from the page,
+        updated in-place
+    fields : List
+        Names of attributes returned by extractor, in the order returned
+    extractor : Callable
+        Function of the listing page that returns a dict of attributes, a
+        list of attribute values or a single value
+
+    Notes
+    -----
+    1. If the extractor raises an error, its attributes are set to None and
+       added to failed_fields, so the other attributes of the listing are
+       kept. Attributes that are missing (None, NaN or a sentinel such as
+       "Unknown", see is_missing_value) are added to failed_fields if they
+       are required (see REQUIRED_LISTING_FIELDS), and to missing_fields
+       otherwise.
+    """
+    try:
+        values = extractor(soup)
+    except Exception:
+        failed_fields.extend(fields)
+        listing_info.update(dict.fromkeys(fields))
+        return listing_info
+    if not isinstance(values, dict):
+        values = dict(zip(fields, values if len(fields) > 1 else [values]))
+    listing_info.update(values)
+    for field in fields:
+        if is_missing_value(values.get(field)):
+            if field in REQUIRED_LISTING_FIELDS:
+                failed_fields.append(field)
+            else:
+                missing_fields.append(field)
+    return listing_info
+
+
 def scrape_game_listing(soup):
-    """Scrape a single listing to retrieve various attributes."""
-    # Extract info from user reviews summary bar
-    num_reviews_int = get_all_reviews_count(soup)
-    overall_review_rating = get_overall_review_rating(soup)
-    platforms = get_platforms(soup)
-    user_defined_tags = get_user_defined_tags(soup)
-    num_steam_achievements = get_steam_achievements(soup)
-    # system_requirements = get_system_requirements(soup)
-    pct_overall, threshold_used = get_pct_overall_review_rating(soup)
-    (
-        pct_overall_lang,
-        threshold_used_lang,
-    ) = get_pct_overall_review_rating_language_filtered(soup)
-    drm = get_drm(soup)
-    listing_info = {
-        "review_type_all": num_reviews_int,
-        "overall_review_rating": overall_review_rating,
-        "pct_overall": pct_overall,
-        "pct_overall_threshold": threshold_used,
-        "pct_overall_lang": pct_overall_lang,
-        "pct_overall_threshold_lang": threshold_used_lang,
-        "platforms": platforms,
-        "user_defined_tags": user_defined_tags,
-        "num_steam_achievements": num_steam_achievements,
-        "drm": drm,
-    }
-    rating_dict = get_rating(soup)
-    rating_desc_dict = get_rating_descriptors(soup)
-    # listing_info.update(system_requirements)
-    listing_info.update(rating_dict)
-    listing_info.update(rating_desc_dict)
-    listing_info = get_sub_review_counts(soup, listing_info)
-    listing_info = get_release_summary_details(soup, listing_info)
-    listing_info = get_languages(soup, listing_info)
+    """
+    Scrape a single listing to retrieve various attributes.
+
+    Notes
+    -----
+    1. Each group of attributes is extracted separately, so a change to the
+       markup of one part of the page only loses the attributes of that
+       part. Attributes that could not be extracted (or required
+       attributes that are missing) are listed (comma separated) in
+       failed_fields, and optional attributes that are missing from the
+       page in missing_fields.
+    2. completeness is the fraction of required attributes, and of
+       attributes whose extractor raised an error, that were extracted. A
+       listing without reviews, franchise, etc. is complete, while an empty
+       page scores 0.
+    """
+    extractors = [
+        [["review_type_all"], get_all_reviews_count],
+        [["overall_review_rating"], get_overall_review_rating],
+        [
+            ["pct_overall", "pct_overall_threshold"],
+            get_pct_overall_review_rating,
+        ],
+        [
+            ["pct_overall_lang", "pct_overall_threshold_lang"],
+            get_pct_overall_review_rating_language_filtered,
+        ],
+        [["platforms"], get_platforms],
+        [["user_defined_tags"], get_user_defined_tags],
+        [["num_steam_achievements"], get_steam_achievements],
+        [["drm"], get_drm],
+        [["rating"], get_rating],
+        [["rating_descriptors"], get_rating_descriptors],
+        [
+            [
+                "review_type_positive",
+                "review_type_negative",
+                "review_language_mine",
+            ],
+            lambda soup: get_sub_review_counts(soup, {}),
+        ],
+        [
+            RELEASE_SUMMARY_FIELDS,
+            lambda soup: get_release_summary_details(soup, {}),
+        ],
+        [
+            ["languages", "num_languages"],
+            lambda soup: get_languages(soup, {}),
+        ],
+    ]
+    listing_info, failed_fields, missing_fields = {}, [], []
+    for fields, extractor in extractors:
+        extract_fields(
+            soup,
+            listing_info,
+            failed_fields,
+            missing_fields,
+            fields,
+            extractor,
+        )
+    listing_info["failed_fields"] = (
+        ", ".join(failed_fields) if failed_fields else np.nan
+    )
+    listing_info["missing_fields"] = (
+        ", ".join(missing_fields) if missing_fields else np.nan
+    )
+    listing_info["completeness"] = 1 - len(failed_fields) / len(
+        set(REQUIRED_LISTING_FIELDS + failed_fields)
+    )
     return listing_info
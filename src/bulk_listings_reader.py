@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Multi-threaded, typed reader for the per-listing CSV files."""
+
+
+# pylint: disable=invalid-name,broad-except
+
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+from src.failure_records import dict_failed_extraction_from_listing_page
+from src.processing_manifest import SOURCE_FILE_COL
+
+# Listing attributes holding counts or percentages (all others are strings)
+NUMERIC_LISTING_COLS = [
+    "review_type_all",
+    "pct_overall",
+    "pct_overall_lang",
+    "num_steam_achievements",
+    "num_languages",
+    "review_type_positive",
+    "review_type_negative",
+    "review_language_mine",
+    "completeness",
+]
+
+# Columns appended to listing attributes when exporting a listing to CSV
+LISTING_FILE_FIELDS = [
+    pa.field("page_num", pa.int64()),
+    pa.field("listing_num", pa.int64()),
+    # only found in listings scraped with requests
+    pa.field("url", pa.string()),
+]
+
+
+def get_listings_schema():
+    """Get Arrow schema of a single listing CSV file."""
+    fields = [
+        # counts are stored as floats, since they can be missing
+        pa.field(col, pa.float64())
+        if col in NUMERIC_LISTING_COLS
+        else pa.field(col, pa.string())
+        for col in dict_failed_extraction_from_listing_page()
+    ]
+    return pa.schema(fields + LISTING_FILE_FIELDS)
+
+
+def read_single_listing_csv(filepath, schema, source_file=None):
+    """Read single listing CSV file into Arrow table with explicit schema."""
+    table = pv.read_csv(
+        filepath,
+        read_options=pv.ReadOptions(use_threads=False),
+        convert_options=pv.ConvertOptions(
+            column_types=schema,
+            include_columns=schema.names,
+            # eg. selenium listings do not have a url column
+            include_missing_columns=True,
+            strings_can_be_null=True,
+        ),
+    )
+    return table.append_column(
+        SOURCE_FILE_COL,
+        pa.array(
+            [source_file or os.path.basename(filepath)] * len(table),
+            pa.string(),
+        ),
+    )
+
+
+def read_listings_csvs(filepaths, max_workers=None, parquet_filepath=None):
+    """
+    Read many listing CSV files into single Arrow table, using threads.
+
+    Parameters
+    ----------
+    filepaths : List
+        Paths to listing CSV files (eg. p{page}_l{listing}_{title}.csv)
+    max_workers : int
+        Number of threads (defaults to the number of CPU cores)
+    parquet_filepath : str
+        (Optional) Path to a parquet file to which the combined table is
+        exported
+
+    Notes
+    -----
+    1. Since all files are read with the same schema, columns such as
+       Publisher and Franchise are always strings, even in files where all
+       of their values are missing or numeric.
+    2. Files that cannot be parsed are skipped and their names are printed.
+    """
+    schema = get_listings_schema()
+    tables = []
+    max_workers = max_workers or os.cpu_count()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            f: executor.submit(read_single_listing_csv, f, schema)
+            for f in filepaths
+        }
+        for filepath, future in futures.items():
+            try:
+                tables.append(future.result())
+            except Exception as e:
+                print(f"Skipped {os.path.basename(filepath)}. Got {str(e)}")
+    table = (
+        pa.concat_tables(tables)
+        if tables
+        else schema.append(
+            pa.field(SOURCE_FILE_COL, pa.string())
+        ).empty_table()
+    )
+    print(
+        f"Read {table.num_rows:,} rows from {len(tables):,} listing CSV "
+        "files"
+    )
+    if parquet_filepath:
+        pq.write_table(table, parquet_filepath, compression="snappy")
+        print(f"Exported combined listings to {parquet_filepath}")
+    return table
+
+
+def read_listings_dir(data_dir, search_str="p*_*.csv", **kwargs):
+    """Read all listing CSV files in a directory into a DataFrame."""
+    filepaths = sorted(glob(os.path.join(data_dir, search_str)))
+    return read_listings_csvs(filepaths, **kwargs).to_pandas()
+
+
+def read_listings_csvs_to_df(filepaths):
+    """Read many listing CSV files into DataFrame (see read_listings_csvs)."""
+    return read_listings_csvs(filepaths).to_pandas()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Load test of the crawl pipelines against a local mock Steam store.
+
+The mock server (src.mock_steam_server) is started in a separate process,
+so that the CPU time and memory reported are those of the crawler only.
+
+Usage
+-----
+> python3 -m src.crawl_load_test --num-pages 5
+> python3 -m src.crawl_load_test --pipeline selenium --num-pages 2 \
+      --webdriver-path ~/chromedriver_linux64/chromedriver
+> python3 -m src.crawl_load_test --num-pages 5 --latency-ms 200 \
+      --error-429-pct 5 --output load_test_report.json
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+# pylint: disable=too-many-locals
+
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import src.crawl_metrics as cm
+import src.crawl_pipeline as cp
+from src.age_gate import add_cookies_to_driver, load_age_check_cookies
+from src.mock_steam_server import DEFAULT_SETTINGS
+
+
+def start_mock_server_process(settings):
+    """Start mock server in a child process and get its URL."""
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(settings, f)
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "src.mock_steam_server",
+            "--settings",
+            f.name,
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    store_url = process.stdout.readline().strip()
+    os.remove(f.name)
+    if not store_url:
+        process.kill()
+        raise RuntimeError("Mock server did not start")
+    return [process, store_url]
+
+
+def get_resource_usage():
+    """Get CPU time (sec.) and peak resident memory (MB) of this process."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux, and in bytes on macOS
+    rss_divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "cpu_sec": usage.ru_utime + usage.ru_stime,
+        "max_rss_mb": usage.ru_maxrss / rss_divisor,
+    }
+
+
+def run_requests_pipeline(store_url, raw_data_dir, num_pages, listings):
+    """Run requests-based crawl pipeline against mock server (no pauses)."""
+    config = cp.load_config(
+        None,
+        {
+            "raw_data_dir": raw_data_dir,
+            "search_results_base_url": (
+                f"{store_url}/search/?category1=998&"
+                "supportedlang=english&page="
+            ),
+            "store_url": store_url,
+            "start_page": 1,
+            "num_pages": num_pages,
+            "scrape_listings": listings,
+            "min_pause_between_pages": 0,
+            "max_pause_between_pages": 0,
+            "min_pause_between_listings": 0,
+            "max_pause_between_listings": 0,
+            "events_filepath": cm.metrics.events_filepath,
+            "age_check_filepath": os.path.join(
+                os.path.dirname(raw_data_dir), "age_check_cookies.json"
+            ),
+        },
+    )
+    cp.run_crawl_pipeline(config)
+
+
+def get_selenium_driver(webdriver_path):
+    """Get headless Chrome driver."""
+    # Imported here, since selenium is only needed for this pipeline
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    return webdriver.Chrome(executable_path=webdriver_path, options=options)
+
+
+def get_page_with_driver(driver, url, kind):
+    """Load page in browser and record its duration."""
+    start_time = time.time()
+    driver.get(url)
+    duration = time.time() - start_time
+    cm.metrics.observe("steam_fetch_duration_seconds", duration, kind=kind)
+    cm.log_event("page_fetched", kind=kind, url=url, duration=duration)
+
+
+def run_selenium_pipeline(
+    store_url, raw_data_dir, num_pages, listings, webdriver_path
+):
+    """Run Selenium-based scraping helpers against mock server."""
+    # Imported here, since selenium is only needed for this pipeline
+    import src.page_scrapers as ps
+    import src.selenium_helpers as sh
+
+    driver = get_selenium_driver(webdriver_path)
+    cookies = load_age_check_cookies()
+    try:
+        for page in range(1, num_pages + 1):
+            get_page_with_driver(
+                driver,
+                f"{store_url}/search/?category1=998&page={page}",
+                "search_results",
+            )
+            if page == 1:
+                add_cookies_to_driver(driver, cookies, None)
+            ps.scrape_single_page_search_results(driver, raw_data_dir)
+            if not listings:
+                continue
+            listing_urls = [
+                a.get_attribute("href")
+                for a in driver.find_elements_by_xpath(
+                    './/div[@id="search_resultsRows"]/a'
+                )
+            ]
+            for listing_num, url in enumerate(listing_urls, 1):
+                get_page_with_driver(driver, url, "listing")
+                sh.pass_age_gate(driver, cookies)
+                ps.scrape_listing(driver, listing_num, page, raw_data_dir)
+    finally:
+        driver.quit()
+
+
+def summarize_events(events_filepath):
+    """Get number of pages, latency percentiles and status codes."""
+    durations, status_codes = [], {}
+    with open(events_filepath) as f:
+        for line in f:
+            event = json.loads(line)
+            if event["event"] != "page_fetched":
+                continue
+            durations.append(event["duration"])
+            status_code = str(event.get("status_code"))
+            status_codes[status_code] = status_codes.get(status_code, 0) + 1
+    num_fetch_errors = sum(
+        value
+        for (name, _), value in cm.metrics.counters.items()
+        if name == "steam_fetch_errors_total"
+    )
+    return {
+        "num_pages_fetched": len(durations),
+        "num_fetch_errors": num_fetch_errors,
+        "latency_p50_sec": float(np.percentile(durations, 50))
+        if durations
+        else None,
+        "latency_p99_sec": float(np.percentile(durations, 99))
+        if durations
+        else None,
+        "status_codes": status_codes,
+    }
+
+
+def run_load_test(
+    pipeline="requests",
+    num_pages=5,
+    listings=True,
+    server_settings=None,
+    webdriver_path=None,
+):
+    """
+    Run crawl pipeline against local mock server and report its throughput.
+
+    Parameters
+    ----------
+    pipeline : str
+        Pipeline to run (requests or selenium)
+    num_pages : int
+        Number of pages of search results to scrape
+    listings : bool
+        Whether to also scrape the listings on each page of search results
+    server_settings : Dict
+        (Optional) Settings of mock server, eg. latency and error rates
+        (see src.mock_steam_server.DEFAULT_SETTINGS)
+    webdriver_path : str
+        (Optional) Path to chromedriver (selenium pipeline only)
+
+    Notes
+    -----
+    1. Pauses between requests are disabled, so the pages/sec. reported is
+       the throughput of the crawler itself.
+    2. Scraped files are written to a temporary directory, which is deleted
+       afterwards.
+    """
+    server_settings = dict(
+        DEFAULT_SETTINGS, num_pages=num_pages, **(server_settings or {})
+    )
+    process, store_url = start_mock_server_process(server_settings)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        events_filepath = os.path.join(tmp_dir, "events.jsonl")
+        raw_data_dir = os.path.join(tmp_dir, "raw")
+        os.makedirs(raw_data_dir)
+        cm.metrics.counters.clear()
+        cm.metrics.histograms.clear()
+        cm.configure(events_filepath, echo=False)
+        usage_start = get_resource_usage()
+        start_time = time.time()
+        try:
+            if pipeline == "selenium":
+                run_selenium_pipeline(
+                    store_url,
+                    raw_data_dir,
+                    num_pages,
+                    listings,
+                    webdriver_path,
+                )
+            else:
+                run_requests_pipeline(
+                    store_url, raw_data_dir, num_pages, listings
+                )
+        finally:
+            duration = time.time() - start_time
+            usage_end = get_resource_usage()
+            process.terminate()
+            process.wait()
+            cm.configure(None, echo=True)
+        report = {
+            "pipeline": pipeline,
+            "duration_sec": duration,
+            **summarize_events(events_filepath),
+            "num_files_written": len(os.listdir(raw_data_dir)),
+            "cpu_sec": usage_end["cpu_sec"] - usage_start["cpu_sec"],
+            "max_rss_mb": usage_end["max_rss_mb"],
+            "server_settings": server_settings,
+        }
+    report["pages_per_sec"] = report["num_pages_fetched"] / max(duration, 1e-6)
+    return report
+
+
+def main(argv=None):
+    """Run load test from the command line and print report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--pipeline", choices=["requests", "selenium"], default="requests"
+    )
+    parser.add_argument("--num-pages", type=int, default=5, dest="num_pages")
+    parser.add_argument(
+        "--no-listings", action="store_false", dest="listings", default=True
+    )
+    parser.add_argument("--webdriver-path", dest="webdriver_path")
+    parser.add_argument("--output", help="path to JSON report file")
+    for setting in [
+        "latency_ms",
+        "slow_pct",
+        "error_429_pct",
+        "error_500_pct",
+        "age_gate_pct",
+    ]:
+        parser.add_argument(
+            f"--{setting.replace('_', '-')}", dest=setting, type=float
+        )
+    parser.add_argument("--pages-dir", dest="pages_dir")
+    parser.add_argument("--seed", type=int, dest="seed")
+    args = vars(parser.parse_args(argv))
+    output_filepath = args.pop("output")
+    run_args = {
+        k: args.pop(k)
+        for k in ["pipeline", "num_pages", "listings", "webdriver_path"]
+    }
+    server_settings = {k: v for k, v in args.items() if v is not None}
+    report = run_load_test(**run_args, server_settings=server_settings)
+    report_str = json.dumps(report, indent=1)
+    print(report_str)
+    if output_filepath:
+        with open(output_filepath, "w") as f:
+            f.write(f"{report_str}\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
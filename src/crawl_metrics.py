@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Structured events, counters and histograms for scraping progress.
+
+Events are written as JSON lines (one object per line) to an optional
+events file and, by default, their message is also printed. Counters and
+histograms are kept in memory and can be served in the Prometheus text
+format from a local HTTP endpoint, running in a thread of the crawler.
+
+Usage
+-----
+> start_metrics_server(8000)
+> with timed("steam_fetch_duration_seconds", kind="listing"):
+      response = session.get(url)
+> log_event("listing_scraped", "Scraped listing 1", listing_num=1)
+> curl localhost:8000/metrics
+"""
+
+
+# pylint: disable=invalid-name,broad-except
+
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (in seconds) of histogram buckets for durations
+DURATION_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+# Upper bounds of buckets for any histogram not listed here
+HISTOGRAM_BUCKETS = {
+    "steam_fetch_duration_seconds": DURATION_BUCKETS,
+    "steam_parse_duration_seconds": DURATION_BUCKETS,
+    "steam_response_size_bytes": [
+        1_000,
+        10_000,
+        100_000,
+        250_000,
+        500_000,
+        1_000_000,
+        5_000_000,
+    ],
+}
+
+METRIC_HELP = {
+    "steam_fetch_duration_seconds": "Duration of HTTP requests",
+    "steam_parse_duration_seconds": "Duration of extraction from a page",
+    "steam_response_size_bytes": "Size of HTTP response bodies",
+    "steam_responses_total": "HTTP responses by status code",
+    "steam_fetch_errors_total": "HTTP requests that raised an error",
+    "steam_retries_total": "Retried requests",
+    "steam_age_gates_total": "Age gates shown instead of listings",
+    "steam_driver_recycles_total": "Browser sessions recycled",
+    "steam_failure_records_total": "Failure records used instead of data",
+    "steam_field_errors_total": "Listing attributes that were not extracted",
+    "steam_pages_scraped_total": "Pages of search results scraped",
+    "steam_listings_scraped_total": "Listings scraped",
+    "steam_listings_unchanged_total": "Listings skipped as unchanged",
+}
+
+
+class MetricsRegistry:
+    """Thread-safe store of counters and histograms, keyed by labels."""
+
+    def __init__(self, events_filepath=None, echo=True):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.events_filepath = events_filepath
+        self.echo = echo
+
+    def inc(self, name, value=1, **labels):
+        """Increment a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        """Add an observation to a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        buckets = HISTOGRAM_BUCKETS.get(name, DURATION_BUCKETS)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = {
+                    "buckets": buckets,
+                    "counts": [0] * (len(buckets) + 1),
+                    "sum": 0,
+                    "count": 0,
+                }
+            histogram = self.histograms[key]
+            histogram["counts"][bisect_left(buckets, value)] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def get_counter(self, name, **labels):
+        """Get current value of a counter."""
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def get_quantile(self, name, q, **labels):
+        """Estimate quantile of a histogram, from its bucket counts."""
+        histogram = self.histograms.get((name, tuple(sorted(labels.items()))))
+        if not histogram or not histogram["count"]:
+            return None
+        rank = q * histogram["count"]
+        num_below, lower = 0, 0
+        for upper, count in zip(histogram["buckets"], histogram["counts"]):
+            if num_below + count >= rank:
+                return lower + (upper - lower) * (rank - num_below) / count
+            num_below += count
+            lower = upper
+        # Observations above the largest bucket
+        return histogram["buckets"][-1]
+
+    def log_event(self, event, message=None, **fields):
+        """Write event as a JSON line, and print its message."""
+        record = {"ts": time.time(), "event": event, **fields}
+        if message is not None:
+            record["message"] = message
+            if self.echo:
+                print(message)
+        if self.events_filepath:
+            line = json.dumps(record, default=str)
+            with self.lock, open(self.events_filepath, "a") as f:
+                f.write(f"{line}\n")
+        return record
+
+    def to_prometheus_text(self):
+        """Get all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (k, dict(v, counts=list(v["counts"])))
+                for k, v in self.histograms.items()
+            )
+        declared = set()
+        for (name, labels), value in counters:
+            lines += get_metric_header(name, "counter", declared)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            lines += get_metric_header(name, "histogram", declared)
+            cumulative_count = 0
+            for upper, count in zip(
+                histogram["buckets"] + ["+Inf"], histogram["counts"]
+            ):
+                cumulative_count += count
+                bucket_labels = labels + (("le", upper),)
+                lines.append(
+                    f"{name}_bucket{format_labels(bucket_labels)} "
+                    f"{cumulative_count}"
+                )
+            lines.append(
+                f"{name}_sum{format_labels(labels)} {histogram['sum']}"
+            )
+            lines.append(
+                f"{name}_count{format_labels(labels)} {histogram['count']}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    """Format labels as {key="value",...} (empty string if no labels)."""
+    if not labels:
+        return ""
+    labels_str = ",".join(f'{k}="{escape_label_value(v)}"' for k, v in labels)
+    return f"{{{labels_str}}}"
+
+
+def escape_label_value(value):
+    """Escape backslashes, quotes and newlines in label value."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def get_metric_header(name, metric_type, declared):
+    """Get HELP and TYPE lines of metric, if not already declared."""
+    if name in declared:
+        return []
+    declared.add(name)
+    return [
+        f"# HELP {name} {METRIC_HELP.get(name, name)}",
+        f"# TYPE {name} {metric_type}",
+    ]
+
+
+# Registry used by the scraping helpers
+metrics = MetricsRegistry()
+
+
+def configure(events_filepath=None, echo=None, registry=metrics):
+    """Set events file, and whether event messages are printed."""
+    registry.events_filepath = events_filepath
+    if echo is not None:
+        registry.echo = echo
+    return registry
+
+
+def log_event(event, message=None, registry=metrics, **fields):
+    """Write event to the events file of the registry, and print message."""
+    return registry.log_event(event, message, **fields)
+
+
+@contextmanager
+def timed(name, registry=metrics, **labels):
+    """Observe duration (in seconds) of the enclosed block in a histogram."""
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.time() - start_time, **labels)
+
+
+def record_response(response, duration, kind, registry=metrics):
+    """Record latency, status code and size of an HTTP response."""
+    registry.observe("steam_fetch_duration_seconds", duration, kind=kind)
+    registry.inc(
+        "steam_responses_total",
+        kind=kind,
+        status_code=response.status_code,
+    )
+    num_bytes = len(response.content)
+    registry.observe("steam_response_size_bytes", num_bytes, kind=kind)
+    return num_bytes
+
+
+def get_metrics_handler(registry):
+    """Get HTTP request handler serving metrics of registry at /metrics."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        """Serve metrics in the Prometheus text format."""
+
+        def do_GET(self):
+            if self.path.split("?")[0] not in ["/", "/metrics"]:
+                self.send_error(404)
+                return
+            body = registry.to_prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header(
+                "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+            )
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            """Do not print a line per scrape of the endpoint."""
+
+    return MetricsHandler
+
+
+def start_metrics_server(port=8000, host="127.0.0.1", registry=metrics):
+    """Serve metrics at http://host:port/metrics, from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), get_metrics_handler(registry))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"Serving metrics at http://{host}:{server.server_port}/metrics")
+    return server
@@ -0,0 +1,855 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Headless crawl of search results and listings with requests.
+
+Usage
+-----
+> python3 -m src.crawl_pipeline --config crawl_config.json
+> python3 -m src.crawl_pipeline --config crawl_config.json --start-page 60 \
+      --num-pages 10 --no-listings
+> python3 -m src.crawl_pipeline --config crawl_config.json --resume
+> python3 -m src.crawl_pipeline --config crawl_config.json \
+      --metrics-port 8000 --events-file data/raw/crawl_events.jsonl
+> python3 -m src.crawl_pipeline --config crawl_config.json --retry-failures
+> python3 -m src.crawl_pipeline --config crawl_config.json --recrawl \
+      --recrawl-budget 500
+> python3 -m src.crawl_pipeline --config crawl_config.json --discover \
+      --discovery-budget 100
+"""
+
+
+# pylint: disable=invalid-name,broad-except
+
+
+import argparse
+import json
+import os
+import re
+import time
+from glob import glob
+from random import choice, uniform
+
+import pandas as pd
+import requests
+from bs4 import BeautifulSoup
+
+import src.age_gate as ag
+import src.app_discovery as ad
+import src.bs4_helpers as bsh
+import src.crawl_metrics as cm
+import src.page_fingerprint as pf
+import src.page_helpers as ph
+import src.requests_scrapers as rsc
+from src.dead_letter_queue import DeadLetterQueue
+from src.recrawl_scheduler import RecrawlScheduler
+from src.webscraping_utils import get_custom_headers_list
+
+STORE_URL = "https://store.steampowered.com"
+
+# Settings used for any key not specified in the config file
+DEFAULT_CONFIG = {
+    "raw_data_dir": os.path.join("data", "raw", "requests"),
+    "search_results_base_url": (
+        "https://store.steampowered.com/search/?"
+        "category1=998&supportedlang=english&page="
+    ),
+    "start_page": 50,
+    "num_pages": 50,
+    "scrape_listings": True,
+    # Cookies sent with every request (age-check cookies are added to the
+    # session, see age_check_filepath)
+    "cookies": {},
+    "request_timeout": 30,
+    "min_pause_between_pages": 2.8,
+    "max_pause_between_pages": 4.2,
+    "min_pause_between_listings": 3.0,
+    "max_pause_between_listings": 5.4,
+    "verbose": False,
+    # Skip pages of search results already exported to raw_data_dir
+    "resume": False,
+    # Host of listing pages (eg. URL of a local mock server, for load tests)
+    "store_url": STORE_URL,
+    # Port of local Prometheus endpoint (None to not serve metrics)
+    "metrics_port": None,
+    # JSON-lines file of progress events (None to only print them)
+    "events_filepath": None,
+    # JSON file of age-check cookies of each worker identity, shared with
+    # other workers (eg. Selenium notebooks)
+    "age_check_filepath": os.path.join(
+        "data", "raw", "age_check_cookies.json"
+    ),
+    "age_check_identity": "default",
+    # JSON-lines file of failed pages (None to use raw_data_dir)
+    "dead_letters_filepath": None,
+    # Number of attempts after which a failed page is no longer retried
+    "max_attempts": 5,
+    # Delay (sec.) before first retry, doubled for each later retry
+    "retry_base_delay": 60,
+    # Fraction of required listing attributes below which a listing is failed
+    # (and recorded in the dead-letter queue)
+    "min_completeness": rsc.MIN_COMPLETENESS,
+    # JSON-lines file of change history and recrawl schedule of listings
+    # (None to use raw_data_dir)
+    "recrawl_filepath": None,
+    # Number of listings recrawled per run of --recrawl (eg. once a day)
+    "recrawl_budget": 500,
+    # Bulk sources of listing URLs used by --discover (app_list and/or
+    # sitemaps), instead of paging through search results
+    "discovery_sources": ["app_list", "sitemaps"],
+    "app_list_url": ad.APP_LIST_URL,
+    "robots_url": ad.ROBOTS_URL,
+    # Maximum number of sitemaps requested per run (None for all)
+    "max_sitemaps": None,
+    # CSV file of discovered listings not crawled yet (None to use
+    # raw_data_dir)
+    "discovery_filepath": None,
+    # Number of discovered listings crawled per run of --discover
+    "discovery_budget": 0,
+    # Skip extraction and export of listings whose extracted regions are
+    # unchanged since their last crawl (see src.page_fingerprint)
+    "skip_unchanged_listings": True,
+    # JSON-lines file of fingerprints of listings (None to use raw_data_dir)
+    "fingerprints_filepath": None,
+    # Number of differing bits up to which fingerprints match
+    "fingerprint_max_distance": 0,
+}
+
+
+def load_config(config_filepath=None, overrides=None):
+    """Load crawl settings from JSON config file, on top of the defaults."""
+    config = dict(DEFAULT_CONFIG)
+    if config_filepath:
+        with open(config_filepath) as f:
+            config.update(json.load(f))
+    config.update(
+        {k: v for k, v in (overrides or {}).items() if v is not None}
+    )
+    return config
+
+
+def pause(min_pause, max_pause):
+    """Pause for a random duration."""
+    pause_duration = uniform(min_pause, max_pause)
+    time.sleep(pause_duration)
+    return pause_duration
+
+
+def send_get_request(
+    session, url, cookies, headers_list, timeout, kind="search_results"
+):
+    """Send GET request with a random header, reusing session connection.
+
+    Latency, status code and size of the response are recorded by kind of
+    page (search_results or listing).
+    """
+    start_time = time.time()
+    try:
+        response = session.get(
+            url=url,
+            cookies=cookies,
+            headers=choice(headers_list),
+            timeout=timeout,
+        )
+    except Exception:
+        cm.metrics.inc("steam_fetch_errors_total", kind=kind)
+        raise
+    duration = time.time() - start_time
+    num_bytes = cm.record_response(response, duration, kind)
+    cm.log_event(
+        "page_fetched",
+        kind=kind,
+        url=url,
+        status_code=response.status_code,
+        num_bytes=num_bytes,
+        duration=duration,
+    )
+    return response
+
+
+def get_listing_url(url, store_url=STORE_URL):
+    """Get URL of listing page on store_url host."""
+    if store_url == STORE_URL or not url.startswith(STORE_URL):
+        return url
+    path_start = len(STORE_URL)
+    return store_url + url[path_start:]
+
+
+def get_last_page(session, config, headers_list):
+    """Get last available page number, from total number of listings."""
+    response = send_get_request(
+        session,
+        ph.get_page_url(config["search_results_base_url"], 1),
+        config["cookies"],
+        headers_list,
+        config["request_timeout"],
+    )
+    soup = BeautifulSoup(response.content, "html.parser")
+    return ph.get_num_pages(ph.get_total_listings_from_soup(soup))
+
+
+def get_scraped_pages(raw_data_dir):
+    """Get page numbers of search results already exported to disk."""
+    return [
+        int(re.findall(r"\d+", os.path.basename(f))[0])
+        for f in glob(
+            os.path.join(raw_data_dir, "search_results_page_*_*.parquet.gzip")
+        )
+    ]
+
+
+def get_pages_to_scrape(config, last_page=None):
+    """Get URL of each page of search results to scrape, up to last page.
+
+    If resuming, pages already exported to disk are skipped.
+    """
+    first_page = config["start_page"]
+    return ph.get_page_plan(
+        config["search_results_base_url"],
+        range(first_page, first_page + config["num_pages"]),
+        last_page,
+        get_scraped_pages(config["raw_data_dir"]) if config["resume"] else [],
+    )
+
+
+def get_retry_after(response):
+    """Get delay (sec.) requested by Retry-After header (None if absent)."""
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_page(
+    session,
+    config,
+    url,
+    cookies,
+    headers_list,
+    kind,
+    message,
+    dead_letters=None,
+    page=None,
+    listing_num=None,
+    fetch_url=None,
+):
+    """Fetch single page, recording failed requests as dead letters.
+
+    Returns None if the request raised an error, or if the response was
+    an error (eg. 429) and failures are recorded in a DeadLetterQueue.
+    """
+    retry_after = None
+    try:
+        response = send_get_request(
+            session,
+            fetch_url or url,
+            cookies,
+            headers_list,
+            config["request_timeout"],
+            kind=kind,
+        )
+    except Exception as e:
+        error = e
+    else:
+        if response.status_code == 200 or dead_letters is None:
+            return response
+        error = f"HTTP {response.status_code}"
+        retry_after = get_retry_after(response)
+    cm.log_event(
+        "fetch_failed",
+        f"{message}. Got {str(error)}",
+        kind=kind,
+        url=url,
+        page=page,
+        error=str(error),
+    )
+    if dead_letters is not None:
+        dead_letters.record_failure(
+            kind,
+            "fetch",
+            error,
+            url,
+            page,
+            listing_num,
+            retry_after=retry_after,
+        )
+    return None
+
+
+def crawl_search_results(
+    session, config, page_urls, headers_list, dead_letters=None
+):
+    """Scrape pages of search results, yielding each page once exported.
+
+    Pages are requested directly, from their URL (see get_pages_to_scrape).
+    """
+    for page, url in page_urls.items():
+        response = fetch_page(
+            session,
+            config,
+            url,
+            config["cookies"],
+            headers_list,
+            "search_results",
+            f"Could not get search results page {page}",
+            dead_letters,
+            page=page,
+        )
+        if response is None:
+            continue
+        soup = BeautifulSoup(response.content, "html.parser")
+        df_search_results = rsc.scrape_single_page_search_results(
+            soup,
+            config["raw_data_dir"],
+            page,
+            response.status_code,
+            config["verbose"],
+            dead_letters,
+            url,
+        )
+        yield df_search_results
+        pause(
+            config["min_pause_between_pages"],
+            config["max_pause_between_pages"],
+        )
+
+
+def crawl_listings(
+    session,
+    config,
+    df_search_results,
+    headers_list,
+    dead_letters=None,
+    scheduler=None,
+    fingerprints=None,
+):
+    """Scrape listings found on a single page of search results.
+
+    If a RecrawlScheduler is passed, each scraped listing is recorded in it.
+    If a FingerprintStore is passed, listings whose fingerprint matches that
+    of their last extraction are not scraped or exported (None is yielded).
+    """
+    for _, row in df_search_results.dropna(subset=["url"]).iterrows():
+        response = fetch_page(
+            session,
+            config,
+            row["url"],
+            config["cookies"],
+            headers_list,
+            "listing",
+            f"Could not get listing {row['url']}",
+            dead_letters,
+            page=row["page"],
+            listing_num=row["listing_counter"],
+            fetch_url=get_listing_url(row["url"], config["store_url"]),
+        )
+        if response is None:
+            continue
+        if ag.is_age_gate_html(response.content):
+            cm.metrics.inc("steam_age_gates_total")
+            cm.log_event(
+                "age_gate",
+                f"Got age gate for listing {row['url']}, despite age-check "
+                "cookies",
+                url=row["url"],
+            )
+            if dead_letters is not None:
+                dead_letters.record_failure(
+                    "listing",
+                    "age_gate",
+                    "Age gate shown",
+                    row["url"],
+                    row["page"],
+                    row["listing_counter"],
+                )
+            continue
+        app_id = ad.get_app_id(row["url"]) or row["url"]
+        fingerprint = None
+        if fingerprints is not None:
+            fingerprint = pf.get_page_fingerprint(response.content)
+            if fingerprints.is_unchanged(app_id, fingerprint):
+                cm.metrics.inc("steam_listings_unchanged_total")
+                cm.log_event(
+                    "listing_unchanged",
+                    f"Listing {row['url']} unchanged since last crawl. "
+                    "Skipped scrape.",
+                    url=row["url"],
+                )
+                if scheduler is not None:
+                    scheduler.record_crawl(
+                        row["url"],
+                        dict(row),
+                        row["page"],
+                        row["listing_counter"],
+                        is_unchanged=True,
+                    )
+                yield None
+                pause(
+                    config["min_pause_between_listings"],
+                    config["max_pause_between_listings"],
+                )
+                continue
+        soup = BeautifulSoup(response.content, "html.parser")
+        df_listing_details, listing_filepath = rsc.scrape_listing_requests(
+            soup,
+            row["listing_counter"],
+            row["page"],
+            config["raw_data_dir"],
+            row["url"],
+            dead_letters,
+            config["min_completeness"],
+        )
+        if scheduler is not None and df_listing_details is not None:
+            # Prices are also read from the listing page, as recrawled
+            # listings have no search result
+            listing_prices = {
+                field: price
+                for field, price in bsh.get_price_from_listing_page(
+                    soup
+                ).items()
+                if price is not None
+            }
+            scheduler.record_crawl(
+                row["url"],
+                {**row, **df_listing_details.iloc[0], **listing_prices},
+                row["page"],
+                row["listing_counter"],
+            )
+        if fingerprints is not None and listing_filepath is not None:
+            fingerprints.record(
+                app_id, row["url"], fingerprint, listing_filepath
+            )
+        yield df_listing_details
+        pause(
+            config["min_pause_between_listings"],
+            config["max_pause_between_listings"],
+        )
+
+
+def get_session(config):
+    """Get requests session with the age-check cookies of the worker."""
+    session = requests.Session()
+    cookies = ag.load_age_check_cookies(
+        config["age_check_filepath"], config["age_check_identity"]
+    )
+    return ag.add_cookies_to_session(session, cookies)
+
+
+def get_dead_letter_queue(config):
+    """Get queue of failed pages, from file set in config."""
+    return DeadLetterQueue(
+        config["dead_letters_filepath"]
+        or os.path.join(config["raw_data_dir"], "dead_letters.jsonl"),
+        max_attempts=config["max_attempts"],
+        base_delay=config["retry_base_delay"],
+    )
+
+
+def get_recrawl_scheduler(config):
+    """Get recrawl schedule of listings, from file set in config."""
+    return RecrawlScheduler(
+        config["recrawl_filepath"]
+        or os.path.join(config["raw_data_dir"], "recrawl_schedule.jsonl")
+    )
+
+
+def get_fingerprint_store(config):
+    """Get fingerprints of listings (None if unchanged ones are scraped)."""
+    if not config["skip_unchanged_listings"]:
+        return None
+    return pf.FingerprintStore(
+        config["fingerprints_filepath"]
+        or os.path.join(config["raw_data_dir"], "listing_fingerprints.jsonl"),
+        config["fingerprint_max_distance"],
+    )
+
+
+def run_crawl_pipeline(config):
+    """Crawl search results and (optionally) listings, one page at a time."""
+    os.makedirs(config["raw_data_dir"], exist_ok=True)
+    cm.configure(config["events_filepath"])
+    if config["metrics_port"]:
+        cm.start_metrics_server(config["metrics_port"])
+    headers_list = get_custom_headers_list()
+    dead_letters = get_dead_letter_queue(config)
+    scheduler = get_recrawl_scheduler(config)
+    fingerprints = get_fingerprint_store(config)
+    start_time = time.time()
+    num_pages, num_listings = 0, 0
+    seen_urls = set()
+    with get_session(config) as session:
+        try:
+            last_page = get_last_page(session, config, headers_list)
+        except Exception:
+            last_page = None
+            cm.log_event(
+                "last_page_failed",
+                "Could not get last page of search results. Ignored.",
+            )
+        page_urls = get_pages_to_scrape(config, last_page)
+        cm.log_event(
+            "crawl_started",
+            f"Scraping {len(page_urls)} pages of search results",
+            pages=list(page_urls),
+        )
+        for df_search_results in crawl_search_results(
+            session, config, page_urls, headers_list, dead_letters
+        ):
+            num_pages += 1
+            if not config["scrape_listings"]:
+                continue
+            # Listings can be moved between pages while crawling
+            df_new = df_search_results[
+                ~df_search_results["url"].isin(seen_urls)
+            ]
+            seen_urls.update(df_new["url"].dropna())
+            for _ in crawl_listings(
+                session,
+                config,
+                df_new,
+                headers_list,
+                dead_letters,
+                scheduler,
+                fingerprints,
+            ):
+                num_listings += 1
+    duration = time.time() - start_time
+    cm.log_event(
+        "crawl_done",
+        f"Scraped {num_pages} pages of search results and {num_listings} "
+        f"listings in {duration:.3f} sec. (failures: "
+        f"{dead_letters.get_status_counts()})",
+        num_pages=num_pages,
+        num_listings=num_listings,
+        duration=duration,
+    )
+    return [num_pages, num_listings]
+
+
+def retry_dead_letters(session, config, dead_letters, headers_list):
+    """Re-fetch and re-scrape failed pages whose backoff has elapsed."""
+    due_entries = dead_letters.get_due()
+    for entry in due_entries:
+        cm.metrics.inc("steam_retries_total", kind=entry["kind"])
+        cm.log_event(
+            "retry_started",
+            f"Retrying {entry['kind']} {entry['url'] or entry['page']} "
+            f"(attempt {entry['attempts'] + 1})",
+            entry_id=entry["id"],
+            attempts=entry["attempts"],
+        )
+        if entry["kind"] == "search_results":
+            page_urls = ph.get_page_plan(
+                config["search_results_base_url"], [entry["page"]]
+            )
+            for df_search_results in crawl_search_results(
+                session, config, page_urls, headers_list, dead_letters
+            ):
+                # Listings of a failed page were never scraped
+                if config["scrape_listings"]:
+                    for _ in crawl_listings(
+                        session,
+                        config,
+                        df_search_results,
+                        headers_list,
+                        dead_letters,
+                    ):
+                        pass
+        else:
+            df_listing = pd.DataFrame.from_records(
+                [
+                    {
+                        "url": entry["url"],
+                        "page": entry["page"],
+                        "listing_counter": entry["listing_num"],
+                    }
+                ]
+            )
+            for _ in crawl_listings(
+                session, config, df_listing, headers_list, dead_letters
+            ):
+                pass
+    return len(due_entries)
+
+
+def run_retry_scheduler(config, max_wait=None):
+    """
+    Retry failed pages with exponential backoff, until none are pending.
+
+    Parameters
+    ----------
+    config : Dict
+        Crawl settings (see load_config)
+    max_wait : float
+        (Optional) Stop, instead of waiting, if the next retry is due in
+        more than max_wait sec.
+
+    Notes
+    -----
+    1. Only pages recorded in the dead-letter queue are requested, so the
+       number of requests is proportional to the number of failures.
+    """
+    os.makedirs(config["raw_data_dir"], exist_ok=True)
+    cm.configure(config["events_filepath"])
+    headers_list = get_custom_headers_list()
+    dead_letters = get_dead_letter_queue(config)
+    num_retried = 0
+    with get_session(config) as session:
+        while True:
+            num_retried += retry_dead_letters(
+                session, config, dead_letters, headers_list
+            )
+            pending = dead_letters.get_pending()
+            if not pending:
+                break
+            wait = pending[0]["next_retry_at"] - time.time()
+            if max_wait is not None and wait > max_wait:
+                break
+            if wait > 0:
+                cm.log_event(
+                    "retry_wait",
+                    f"Waiting {wait:.1f} sec. for next retry "
+                    f"({len(pending)} pending)",
+                    num_pending=len(pending),
+                )
+                time.sleep(wait)
+    dead_letters.compact()
+    status_counts = dead_letters.get_status_counts()
+    cm.log_event(
+        "retries_done",
+        f"Retried {num_retried} failed pages ({status_counts})",
+        num_retried=num_retried,
+        status_counts=status_counts,
+    )
+    return status_counts
+
+
+def run_recrawl(config):
+    """
+    Recrawl the listings most likely to have changed, within a budget.
+
+    Parameters
+    ----------
+    config : Dict
+        Crawl settings (see load_config), including recrawl_budget (number
+        of listings requested)
+
+    Notes
+    -----
+    1. Listings are prioritized by their observed change rate (see
+       src.recrawl_scheduler), instead of being recrawled by page of
+       search results.
+    """
+    os.makedirs(config["raw_data_dir"], exist_ok=True)
+    cm.configure(config["events_filepath"])
+    headers_list = get_custom_headers_list()
+    dead_letters = get_dead_letter_queue(config)
+    scheduler = get_recrawl_scheduler(config)
+    fingerprints = get_fingerprint_store(config)
+    plan = scheduler.get_plan(config["recrawl_budget"])
+    cm.log_event(
+        "recrawl_started",
+        f"Recrawling {len(plan)} listings "
+        f"({sum(e['priority'] for e in plan):.1f} expected changes)",
+        num_listings=len(plan),
+    )
+    df_plan = pd.DataFrame.from_records(
+        [
+            {
+                "url": entry["url"],
+                "page": entry["page"],
+                "listing_counter": entry["listing_num"],
+            }
+            for entry in plan
+        ],
+        columns=["url", "page", "listing_counter"],
+    )
+    num_listings = 0
+    with get_session(config) as session:
+        for df_listing_details in crawl_listings(
+            session,
+            config,
+            df_plan,
+            headers_list,
+            dead_letters,
+            scheduler,
+            fingerprints,
+        ):
+            num_listings += df_listing_details is not None
+    scheduler.compact()
+    num_unchanged = 0
+    if fingerprints is not None:
+        fingerprints.compact()
+        num_unchanged = fingerprints.num_unchanged
+    summary = scheduler.get_summary()
+    cm.log_event(
+        "recrawl_done",
+        f"Re-extracted {num_listings} of {len(plan)} recrawled listings "
+        f"({num_unchanged} unchanged, {summary})",
+        num_recrawled=num_listings,
+        num_unchanged=num_unchanged,
+        **summary,
+    )
+    return summary
+
+
+def run_discovery(config):
+    """
+    Discover listings not crawled yet from bulk sources, and crawl some.
+
+    Parameters
+    ----------
+    config : Dict
+        Crawl settings (see load_config), including discovery_sources and
+        discovery_budget (number of discovered listings crawled)
+
+    Notes
+    -----
+    1. Listings are discovered from the app list and/or sitemaps (see
+       src.app_discovery), in a few requests instead of one request per
+       page of search results. Listings found in raw_data_dir or in the
+       recrawl schedule are skipped.
+    2. Discovered listings are exported to discovery_filepath (most
+       recently modified first). Crawled listings are exported with page
+       0 and their app id as listing number.
+    """
+    os.makedirs(config["raw_data_dir"], exist_ok=True)
+    cm.configure(config["events_filepath"])
+    headers_list = get_custom_headers_list()
+    dead_letters = get_dead_letter_queue(config)
+    scheduler = get_recrawl_scheduler(config)
+    fingerprints = get_fingerprint_store(config)
+    known_app_ids = ad.get_known_app_ids(config["raw_data_dir"]) | {
+        ad.get_app_id(url) for url in scheduler.entries
+    }
+    with get_session(config) as session:
+        df_frontier = ad.discover_apps(
+            session,
+            config["discovery_sources"],
+            known_app_ids,
+            config["store_url"],
+            config["max_sitemaps"],
+            config["app_list_url"],
+            config["robots_url"],
+        )
+        discovery_filepath = config["discovery_filepath"] or os.path.join(
+            config["raw_data_dir"], "discovered_apps.csv"
+        )
+        df_frontier.to_csv(discovery_filepath, index=False)
+        cm.log_event(
+            "discovery_done",
+            f"Discovered {len(df_frontier)} new listings "
+            f"({len(known_app_ids)} already known)",
+            num_discovered=len(df_frontier),
+            num_known=len(known_app_ids),
+        )
+        df_plan = (
+            df_frontier.head(config["discovery_budget"])
+            .assign(page=0)
+            .rename(columns={"app_id": "listing_counter"})
+        )
+        num_listings = 0
+        for df_listing_details in crawl_listings(
+            session,
+            config,
+            df_plan,
+            headers_list,
+            dead_letters,
+            scheduler,
+            fingerprints,
+        ):
+            num_listings += df_listing_details is not None
+    cm.log_event(
+        "discovery_crawl_done",
+        f"Crawled {num_listings} of {len(df_plan)} discovered listings",
+        num_crawled=num_listings,
+    )
+    return df_frontier
+
+
+def main(argv=None):
+    """Run crawl pipeline from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--config", help="path to JSON config file")
+    parser.add_argument("--start-page", type=int, dest="start_page")
+    parser.add_argument("--num-pages", type=int, dest="num_pages")
+    parser.add_argument("--raw-data-dir", dest="raw_data_dir")
+    parser.add_argument(
+        "--no-listings",
+        action="store_false",
+        dest="scrape_listings",
+        default=None,
+        help="only scrape search results",
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", dest="verbose", default=None
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        default=None,
+        help="skip pages of search results already scraped",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        dest="metrics_port",
+        help="serve Prometheus metrics on this local port",
+    )
+    parser.add_argument(
+        "--events-file",
+        dest="events_filepath",
+        help="append JSON-lines progress events to this file",
+    )
+    parser.add_argument(
+        "--retry-failures",
+        action="store_true",
+        help="only retry pages in the dead-letter queue",
+    )
+    parser.add_argument(
+        "--recrawl",
+        action="store_true",
+        help="only recrawl the listings most likely to have changed",
+    )
+    parser.add_argument(
+        "--recrawl-budget",
+        type=int,
+        dest="recrawl_budget",
+        help="number of listings to recrawl",
+    )
+    parser.add_argument(
+        "--discover",
+        action="store_true",
+        help="only discover (and crawl) listings from app list and sitemaps",
+    )
+    parser.add_argument(
+        "--discovery-budget",
+        type=int,
+        dest="discovery_budget",
+        help="number of discovered listings to crawl",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        help="stop retrying if next retry is due in more than this (sec.)",
+    )
+    args = vars(parser.parse_args(argv))
+    retry_failures = args.pop("retry_failures")
+    recrawl = args.pop("recrawl")
+    discover = args.pop("discover")
+    max_wait = args.pop("max_wait")
+    config = load_config(args.pop("config"), args)
+    if retry_failures:
+        run_retry_scheduler(config, max_wait)
+    elif recrawl:
+        run_recrawl(config)
+    elif discover:
+        run_discovery(config)
+    else:
+        run_crawl_pipeline(config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Bulk-load processed data into a SQL database table, with upserts.
+
+Batches are loaded with the bulk path of the database server (LOAD DATA
+LOCAL INFILE for MySQL, COPY for PostgreSQL) into a staging table, from
+which rows are upserted into the target table on a key column. SQLite
+(eg. for local runs without a database server) falls back to executemany().
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Placeholder written to CSV files for missing values
+NULL_MARKER = "\\N"
+
+
+def iter_batches(source, batch_size=100_000, columns=None):
+    """Yield DataFrames of at most batch_size rows from DataFrame or parquet.
+
+    Parameters
+    ----------
+    source : pd.DataFrame or List
+        DataFrame, or paths to parquet files (eg. processed store parts)
+    """
+    if isinstance(source, pd.DataFrame):
+        df = source[columns] if columns else source
+        for start in range(0, len(df), batch_size):
+            end = start + batch_size
+            yield df.iloc[start:end]
+        return
+    for filepath in source:
+        parquet_file = pq.ParquetFile(filepath)
+        for batch in parquet_file.iter_batches(
+            batch_size=batch_size, columns=columns
+        ):
+            yield batch.to_pandas()
+
+
+def quote_identifier(name, dialect):
+    """Quote table or column name for SQL query."""
+    if dialect == "mysql":
+        return f"`{name}`"
+    return f'"{name}"'
+
+
+def get_staging_table_name(table_name):
+    """Get name of staging table used to load into table_name."""
+    return f"{table_name}_staging"
+
+
+def get_create_staging_table_queries(table_name, dialect):
+    """Get queries to (re-)create empty staging table like target table."""
+    staging = quote_identifier(get_staging_table_name(table_name), dialect)
+    table = quote_identifier(table_name, dialect)
+    drop_query = f"DROP TABLE IF EXISTS {staging}"
+    if dialect == "mysql":
+        return [drop_query, f"CREATE TABLE {staging} LIKE {table}"]
+    if dialect == "postgresql":
+        return [
+            drop_query,
+            f"CREATE UNLOGGED TABLE {staging} "
+            f"(LIKE {table} INCLUDING DEFAULTS)",
+        ]
+    return [
+        drop_query,
+        f"CREATE TABLE {staging} AS SELECT * FROM {table} WHERE 0",
+    ]
+
+
+def get_upsert_query(table_name, columns, key_col, dialect):
+    """Get query to upsert rows of staging table into target table."""
+    staging = quote_identifier(get_staging_table_name(table_name), dialect)
+    table = quote_identifier(table_name, dialect)
+    cols = [quote_identifier(c, dialect) for c in columns]
+    cols_str = ", ".join(cols)
+    non_key_cols = [c for c in cols if c != quote_identifier(key_col, dialect)]
+    insert_query = (
+        f"INSERT INTO {table} ({cols_str}) SELECT {cols_str} FROM {staging}"
+    )
+    if dialect == "mysql":
+        updates = ", ".join(f"{c} = VALUES({c})" for c in non_key_cols)
+        return f"{insert_query} ON DUPLICATE KEY UPDATE {updates}"
+    updates = ", ".join(f"{c} = excluded.{c}" for c in non_key_cols)
+    # WHERE true avoids ambiguity of ON CONFLICT after SELECT (SQLite)
+    return (
+        f"{insert_query} WHERE true ON CONFLICT "
+        f"({quote_identifier(key_col, dialect)}) DO UPDATE SET {updates}"
+    )
+
+
+def get_drop_index_query(table_name, index_name, dialect):
+    """Get query to drop an index of a table."""
+    if dialect == "mysql":
+        return (
+            f"DROP INDEX {quote_identifier(index_name, dialect)} ON "
+            f"{quote_identifier(table_name, dialect)}"
+        )
+    return f"DROP INDEX IF EXISTS {quote_identifier(index_name, dialect)}"
+
+
+def get_create_index_query(table_name, index_name, index_cols, dialect):
+    """Get query to create an index of a table."""
+    return (
+        f"CREATE INDEX {quote_identifier(index_name, dialect)} ON "
+        f"{quote_identifier(table_name, dialect)} ({index_cols})"
+    )
+
+
+def write_batch_to_csv(df, f, dialect):
+    """Write batch to CSV file (object) for LOAD DATA or COPY."""
+    if dialect == "mysql":
+        # LOAD DATA treats backslash as an escape character
+        str_cols = list(df.select_dtypes(["object", "string"]))
+        df = df.assign(
+            **{
+                c: df[c].map(
+                    lambda v: v.replace("\\", "\\\\")
+                    if isinstance(v, str)
+                    else v
+                )
+                for c in str_cols
+            }
+        )
+    df.to_csv(f, index=False, header=False, na_rep=NULL_MARKER)
+
+
+def load_batch_mysql(cursor, df, table_name, work_dir=None):
+    """Load batch into MySQL table with LOAD DATA LOCAL INFILE.
+
+    The connection must be opened with allow_local_infile=True, and
+    local_infile must be enabled on the server.
+    """
+    cols_str = ", ".join(quote_identifier(c, "mysql") for c in df.columns)
+    with tempfile.NamedTemporaryFile(
+        "w",
+        suffix=".csv",
+        dir=work_dir,
+        delete=False,
+        encoding="utf-8",
+        newline="",
+    ) as f:
+        write_batch_to_csv(df, f, "mysql")
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{f.name}' "
+            f"INTO TABLE {quote_identifier(table_name, 'mysql')} "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            "ESCAPED BY '\\\\' "
+            "LINES TERMINATED BY '\\n' "
+            f"({cols_str})"
+        )
+    finally:
+        os.remove(f.name)
+
+
+def load_batch_postgresql(cursor, df, table_name):
+    """Load batch into PostgreSQL table with COPY (psycopg2 cursor)."""
+    cols_str = ", ".join(quote_identifier(c, "postgresql") for c in df.columns)
+    f = io.StringIO()
+    write_batch_to_csv(df, f, "postgresql")
+    f.seek(0)
+    cursor.copy_expert(
+        f"COPY {quote_identifier(table_name, 'postgresql')} ({cols_str}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+        f,
+    )
+
+
+def load_batch_sqlite(cursor, df, table_name):
+    """Load batch into SQLite table with executemany."""
+    cols_str = ", ".join(quote_identifier(c, "sqlite") for c in df.columns)
+    placeholders = ", ".join(["?"] * len(df.columns))
+    records = df.astype(object).where(df.notna(), None).to_numpy().tolist()
+    cursor.executemany(
+        f"INSERT INTO {quote_identifier(table_name, 'sqlite')} ({cols_str}) "
+        f"VALUES ({placeholders})",
+        records,
+    )
+
+
+def load_batch(cursor, df, table_name, dialect, work_dir=None):
+    """Load batch into table with the bulk path of the database."""
+    if dialect == "mysql":
+        load_batch_mysql(cursor, df, table_name, work_dir)
+    elif dialect == "postgresql":
+        load_batch_postgresql(cursor, df, table_name)
+    elif dialect == "sqlite":
+        load_batch_sqlite(cursor, df, table_name)
+    else:
+        raise ValueError(f"Unsupported database dialect {dialect}")
+
+
+def get_last_key_positions(source, key_col, batch_size=100_000):
+    """Get position (in the whole source) of the last row of each key."""
+    last_positions = {}
+    start = 0
+    for df in iter_batches(source, batch_size, [key_col]):
+        end = start + len(df)
+        df_keys = (
+            df.assign(position=range(start, end))
+            .dropna(subset=[key_col])
+            .drop_duplicates(subset=[key_col], keep="last")
+        )
+        last_positions.update(zip(df_keys[key_col], df_keys["position"]))
+        start = end
+    return last_positions
+
+
+def drop_duplicate_keys(df, key_col, last_positions, start):
+    """Drop rows with a missing key or a key found again later in source.
+
+    start is the position of the first row of df in the whole source.
+    """
+    end = start + len(df)
+    is_last = df[key_col].map(last_positions) == range(start, end)
+    return df[is_last.to_numpy()]
+
+
+def bulk_load_table(
+    cnx,
+    dialect,
+    table_name,
+    source,
+    key_col="app_id",
+    batch_size=100_000,
+    columns=None,
+    use_staging=True,
+    rebuild_indexes=None,
+    work_dir=None,
+):
+    """
+    Load DataFrame or parquet files into table, upserting on key column.
+
+    Parameters
+    ----------
+    cnx : DB-API connection
+        mysql.connector (with allow_local_infile=True), psycopg2 or sqlite3
+        connection
+    dialect : str
+        Type of database (mysql, postgresql or sqlite)
+    table_name : str
+        Name of target table, which must have a unique index on key_col
+    source : pd.DataFrame or List
+        DataFrame, or paths to parquet files (eg. processed store parts)
+    key_col : str
+        Column on which rows are upserted
+    batch_size : int
+        Number of rows loaded with each bulk load command
+    columns : List
+        (Optional) Columns to be loaded (defaults to all columns of source)
+    use_staging : bool
+        Whether to load into a staging table and upsert into the target
+        table (otherwise, rows are appended directly to the target table)
+    rebuild_indexes : Dict
+        (Optional) Secondary indexes of target table (index name mapped to
+        indexed columns) that are dropped before and re-created after the
+        load
+    work_dir : str
+        (Optional) Directory for temporary CSV files (MySQL only)
+
+    Usage
+    -----
+    > cnx = mysql.connector.connect(..., allow_local_infile=True)
+    > bulk_load_table(cnx, "mysql", "listings", df, key_col="app_id")
+
+    Notes
+    -----
+    1. Rows with a missing key are not loaded, and only the last row of
+       each key is loaded (eg. latest row of a listing, if processed store
+       parts are in the order in which they were appended), as with
+       upserts. Keys are read in a first pass over source.
+    2. For MySQL, unique and foreign key checks are disabled while loading
+       the staging table only, and re-enabled before the upsert (which
+       relies on the unique index on key_col).
+    """
+    start_time = time.time()
+    cursor = cnx.cursor()
+    load_table_name = (
+        get_staging_table_name(table_name) if use_staging else table_name
+    )
+    last_positions = get_last_key_positions(source, key_col, batch_size)
+    if dialect == "mysql" and use_staging:
+        cursor.execute("SET unique_checks = 0, foreign_key_checks = 0")
+    for index_name in rebuild_indexes or {}:
+        cursor.execute(get_drop_index_query(table_name, index_name, dialect))
+    if use_staging:
+        for query in get_create_staging_table_queries(table_name, dialect):
+            cursor.execute(query)
+
+    num_rows = 0
+    start = 0
+    loaded_columns = None
+    for df in iter_batches(source, batch_size, columns):
+        df_start, start = start, start + len(df)
+        df = drop_duplicate_keys(df, key_col, last_positions, df_start)
+        if df.empty:
+            continue
+        load_batch(cursor, df, load_table_name, dialect, work_dir)
+        loaded_columns = list(df.columns)
+        num_rows += len(df)
+        print(f"Loaded {num_rows:,} rows into {load_table_name}")
+
+    if dialect == "mysql" and use_staging:
+        cursor.execute("SET unique_checks = 1, foreign_key_checks = 1")
+    if use_staging:
+        if loaded_columns:
+            cursor.execute(
+                get_upsert_query(table_name, loaded_columns, key_col, dialect)
+            )
+            print(f"Upserted {num_rows:,} rows into {table_name}")
+        cursor.execute(
+            "DROP TABLE IF EXISTS "
+            f"{quote_identifier(load_table_name, dialect)}"
+        )
+    for index_name, index_cols in (rebuild_indexes or {}).items():
+        cursor.execute(
+            get_create_index_query(table_name, index_name, index_cols, dialect)
+        )
+    cnx.commit()
+    cursor.close()
+    duration = time.time() - start_time
+    print(
+        f"Loaded {num_rows:,} rows into {table_name} in {duration:.3f} sec. "
+        f"({num_rows / max(duration, 1e-6):,.0f} rows/sec.)"
+    )
+    return num_rows
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Dead-letter queue of pages that could not be fetched or scraped.
+
+Every failure is appended to a JSON-lines file as an entry holding the
+URL, stage (fetch, parse, etc.), exception type, number of attempts and
+the earliest time at which it can be retried. Entries are keyed by page
+of search results or listing URL, so the latest line of each key holds
+its current state. Retries then only re-fetch failed pages, instead of
+re-running whole page ranges.
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import json
+import os
+import threading
+import time
+from random import uniform
+
+# Stages at which a failure is permanent (eg. listing is a collection of
+# games), so the entry is never retried
+PERMANENT_STAGES = ["collection"]
+
+
+def get_entry_id(kind, url=None, page=None):
+    """Get key of dead-letter entry (listing URL, or page of results)."""
+    if kind == "search_results":
+        return f"{kind}:{page}"
+    return f"{kind}:{url}"
+
+
+def get_backoff(attempts, base_delay=60, max_delay=6 * 60 * 60):
+    """Get delay (sec.) before next retry, doubling with each attempt."""
+    delay = min(base_delay * 2 ** (attempts - 1), max_delay)
+    # Jitter avoids retrying many failures at the same time
+    return uniform(0.5 * delay, delay)
+
+
+class DeadLetterQueue:
+    """Failures of a crawl, appended to (and loaded from) a JSON-lines file.
+
+    Entries are in one of three states: pending (will be retried),
+    resolved (retried successfully) or exhausted (permanent failure, or
+    max_attempts reached).
+    """
+
+    def __init__(
+        self, filepath, max_attempts=5, base_delay=60, max_delay=6 * 60 * 60
+    ):
+        self.filepath = filepath
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(filepath):
+            with open(filepath) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["id"]] = entry
+
+    def append(self, entry):
+        """Save new state of entry."""
+        with self.lock:
+            self.entries[entry["id"]] = entry
+            with open(self.filepath, "a") as f:
+                f.write(f"{json.dumps(entry, default=str)}\n")
+        return entry
+
+    def record_failure(
+        self,
+        kind,
+        stage,
+        error,
+        url=None,
+        page=None,
+        listing_num=None,
+        retry_after=None,
+    ):
+        """
+        Record failure to fetch or scrape a page.
+
+        Parameters
+        ----------
+        kind : str
+            Type of page (search_results or listing)
+        stage : str
+            Step that failed (eg. fetch, parse, title, empty_page,
+            collection)
+        error : Exception or str
+            Exception raised, or description of failure (eg. HTTP 429)
+        url, page, listing_num
+            URL, page of search results and position on that page
+        retry_after : float
+            (Optional) Minimum delay (sec.) before next retry, eg. from the
+            Retry-After header of a 429 response
+        """
+        # Page numbers read from DataFrames are numpy integers
+        page = None if page is None else int(page)
+        listing_num = None if listing_num is None else int(listing_num)
+        entry_id = get_entry_id(kind, url, page)
+        now = time.time()
+        previous = self.entries.get(entry_id, {})
+        attempts = previous.get("attempts", 0) + 1
+        delay = get_backoff(attempts, self.base_delay, self.max_delay)
+        if retry_after:
+            delay = max(delay, retry_after)
+        is_exhausted = (
+            stage in PERMANENT_STAGES or attempts >= self.max_attempts
+        )
+        return self.append(
+            {
+                "id": entry_id,
+                "kind": kind,
+                "url": url,
+                "page": page,
+                "listing_num": listing_num,
+                "stage": stage,
+                "error_type": type(error).__name__
+                if isinstance(error, Exception)
+                else "Failure",
+                "error": str(error),
+                "attempts": attempts,
+                "first_failed_at": previous.get("first_failed_at", now),
+                "last_failed_at": now,
+                "next_retry_at": now + delay,
+                "status": "exhausted" if is_exhausted else "pending",
+            }
+        )
+
+    def resolve(self, entry_id):
+        """Mark entry as retried successfully (if it is not already)."""
+        entry = self.entries.get(entry_id)
+        if entry is None or entry["status"] == "resolved":
+            return entry
+        return self.append(
+            dict(entry, status="resolved", resolved_at=time.time())
+        )
+
+    def get_pending(self):
+        """Get entries that will be retried, earliest first."""
+        return sorted(
+            (e for e in self.entries.values() if e["status"] == "pending"),
+            key=lambda e: e["next_retry_at"],
+        )
+
+    def get_due(self, now=None):
+        """Get pending entries whose backoff has elapsed."""
+        now = now or time.time()
+        return [e for e in self.get_pending() if e["next_retry_at"] <= now]
+
+    def get_status_counts(self):
+        """Get number of entries in each state."""
+        status_counts = {}
+        for entry in self.entries.values():
+            status = entry["status"]
+            status_counts[status] = status_counts.get(status, 0) + 1
+        return status_counts
+
+    def compact(self):
+        """Rewrite file with only the latest line of each entry."""
+        with self.lock:
+            tmp_filepath = f"{self.filepath}.tmp"
+            with open(tmp_filepath, "w") as f:
+                for entry in self.entries.values():
+                    f.write(f"{json.dumps(entry, default=str)}\n")
+            os.replace(tmp_filepath, self.filepath)
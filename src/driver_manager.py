@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Long-lived Chrome sessions with a persistent profile per identity.
+
+The browser profile (cookies, HTTP disk cache, etc.) and user agent of each
+identity are kept on disk, so a new session (after a session is recycled,
+or in a later run) starts with the store's CSS, JS and fonts already in
+its cache. Sessions are health-checked between pages, and recycled after a
+number of pages or if the memory used by the page grows too large.
+
+Usage
+-----
+> with DriverManager(webdriver_path, "data/browser_profiles") as manager:
+      driver = manager.get("https://store.steampowered.com/search/")
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+# pylint: disable=too-many-instance-attributes
+
+
+import json
+import os
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from src.crawl_metrics import log_event, metrics
+from src.webscraping_utils import get_random_user_agent
+
+# Size (in bytes) of the JavaScript heap of the loaded page (0 if unknown)
+HEAP_SIZE_SCRIPT = (
+    "return window.performance && performance.memory ? "
+    "performance.memory.usedJSHeapSize : 0;"
+)
+
+
+def get_profile_dir(profile_root, identity):
+    """Get directory of browser profile of identity (created if needed)."""
+    profile_dir = os.path.abspath(os.path.join(profile_root, identity))
+    os.makedirs(profile_dir, exist_ok=True)
+    return profile_dir
+
+
+def load_identity(profile_dir):
+    """Get settings of identity (eg. user agent), choosing them only once."""
+    identity_filepath = os.path.join(profile_dir, "identity.json")
+    if os.path.exists(identity_filepath):
+        with open(identity_filepath) as f:
+            return json.load(f)
+    identity = {"user_agent": get_random_user_agent()}
+    with open(identity_filepath, "w") as f:
+        json.dump(identity, f, indent=1)
+    return identity
+
+
+def get_chrome_options(
+    profile_dir, user_agent=None, headless=False, cache_size_mb=512
+):
+    """Get Chrome options using a persistent profile and disk cache."""
+    options = Options()
+    if headless:
+        options.add_argument("--headless")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--no-sandbox")  # Bypass OS security model
+    options.add_argument("--disable-gpu")  # applicable to windows os only
+    options.add_argument("start-maximized")
+    options.add_argument("disable-infobars")
+    options.add_argument("--disable-extensions")
+    options.add_argument("--proxy-server='direct://'")
+    options.add_argument("--proxy-bypass-list=*")
+    # Profile and cache persist between sessions (not incognito)
+    options.add_argument(f"--user-data-dir={profile_dir}")
+    options.add_argument(
+        f"--disk-cache-dir={os.path.join(profile_dir, 'cache')}"
+    )
+    options.add_argument(f"--disk-cache-size={cache_size_mb * 1024 * 1024}")
+    options.add_experimental_option(
+        "prefs",
+        {"profile.default_content_setting_values.notifications": 2},
+    )
+    if user_agent:
+        options.add_argument(f"user-agent={user_agent}")
+    return options
+
+
+class DriverManager:
+    """
+    Chrome session of a single identity, started once and recycled as needed.
+
+    Parameters
+    ----------
+    webdriver_path : str
+        Path to chromedriver
+    profile_root : str
+        Directory holding the browser profile of each identity
+    identity : str
+        Name of identity (only one session can use a profile at a time)
+    max_pages : int
+        Number of pages loaded after which the session is recycled
+    max_heap_mb : float
+        JavaScript heap size (MB) of the loaded page, above which the
+        session is recycled
+    headless : bool
+        Whether to run Chrome in headless mode
+    cache_size_mb : int
+        Maximum size (MB) of the HTTP disk cache of the profile
+    """
+
+    def __init__(
+        self,
+        webdriver_path,
+        profile_root=os.path.join("data", "browser_profiles"),
+        identity="default",
+        max_pages=250,
+        max_heap_mb=1024,
+        headless=False,
+        cache_size_mb=512,
+    ):
+        self.webdriver_path = webdriver_path
+        self.identity = identity
+        self.max_pages = max_pages
+        self.max_heap_mb = max_heap_mb
+        self.profile_dir = get_profile_dir(profile_root, identity)
+        self.options = get_chrome_options(
+            self.profile_dir,
+            load_identity(self.profile_dir)["user_agent"],
+            headless,
+            cache_size_mb,
+        )
+        self.driver = None
+        self.num_pages = 0
+        self.num_sessions = 0
+
+    def start(self):
+        """Start new browser session, with the profile of the identity."""
+        self.driver = webdriver.Chrome(
+            executable_path=self.webdriver_path, options=self.options
+        )
+        self.num_pages = 0
+        self.num_sessions += 1
+        log_event(
+            "driver_started",
+            f"Started browser session {self.num_sessions} of identity "
+            f"{self.identity}",
+            identity=self.identity,
+            num_sessions=self.num_sessions,
+        )
+        return self.driver
+
+    def quit(self):
+        """End browser session, if any (the profile is kept on disk)."""
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+
+    def recycle(self, reason):
+        """End browser session and start a new one."""
+        metrics.inc("steam_driver_recycles_total", reason=reason)
+        log_event(
+            "driver_recycled",
+            f"Recycling browser session after {self.num_pages} pages "
+            f"({reason})",
+            identity=self.identity,
+            reason=reason,
+            num_pages=self.num_pages,
+        )
+        self.quit()
+        return self.start()
+
+    def get_heap_mb(self):
+        """Get JavaScript heap size (MB) of loaded page (None if unhealthy)."""
+        try:
+            return self.driver.execute_script(HEAP_SIZE_SCRIPT) / 1024 / 1024
+        except Exception:
+            return None
+
+    def get_driver(self):
+        """
+        Get healthy browser session, starting or recycling it if needed.
+
+        Notes
+        -----
+        1. Call between tasks (eg. before loading each page). The health
+           check is a single script call.
+        """
+        if self.driver is None:
+            return self.start()
+        if self.num_pages >= self.max_pages:
+            return self.recycle("max_pages")
+        heap_mb = self.get_heap_mb()
+        if heap_mb is None:
+            return self.recycle("unhealthy")
+        if heap_mb > self.max_heap_mb:
+            return self.recycle("memory")
+        return self.driver
+
+    def get(self, url):
+        """Load page in a healthy browser session."""
+        driver = self.get_driver()
+        driver.get(url)
+        self.num_pages += 1
+        return driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.quit()
@@ -8,6 +8,9 @@
 # pylint: disable=invalid-name,broad-except
 
 
+from src.crawl_metrics import log_event, metrics
+
+
 def dict_failed_extraction_from_search_results():
     """
     Return a dict of Nones for all attributes expected from search results.
@@ -65,4 +68,26 @@ def dict_failed_extraction_from_listing_page():
         "Developer": None,
         "Publisher": None,
         "Franchise": None,
+        "failed_fields": None,
+        "missing_fields": None,
+        "completeness": None,
     }
+
+
+def record_failed_fields(listing_details, **listing_info):
+    """Count and log attributes of listing that could not be extracted."""
+    failed_fields = listing_details.get("failed_fields")
+    if not isinstance(failed_fields, str):
+        return []
+    failed_fields = failed_fields.split(", ")
+    for field in failed_fields:
+        metrics.inc("steam_field_errors_total", field=field)
+    log_event(
+        "listing_partial",
+        f"Could not extract {len(failed_fields)} attributes of listing "
+        f"{listing_info.get('listing_num')}: {', '.join(failed_fields)}",
+        failed_fields=failed_fields,
+        completeness=listing_details["completeness"],
+        **listing_info,
+    )
+    return failed_fields
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Local mock of the Steam store, for offline crawl load tests.
+
+Serves pages of search results (/search/?...&page=N) and listing pages
+(/app/<app_id>/<title>/), the app list (/ISteamApps/GetAppList/v2/) and
+sitemaps listed in /robots.txt, with configurable latency, rate-limiting (429)
+and server error (500) responses, and age gates shown to requests without
+an age-check cookie. Pages are generated from templates, or read from
+recorded HTML files (search*.html and listing*.html) in a directory.
+
+Usage
+-----
+> python3 -m src.mock_steam_server --port 8080 --latency-ms 50 \
+      --error-429-pct 2
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import argparse
+import json
+import os
+import threading
+import time
+from glob import glob
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from random import Random
+from urllib.parse import parse_qs, urlparse
+
+# Settings used for any key not specified
+DEFAULT_SETTINGS = {
+    # Number of pages of search results (last page shown in pagination)
+    "num_pages": 100,
+    "listings_per_page": 25,
+    # Median and spread (sigma of log-normal distribution) of latency
+    "latency_ms": 50,
+    "latency_sigma": 0.5,
+    # Percent of responses that are delayed by slow_latency_ms
+    "slow_pct": 1.0,
+    "slow_latency_ms": 2000,
+    # Percent of responses replaced by errors
+    "error_429_pct": 1.0,
+    "error_500_pct": 0.5,
+    # Percent of listings behind an age gate
+    "age_gate_pct": 5.0,
+    # Number of listing URLs per sitemap (listed in a sitemap index)
+    "sitemap_size": 500,
+    # Directory with recorded search*.html and listing*.html pages
+    "pages_dir": None,
+    "seed": 42,
+}
+
+# Cookies with which age gates are not shown
+AGE_CHECK_COOKIES = ["birthtime", "lastagecheckage"]
+
+SEARCH_RESULT_ROW = """
+<a href="{store_url}/app/{app_id}/{title}/" data-ds-appid="{app_id}"
+   class="search_result_row ds_collapse_flag">
+ <div class="responsive_search_name_combined">
+  <div class="col search_name ellipsis">
+   <span class="title">{title}</span>
+   <p><span class="platform_img win"></span>
+      <span class="platform_img mac"></span></p>
+  </div>
+  <div class="col search_released responsive_secondrow">
+   {release_date}</div>
+  <div class="col search_price_discount_combined responsive_secondrow">
+   <div class="col search_discount responsive_secondrow">
+    <span>-{discount_pct}%</span></div>
+   <div class="col search_price discounted responsive_secondrow">
+    $ {original_price}$ {discount_price}</div>
+  </div>
+ </div>
+</a>
+"""
+
+SEARCH_PAGE = """<!DOCTYPE html>
+<html><head><title>Search</title></head><body>
+<div id="search_resultsRows">{rows}</div>
+<div class="search_pagination">
+ <div class="search_pagination_left">
+  showing {first_listing} - {last_listing} of {total_listings}
+ </div>
+ <div class="search_pagination_right">
+  <a href="?page=1">1</a> <a href="?page=2">2</a>
+  <a href="?page={num_pages}">{num_pages}</a> <a href="?page=2">&gt;</a>
+ </div>
+</div>
+</body></html>
+"""
+
+LISTING_PAGE = """<!DOCTYPE html>
+<html><head><title>{title} on Steam</title></head><body>
+<div class="summary_section">
+ <span class="game_review_summary positive"
+  data-tooltip-html="{review_tooltip}"
+  >Very Positive</span>
+ <span class="responsive_hidden">({num_reviews})</span>
+</div>
+<div class="user_reviews_filter_score visible"><div>
+ <span data-tooltip-html="{review_tooltip}"
+  >Very Positive</span>
+</div></div>
+<label for="review_type_all">All
+ <span class="user_reviews_count">({num_reviews})</span></label>
+<label for="review_type_positive">Positive
+ <span class="user_reviews_count">({num_positive})</span></label>
+<label for="review_type_negative">Negative
+ <span class="user_reviews_count">({num_negative})</span></label>
+<label for="review_language_mine">Your Languages
+ <span class="user_reviews_count">({num_reviews})</span></label>
+<div class="game_area_purchase_platform">
+ <span class="platform_img win"></span><span class="platform_img mac"></span>
+</div>
+<div class="game_area_purchase_game"><div class="game_purchase_action">
+ <div class="discount_block game_purchase_discount">
+  <div class="discount_pct">-{discount_pct}%</div>
+  <div class="discount_prices">
+   <div class="discount_original_price">${original_price}</div>
+   <div class="discount_final_price">${discount_price}</div>
+  </div></div>
+</div></div>
+<div class="popular_tags"><a>Indie</a> <a>Action</a> <a>Casual</a></div>
+<div id="bannerAchievements" class="responsive_banner_link">
+ <span>Includes {num_achievements} Steam Achievements</span></div>
+<div class="DRM_notice"><div>Requires 3rd-Party EULA</div></div>
+<div class="details_block"><div id="genresAndManufacturer">
+<b>Title:</b> {title}<br>
+<b>Genre:</b> <span><a>Action</a>, <a>Indie</a></span><br>
+<b>Developer:</b> <a>Mock Studio {app_id}</a><br>
+<b>Publisher:</b> <a>Mock Publisher</a><br>
+<b>Release Date:</b> 1 Jan, 2021<br>
+</div></div>
+<div id="languageTable"><table>
+ <tr><th></th><th>Interface</th><th>Full Audio</th><th>Subtitles</th></tr>
+ <tr><td>English</td><td>&#10004;</td><td>&#10004;</td><td>&#10004;</td></tr>
+ <tr><td>French</td><td>&#10004;</td><td></td><td>&#10004;</td></tr>
+</table></div>
+<div class="game_area_description">{description}</div>
+</body></html>
+"""
+
+AGE_GATE_PAGE = """<!DOCTYPE html>
+<html><head><title>Site Error</title></head><body>
+<div class="agegate_birthday_selector">
+ <h2>Please enter your birth date to continue:</h2>
+ <select id="ageDay">{days}</select>
+ <select id="ageMonth">{months}</select>
+ <select id="ageYear">{years}</select>
+</div>
+<div class="agegate_text_container btns">
+ <a class="btnv6_blue_hoverfade" href="#">View Page</a></div>
+</body></html>
+"""
+
+MONTHS = [
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+]
+
+
+def get_options_html(values):
+    """Get option elements of a select element."""
+    return "".join(f"<option>{v}</option>" for v in values)
+
+
+def load_recorded_pages(pages_dir):
+    """Load recorded search results and listing pages from directory."""
+    if not pages_dir:
+        return {"search": [], "listing": []}
+    recorded_pages = {}
+    for page_type in ["search", "listing"]:
+        recorded_pages[page_type] = []
+        for filepath in sorted(
+            glob(os.path.join(pages_dir, f"{page_type}*.html"))
+        ):
+            with open(filepath, "rb") as f:
+                recorded_pages[page_type].append(f.read())
+    return recorded_pages
+
+
+def get_search_page_html(page, settings, store_url):
+    """Get generated page of search results."""
+    rows = []
+    for k in range(settings["listings_per_page"]):
+        app_id = page * 1000 + k
+        rows.append(
+            SEARCH_RESULT_ROW.format(
+                store_url=store_url,
+                app_id=app_id,
+                title=f"Mock_Game_{app_id}",
+                release_date=f"{1 + k} Jan, 2021",
+                discount_pct=10 * (k % 9),
+                original_price=f"{20 + k}.99",
+                discount_price=f"{10 + k}.99",
+            )
+        )
+    listings_per_page = settings["listings_per_page"]
+    return SEARCH_PAGE.format(
+        rows="".join(rows),
+        num_pages=settings["num_pages"],
+        first_listing=(page - 1) * listings_per_page + 1,
+        last_listing=page * listings_per_page,
+        total_listings=settings["num_pages"] * listings_per_page,
+    )
+
+
+def get_listing_page_html(app_id):
+    """Get generated listing page."""
+    num_reviews = 1000 + app_id % 5000
+    num_positive = num_reviews * 9 // 10
+    return LISTING_PAGE.format(
+        title=f"Mock Game {app_id}",
+        app_id=app_id,
+        review_tooltip=(
+            f"90% of the {num_reviews:,} user reviews for this game are "
+            "positive."
+        ),
+        num_reviews=f"{num_reviews:,}",
+        num_positive=f"{num_positive:,}",
+        num_negative=f"{num_reviews - num_positive:,}",
+        num_achievements=app_id % 50,
+        # Same prices as in search results
+        discount_pct=10 * (app_id % 1000 % 9),
+        original_price=f"{20 + app_id % 1000}.99",
+        discount_price=f"{10 + app_id % 1000}.99",
+        # Pad listing page to size of a real one (~100 kB)
+        description="<p>Lorem ipsum dolor sit amet.</p>" * 2500,
+    )
+
+
+def get_app_ids(settings):
+    """Get ids of all listings shown in search results."""
+    return [
+        page * 1000 + k
+        for page in range(1, settings["num_pages"] + 1)
+        for k in range(settings["listings_per_page"])
+    ]
+
+
+def get_app_list_json(settings):
+    """Get generated app list (as in ISteamApps/GetAppList/v2)."""
+    apps = [
+        {"appid": app_id, "name": f"Mock Game {app_id}"}
+        for app_id in get_app_ids(settings)
+    ]
+    return json.dumps({"applist": {"apps": apps}})
+
+
+def get_sitemap_xml(settings, store_url, sitemap_num=None):
+    """Get generated sitemap index (sitemap_num None) or sitemap."""
+    app_ids = get_app_ids(settings)
+    size = settings["sitemap_size"]
+    if sitemap_num is None:
+        entries = [
+            f"<sitemap><loc>{store_url}/sitemaps/sitemap_{k}.xml</loc>"
+            "</sitemap>"
+            for k in range((len(app_ids) + size - 1) // size)
+        ]
+        tag = "sitemapindex"
+    else:
+        first, last = sitemap_num * size, (sitemap_num + 1) * size
+        entries = [
+            f"<url><loc>{store_url}/app/{app_id}/Mock_Game_{app_id}/</loc>"
+            f"<lastmod>2021-01-{1 + app_id % 28:02d}</lastmod></url>"
+            for app_id in app_ids[first:last]
+        ]
+        tag = "urlset"
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<{tag} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"{''.join(entries)}</{tag}>"
+    )
+
+
+def get_age_gate_html():
+    """Get generated age gate page."""
+    return AGE_GATE_PAGE.format(
+        days=get_options_html(range(1, 32)),
+        months=get_options_html(MONTHS),
+        years=get_options_html(range(1900, 2022)),
+    )
+
+
+class MockSteamServer(ThreadingHTTPServer):
+    """HTTP server holding settings, random state and recorded pages."""
+
+    daemon_threads = True
+
+    def __init__(self, server_address, settings):
+        super().__init__(server_address, MockSteamHandler)
+        self.settings = dict(DEFAULT_SETTINGS, **(settings or {}))
+        self.random = Random(self.settings["seed"])
+        self.random_lock = threading.Lock()
+        self.recorded_pages = load_recorded_pages(self.settings["pages_dir"])
+        self.store_url = f"http://127.0.0.1:{self.server_port}"
+
+    def draw(self):
+        """Draw random latency (sec.) and error status (None if no error)."""
+        settings = self.settings
+        with self.random_lock:
+            latency = (
+                settings["latency_ms"]
+                * self.random.lognormvariate(0, settings["latency_sigma"])
+                / 1000
+            )
+            if self.random.uniform(0, 100) < settings["slow_pct"]:
+                latency += settings["slow_latency_ms"] / 1000
+            error_draw = self.random.uniform(0, 100)
+        if error_draw < settings["error_429_pct"]:
+            return [latency, 429]
+        if error_draw < settings["error_429_pct"] + settings["error_500_pct"]:
+            return [latency, 500]
+        return [latency, None]
+
+    def is_age_gated(self, app_id):
+        """Check if listing is behind an age gate (same for every request)."""
+        return (
+            Random(f"{self.settings['seed']}-{app_id}").uniform(0, 100)
+            < self.settings["age_gate_pct"]
+        )
+
+
+class MockSteamHandler(BaseHTTPRequestHandler):
+    """Serve search results, listing and age gate pages."""
+
+    def do_GET(self):
+        server = self.server
+        latency, error_status = server.draw()
+        time.sleep(latency)
+        if error_status:
+            self.send_html(
+                f"<html><body>Error {error_status}</body></html>".encode(),
+                error_status,
+            )
+            return
+        url = urlparse(self.path)
+        path_parts = [p for p in url.path.split("/") if p]
+        if path_parts[:1] == ["search"]:
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            recorded = server.recorded_pages["search"]
+            if recorded:
+                body = recorded[(page - 1) % len(recorded)]
+            else:
+                body = get_search_page_html(
+                    page, server.settings, server.store_url
+                ).encode()
+            self.send_html(body)
+        elif path_parts[:1] == ["app"] and len(path_parts) >= 2:
+            app_id = int(path_parts[1])
+            cookies = SimpleCookie(self.headers.get("Cookie", ""))
+            recorded = server.recorded_pages["listing"]
+            if server.is_age_gated(app_id) and not any(
+                c in cookies for c in AGE_CHECK_COOKIES
+            ):
+                body = get_age_gate_html().encode()
+            elif recorded:
+                body = recorded[app_id % len(recorded)]
+            else:
+                body = get_listing_page_html(app_id).encode()
+            self.send_html(body)
+        elif path_parts[-3:] == ["ISteamApps", "GetAppList", "v2"]:
+            self.send_html(
+                get_app_list_json(server.settings).encode(),
+                content_type="application/json",
+            )
+        elif path_parts == ["robots.txt"]:
+            self.send_html(
+                f"User-agent: *\nSitemap: {server.store_url}/sitemap_index.xml"
+                "\n".encode(),
+                content_type="text/plain",
+            )
+        elif path_parts == ["sitemap_index.xml"] or path_parts[:1] == [
+            "sitemaps"
+        ]:
+            sitemap_num = (
+                int(path_parts[1].split("_")[1].split(".")[0])
+                if len(path_parts) == 2
+                else None
+            )
+            self.send_html(
+                get_sitemap_xml(
+                    server.settings, server.store_url, sitemap_num
+                ).encode(),
+                content_type="application/xml",
+            )
+        else:
+            self.send_html(b"<html><body>Not Found</body></html>", 404)
+
+    def send_html(self, body, status=200, content_type="text/html"):
+        """Send HTML (or other content_type) response."""
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Do not print a line per request."""
+
+
+def start_mock_server(settings=None, port=0, host="127.0.0.1"):
+    """Start mock server in a daemon thread (port=0 picks a free port)."""
+    server = MockSteamServer((host, port), settings)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main(argv=None):
+    """Run mock server from the command line, until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument(
+        "--settings", help="path to JSON file with server settings"
+    )
+    for setting, value in DEFAULT_SETTINGS.items():
+        parser.add_argument(
+            f"--{setting.replace('_', '-')}",
+            dest=setting,
+            type=type(value) if value is not None else str,
+        )
+    args = vars(parser.parse_args(argv))
+    port = args.pop("port")
+    settings = {}
+    settings_filepath = args.pop("settings")
+    if settings_filepath:
+        with open(settings_filepath) as f:
+            settings.update(json.load(f))
+    settings.update({k: v for k, v in args.items() if v is not None})
+    server = MockSteamServer(("127.0.0.1", port), settings)
+    # First line of output is read by the load test to get the server URL
+    print(server.store_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Benchmark of the browser navigation helpers, against a fake driver.
+
+The navigation flows (random hovers, tag and feature filters, sorting and
+scrolling) are run in simulated time (see src.navigation_clock), against a
+fake driver that counts WebDriver calls. Each run takes milliseconds,
+instead of the minutes spent pausing against a real browser.
+
+Usage
+-----
+> python3 -m src.navigation_benchmark --runs 20
+> python3 -m src.navigation_benchmark --round-trip-ms 25 \
+      --output navigation_benchmark_report.json
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+# pylint: disable=unused-argument
+
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from itertools import count
+
+import numpy as np
+from selenium.webdriver.remote.webelement import WebElement
+
+import src.navigation_clock as nc
+import src.selenium_helpers as sh
+import src.single_page_navigation_helpers as snh
+
+element_ids = count()
+
+
+class FakeElement(WebElement):
+    """Element of a fake page, whose lookups return new fake elements."""
+
+    def __init__(self, driver, num_children=30):
+        super().__init__(driver, f"fake-element-{next(element_ids)}")
+        self.num_children = num_children
+
+    @property
+    def text(self):
+        self.parent.record_call("text")
+        return "1"
+
+    def click(self):
+        self.parent.record_call("click")
+
+    def get_attribute(self, name):
+        self.parent.record_call("get_attribute")
+        return ""
+
+    def find_element(self, by=None, value=None):
+        self.parent.record_call("find_element")
+        return FakeElement(self.parent, self.num_children)
+
+    def find_elements(self, by=None, value=None):
+        self.parent.record_call("find_elements")
+        return [
+            FakeElement(self.parent, self.num_children)
+            for _ in range(self.num_children)
+        ]
+
+    def find_element_by_xpath(self, xpath):
+        return self.find_element("xpath", xpath)
+
+    def find_element_by_tag_name(self, name):
+        return self.find_element("tag name", name)
+
+    def find_elements_by_xpath(self, xpath):
+        return self.find_elements("xpath", xpath)
+
+    def find_elements_by_tag_name(self, name):
+        return self.find_elements("tag name", name)
+
+
+class FakeDriver:
+    """
+    Fake WebDriver that records the number of calls of each type.
+
+    Notes
+    -----
+    1. Every call is a round-trip to the browser with a real driver.
+    2. Scroll scripts (see src.selenium_helpers.SCROLL_TRAJECTORY_SCRIPT)
+       move the current clock forward by their total duration, as the
+       browser would take this time to return.
+    """
+
+    def __init__(self, page_height=6000, num_children=30):
+        self.page_height = page_height
+        self.num_children = num_children
+        self.calls = {}
+        self.current_url = "https://store.steampowered.com/search/?page=1"
+        self.page_source = "<html></html>"
+
+    def record_call(self, name):
+        """Count a WebDriver call."""
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def get_num_calls(self):
+        """Get total number of WebDriver calls."""
+        return sum(self.calls.values())
+
+    def execute(self, driver_command, params=None):
+        """Run a WebDriver command (eg. mouse actions of ActionChains)."""
+        self.record_call(driver_command)
+        return {"value": None}
+
+    def execute_script(self, script, *args):
+        self.record_call("execute_script")
+        if "scrollHeight" in script and script.startswith("return"):
+            return self.page_height
+        return None
+
+    def execute_async_script(self, script, *args):
+        self.record_call("execute_async_script")
+        if script == sh.SCROLL_TRAJECTORY_SCRIPT:
+            nc.sleep(sum(args[1]) / 1000)
+        return None
+
+    def set_script_timeout(self, time_to_wait):
+        self.record_call("set_script_timeout")
+
+    def find_element_by_xpath(self, xpath):
+        self.record_call("find_element")
+        return FakeElement(self, self.num_children)
+
+    def find_element_by_class_name(self, name):
+        return self.find_element_by_xpath(name)
+
+    def find_elements_by_xpath(self, xpath):
+        self.record_call("find_elements")
+        return [
+            FakeElement(self, self.num_children)
+            for _ in range(self.num_children)
+        ]
+
+    def find_elements_by_class_name(self, name):
+        return self.find_elements_by_xpath(name)
+
+
+# Navigation flows to benchmark, as functions of the driver
+NAVIGATION_FLOWS = {
+    "perform_random_navigation_on_page": lambda driver: (
+        snh.perform_random_navigation_on_page(driver, 2, 5)
+    ),
+    "randomly_interact_with_tag_based_filters": lambda driver: (
+        snh.randomly_interact_with_tag_based_filters(driver, 2, 6)
+    ),
+    "randomly_interact_with_feature_based_filters": lambda driver: (
+        snh.randomly_interact_with_feature_based_filters(driver, 2, 6)
+    ),
+    "sort_search_results": sh.sort_search_results,
+    "scroll_up_down_page": lambda driver: sh.scroll_up_down_page(
+        driver, scroll_direction="down"
+    ),
+}
+
+
+def run_flow(flow, page_height=6000):
+    """Run navigation flow once in simulated time, against a fake driver."""
+    driver = FakeDriver(page_height)
+    start_time = time.perf_counter()
+    with nc.simulated_clock() as clock, contextlib.redirect_stdout(
+        io.StringIO()
+    ):
+        flow(driver)
+    return {
+        "simulated_delay_sec": clock.total_sleep,
+        "num_pauses": clock.num_sleeps,
+        "num_driver_calls": driver.get_num_calls(),
+        "cpu_ms": (time.perf_counter() - start_time) * 1000,
+    }
+
+
+def run_navigation_benchmark(runs=10, round_trip_ms=10, page_height=6000):
+    """
+    Run each navigation flow many times and summarize its cost.
+
+    Parameters
+    ----------
+    runs : int
+        Number of runs of each flow (flows are randomized)
+    round_trip_ms : float
+        Assumed duration (ms) of a single WebDriver call to a real browser
+    page_height : int
+        Height (pixels) of the fake page, used by scrolling
+
+    Notes
+    -----
+    1. Returns, for each flow, the mean simulated delay (pauses), number of
+       WebDriver calls, estimated duration of these calls (calls x
+       round_trip_ms) and CPU time of the Python code.
+    """
+    report = {}
+    for name, flow in NAVIGATION_FLOWS.items():
+        results = [run_flow(flow, page_height) for _ in range(runs)]
+        summary = {
+            k: float(np.mean([r[k] for r in results])) for k in results[0]
+        }
+        summary["round_trips_ms"] = summary["num_driver_calls"] * round_trip_ms
+        report[name] = summary
+    return report
+
+
+def main(argv=None):
+    """Run navigation benchmark from the command line and print report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--round-trip-ms", type=float, default=10, dest="round_trip_ms"
+    )
+    parser.add_argument(
+        "--page-height", type=int, default=6000, dest="page_height"
+    )
+    parser.add_argument("--output", help="path to JSON report file")
+    args = vars(parser.parse_args(argv))
+    output_filepath = args.pop("output")
+    report = run_navigation_benchmark(**args)
+    report_str = json.dumps(report, indent=1)
+    print(report_str)
+    if output_filepath:
+        with open(output_filepath, "w") as f:
+            f.write(f"{report_str}\n")
+    return report
+
+
+if __name__ == "__main__":
+    main()
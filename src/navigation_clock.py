@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Clock used for the pauses of the (humanized) browser navigation helpers.
+
+By default, pauses are real sleeps. A simulated clock only adds each pause
+to its time, so that navigation flows can be run (eg. against a fake
+driver, see src.navigation_benchmark) without waiting, while recording
+their total delay.
+
+Usage
+-----
+> with simulated_clock() as clock:
+      perform_random_navigation_on_page(driver, 2, 5)
+> print(clock.total_sleep, clock.num_sleeps)
+"""
+
+
+# pylint: disable=invalid-name
+
+
+import time
+from contextlib import contextmanager
+
+
+class RealClock:
+    """Clock that sleeps for each pause."""
+
+    def sleep(self, seconds):
+        """Sleep for a number of seconds."""
+        time.sleep(seconds)
+
+    def time(self):
+        """Get current time (sec.)."""
+        return time.time()
+
+
+class SimulatedClock:
+    """Clock that records each pause, without sleeping."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.total_sleep = 0.0
+        self.num_sleeps = 0
+
+    def sleep(self, seconds):
+        """Move clock forward by a number of seconds."""
+        self.now += seconds
+        self.total_sleep += seconds
+        self.num_sleeps += 1
+
+    def time(self):
+        """Get current (simulated) time (sec.)."""
+        return self.now
+
+
+# Clock used by the navigation helpers
+clock = RealClock()
+
+
+def set_clock(new_clock):
+    """Set clock used by the navigation helpers, and get previous clock."""
+    global clock  # pylint: disable=global-statement
+    previous_clock, clock = clock, new_clock
+    return previous_clock
+
+
+def sleep(seconds):
+    """Pause for a number of seconds, using the current clock."""
+    clock.sleep(seconds)
+
+
+@contextmanager
+def simulated_clock(start=0.0):
+    """Use a simulated clock in the enclosed block."""
+    new_clock = SimulatedClock(start)
+    previous_clock = set_clock(new_clock)
+    try:
+        yield new_clock
+    finally:
+        set_clock(previous_clock)
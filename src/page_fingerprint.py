@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Fingerprints of the parts of listing pages from which attributes are read.
+
+The HTML of a listing changes between crawls even when its attributes do
+not (recommendations, session tokens, etc.). A simhash is computed over
+only the regions read by src.bs4_helpers.scrape_game_listing (details
+block, tags, reviews, languages, price and platforms, etc.), with lxml,
+without building the BeautifulSoup tree of the page. When the fingerprint
+of a listing matches that of its previous crawl, extraction and export of
+the listing can be skipped.
+
+Fingerprints are stored in an append-only JSON-lines file, keyed by app id,
+in which the latest line of each listing holds its current state (as in
+src.dead_letter_queue).
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+import lxml.html
+
+
+def get_class_xpath(tag, class_name):
+    """Get XPath of elements with tag and (one of their) class."""
+    return (
+        f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), "
+        f"' {class_name} ')]"
+    )
+
+
+# Regions of listing page read by the extractors, by name
+FINGERPRINT_REGIONS = {
+    "details": [
+        "//div[@id='genresAndManufacturer']",
+        get_class_xpath("div", "details_block"),
+    ],
+    "tags": [get_class_xpath("div", "popular_tags")],
+    "reviews": [
+        get_class_xpath("div", "summary_section"),
+        get_class_xpath("div", "user_reviews_filter_score"),
+        "//label[starts-with(@for, 'review_')]",
+    ],
+    "languages": ["//div[@id='languageTable']"],
+    "price": [get_class_xpath("div", "game_area_purchase_game")],
+    "platforms": [get_class_xpath("div", "game_area_purchase_platform")],
+    "achievements": ["//div[@id='bannerAchievements']"],
+    "rating": [get_class_xpath("div", "shared_game_rating")],
+    "drm": [get_class_xpath("div", "DRM_notice")],
+}
+
+# Attributes read by the extractors (eg. platform icons, review tooltips)
+FINGERPRINT_ATTRIBUTES = ["class", "data-tooltip-html", "src"]
+
+FINGERPRINT_BITS = 64
+
+
+def get_region_features(root, regions=None):
+    """
+    Get features (shingles of words, and attributes) of regions of page.
+
+    Notes
+    -----
+    1. Words are grouped into shingles of three consecutive words, so that
+       the order of values (eg. positive and negative review counts)
+       matters. Each feature is prefixed with the name of its region.
+    """
+    features = []
+    for region, xpaths in (regions or FINGERPRINT_REGIONS).items():
+        for xpath in xpaths:
+            for element in root.xpath(xpath):
+                words = element.text_content().split() + ["", ""]
+                features += [
+                    f"{region}:{' '.join(shingle)}"
+                    for shingle in zip(words, words[1:], words[2:])
+                ]
+                features += [
+                    f"{region}@{name}={child.get(name)}"
+                    for child in element.iter()
+                    for name in FINGERPRINT_ATTRIBUTES
+                    if child.get(name)
+                ]
+    return features
+
+
+def get_simhash(features, bits=FINGERPRINT_BITS):
+    """Get simhash of features (similar features give close hashes)."""
+    weights = [0] * bits
+    for feature in features:
+        feature_hash = int.from_bytes(
+            hashlib.blake2b(feature.encode(), digest_size=bits // 8).digest(),
+            "big",
+        )
+        for bit in range(bits):
+            weights[bit] += 1 if feature_hash >> bit & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+
+def get_page_fingerprint(html):
+    """Get fingerprint of listing page (None if no region is found)."""
+    try:
+        features = get_region_features(lxml.html.fromstring(html))
+    except Exception:
+        return None
+    return f"{get_simhash(features):016x}" if features else None
+
+
+def get_distance(fingerprint, other_fingerprint):
+    """Get number of differing bits (Hamming distance) of fingerprints."""
+    return bin(int(fingerprint, 16) ^ int(other_fingerprint, 16)).count("1")
+
+
+class FingerprintStore:
+    """
+    Fingerprint of each listing at its last extraction, in a JSON-lines file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to JSON-lines file of fingerprints
+    max_distance : int
+        Number of differing bits up to which fingerprints match (0 to only
+        skip listings whose regions are identical)
+    """
+
+    def __init__(self, filepath, max_distance=0):
+        self.filepath = filepath
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.num_unchanged = 0
+        if os.path.exists(filepath):
+            with open(filepath) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["id"]] = entry
+
+    def append(self, entry):
+        """Save new fingerprint of listing."""
+        with self.lock:
+            self.entries[entry["id"]] = entry
+            with open(self.filepath, "a") as f:
+                f.write(f"{json.dumps(entry, default=str)}\n")
+        return entry
+
+    def is_unchanged(self, app_id, fingerprint):
+        """
+        Check if listing matches its last extraction (and its export exists).
+
+        Notes
+        -----
+        1. Listings whose exported file was removed (eg. to re-extract
+           them) are never unchanged.
+        """
+        entry = self.entries.get(app_id)
+        unchanged = (
+            fingerprint is not None
+            and entry is not None
+            and get_distance(entry["fingerprint"], fingerprint)
+            <= self.max_distance
+            and os.path.exists(entry["filepath"])
+        )
+        if unchanged:
+            with self.lock:
+                self.num_unchanged += 1
+        return unchanged
+
+    def record(self, app_id, url, fingerprint, filepath, now=None):
+        """Record fingerprint of listing and path to its exported file."""
+        if fingerprint is None:
+            return None
+        return self.append(
+            {
+                "id": app_id,
+                "url": url,
+                "fingerprint": fingerprint,
+                "filepath": filepath,
+                "extracted_at": now or time.time(),
+            }
+        )
+
+    def compact(self):
+        """Rewrite file with only the latest line of each listing."""
+        with self.lock:
+            tmp_filepath = f"{self.filepath}.tmp"
+            with open(tmp_filepath, "w") as f:
+                for entry in self.entries.values():
+                    f.write(f"{json.dumps(entry, default=str)}\n")
+            os.replace(tmp_filepath, self.filepath)
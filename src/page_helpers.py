@@ -2,7 +2,13 @@
 # -*- coding: utf-8 -*-
 
 
-"""Helpers for checking if possible to move forward to next page."""
+"""Helpers for planning the pages of search results to be scraped.
+
+The total number of listings is read once, from the pagination of any page
+of search results, and the URL of every page is generated from it. Pages
+can then be loaded directly (in any order, or resumed from any page),
+instead of moving between them with the pagination buttons.
+"""
 
 
 # pylint: disable=invalid-name,broad-except
@@ -10,74 +16,83 @@
 
 import math
 import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Number of listings shown on each page of search results
+LISTINGS_PER_PAGE = 25
+
 
+def get_total_listings(pagination_text):
+    """Get total listings from pagination text (eg. showing 1 - 25 of 90)."""
+    return int(re.findall(r"\d+", pagination_text.replace(",", ""))[-1])
 
-def get_pages(pagination, verbose=False):
-    """Get current page#, page# of the displayed listings and all pages."""
-    # Total listings
-    total_listings_element = pagination.find_element_by_xpath(
-        './/div[@class="search_pagination_left"]'
+
+def get_total_listings_from_driver(driver):
+    """Get total listings from search results page loaded in browser."""
+    return get_total_listings(
+        driver.find_element_by_xpath(
+            './/div[@class="search_pagination_left"]'
+        ).text
     )
-    total_listings = int(total_listings_element.text.split()[-1])
-    # Maximum page of listings
-    max_page_listings = math.ceil(total_listings / 25)
-    # All available listings being shown on page
-    showing = pagination.find_element_by_xpath(
-        './/div[@class="search_pagination_left"]'
-    ).text
-    showing_listings = list(map(int, re.findall(r"\d+", showing)))[:-1]
-    # Current page
-    curr_page_list = [
-        int(showing_listing / 25) for showing_listing in showing_listings
-    ]
-    if 0 in curr_page_list:
-        current_page_num = 1
-    else:
-        current_page_num = max(curr_page_list)
-    # Get all page numbers (except the current page number)
-    all_page_nums = []
-    nav_elements = pagination.find_elements_by_xpath(
-        './/div[@class="search_pagination_right"]/a'
+
+
+def get_total_listings_from_soup(soup):
+    """Get total listings from search results page parsed with bs4."""
+    return get_total_listings(
+        soup.find("div", {"class": "search_pagination_left"}).text
     )
-    for nav_element in nav_elements:
-        if nav_element.text not in ["<", ">"]:
-            all_page_nums.append(int(nav_element.text))
-    all_page_nums = list(
-        set(all_page_nums + [current_page_num]) - set([max_page_listings])
+
+
+def get_num_pages(total_listings, listings_per_page=LISTINGS_PER_PAGE):
+    """Get number of pages of search results."""
+    return math.ceil(total_listings / listings_per_page)
+
+
+def get_page_url(url, page):
+    """Get URL of page of search results, by setting its page parameter."""
+    url_parts = urlsplit(url)
+    query = [
+        (k, v)
+        for k, v in parse_qsl(url_parts.query, keep_blank_values=True)
+        if k != "page"
+    ]
+    return urlunsplit(
+        url_parts._replace(query=urlencode(query + [("page", page)]))
     )
-    all_page_nums = sorted(all_page_nums)
-
-    if verbose:
-        all_page_nums_str = ",".join([str(p) for p in all_page_nums])
-        print(
-            f"Available page numbers={all_page_nums_str}, "
-            f"Current page={current_page_num}, Max page={max(all_page_nums)}"
-        )
-    return [current_page_num, curr_page_list, all_page_nums]
-
-
-def check_movement(pagination):
-    """Check for ability to navigate backward or forward between pages."""
-    pagination_movements = pagination.find_element_by_xpath(
-        './/div[@class="search_pagination_right"]'
-    ).find_elements_by_class_name("pagebtn")
-    # Check for ability to move back
-    try:
-        move_back_a = pagination_movements[0]
-        assert move_back_a.text == "<"
-        can_move_back = True
-        print("Can move back, ", end="")
-    except Exception:
-        can_move_back = False
-        print("Can not move back, ", end="")
-
-    # Check for ability to move forward
-    try:
-        move_forward_a = pagination_movements[-1]
-        assert move_forward_a.text == ">"
-        can_move_forward = True
-        print("Can move forward")
-    except Exception:
-        can_move_forward = False
-        print("Can not move forward, ", end="")
-    return [can_move_back, can_move_forward]
+
+
+def get_page_plan(url, pages, num_pages=None, done_pages=None):
+    """
+    Get URL of each page of search results to be scraped.
+
+    Parameters
+    ----------
+    url : str
+        URL of any page of search results (with the filters to be used)
+    pages : List
+        Page numbers to be scraped
+    num_pages : int
+        (Optional) Number of available pages (see get_num_pages), used to
+        drop pages after the last page
+    done_pages : List
+        (Optional) Page numbers already scraped, which are dropped (to
+        resume a crawl)
+
+    Usage
+    -----
+    > num_pages = get_num_pages(get_total_listings_from_driver(driver))
+    > page_urls = get_page_plan(driver.current_url, range(50, 60), num_pages)
+    > driver.get(page_urls[50])
+
+    Notes
+    -----
+    1. Returns a dict with the URL of each page, in the order of pages.
+    """
+    done_pages = set(done_pages or [])
+    return {
+        page: get_page_url(url, page)
+        for page in pages
+        if page >= 1
+        and (num_pages is None or page <= num_pages)
+        and page not in done_pages
+    }
@@ -16,12 +16,16 @@ import pandas as pd
 from bs4 import BeautifulSoup
 
 import src.bs4_helpers as bsh
+import src.failure_records as fr
+import src.navigation_clock as nc
+from src.crawl_metrics import log_event, metrics
 from src.failure_records import dict_failed_extraction_from_listing_page
 from src.utils import export_to_csv, save_to_parquet_file
 
 
 def scrape_single_page_search_results(driver, raw_data_dir, verbose=False):
     """Scrape a single page of search results."""
+    start_time = time.time()
     search_results_div = driver.find_elements_by_xpath(
         './/div[@id="search_resultsRows"]/a'
     )
@@ -104,16 +108,24 @@ def scrape_single_page_search_results(driver, raw_data_dir, verbose=False):
                     )
                     discount_price = None
                 if verbose:
-                    print(
-                        current_page_num,
-                        k + 1,
-                        title,
-                        app_id,
-                        platform_names,
-                        release_date,
-                        discount_pct,
-                        original_price,
-                        discount_price,
+                    log_event(
+                        "search_result_scraped",
+                        " ".join(
+                            str(v)
+                            for v in [
+                                current_page_num,
+                                k + 1,
+                                title,
+                                app_id,
+                                platform_names,
+                                release_date,
+                                discount_pct,
+                                original_price,
+                                discount_price,
+                            ]
+                        ),
+                        page=current_page_num,
+                        listing_counter=k + 1,
                     )
                 d_search_results.append(
                     {
@@ -128,9 +140,12 @@ def scrape_single_page_search_results(driver, raw_data_dir, verbose=False):
                         "discount_price": discount_price,
                     }
                 )
-            print(
+            log_event(
+                "search_results_scraped",
                 "Retrieved listings from search results page "
-                f"{current_page_num}."
+                f"{current_page_num}.",
+                page=current_page_num,
+                num_listings=len(d_search_results),
             )
         except Exception:
             d_search_results.append(
@@ -146,9 +161,13 @@ def scrape_single_page_search_results(driver, raw_data_dir, verbose=False):
                     "discount_price": None,
                 }
             )
-            print(
+            metrics.inc("steam_failure_records_total", kind="search_results")
+            log_event(
+                "search_results_failed",
                 "Error retrieving listings from search results page "
-                f"{current_page_num}."
+                f"{current_page_num}.",
+                page=current_page_num,
+                listing_counter=k + 1,
             )
     except Exception:
         # Return failure record if page is blank with no listings
@@ -166,7 +185,17 @@ def scrape_single_page_search_results(driver, raw_data_dir, verbose=False):
             }
             for _ in range(25)
         ]
-        print("No listings on search results page " f"{current_page_num}.\n")
+        metrics.inc("steam_failure_records_total", 25, kind="search_results")
+        log_event(
+            "search_results_empty",
+            f"No listings on search results page {current_page_num}.\n",
+            page=current_page_num,
+        )
+    metrics.observe(
+        "steam_parse_duration_seconds",
+        time.time() - start_time,
+        kind="search_results",
+    )
     # Convert list of dicts into DataFrame
     df_single_page_search_results_single_page = pd.DataFrame.from_records(
         d_search_results
@@ -181,19 +210,33 @@ def scrape_single_page_search_results(driver, raw_data_dir, verbose=False):
         save_to_parquet_file(
             [df_single_page_search_results_single_page], [parquet_filepath]
         )
-        print(f"Exported search results for page {current_page_num}.\n")
+        log_event(
+            "search_results_exported",
+            f"Exported search results for page {current_page_num}.\n",
+            page=current_page_num,
+            filepath=parquet_filepath,
+        )
     else:
-        print(
+        log_event(
+            "search_results_export_skipped",
             "File was found with search results information for page "
-            f"{current_page_num}. Did nothing.\n"
+            f"{current_page_num}. Did nothing.\n",
+            page=current_page_num,
+            filepath=parquet_filepath,
         )
+    metrics.inc("steam_pages_scraped_total")
 
 
 def scrape_listing(driver, listing_num, page_num, raw_data_dir):
     """Scrape a single listing."""
-    print(f"Starting with listing {listing_num}")
+    listing_info = {"page": page_num, "listing_num": listing_num}
+    log_event(
+        "listing_started",
+        f"Starting with listing {listing_num}",
+        **listing_info,
+    )
     start_time = time.time()
-    time.sleep(uniform(1, 3))
+    nc.sleep(uniform(1, 3))
 
     # Get page source
     game_page_source = driver.page_source
@@ -211,16 +254,40 @@ def scrape_listing(driver, listing_num, page_num, raw_data_dir):
             .title()
         )
         game_title = re.sub(r"\W+", "", game_title.replace(" ", "_"))
-        print(f"Scraped game title for listing {listing_num} ({game_title})")
+        log_event(
+            "listing_title_scraped",
+            f"Scraped game title for listing {listing_num} ({game_title})",
+            title=game_title,
+            **listing_info,
+        )
 
         # Scrape listing attributes
         game_soup = BeautifulSoup(game_page_source, "html.parser")
+        parse_start_time = time.time()
         try:
             listing_details = bsh.scrape_game_listing(game_soup)
-            print(f"Scraped listing {listing_num}")
+            log_event(
+                "listing_scraped",
+                f"Scraped listing {listing_num}",
+                **listing_info,
+            )
+            fr.record_failed_fields(listing_details, **listing_info)
         except Exception:
             listing_details = dict_failed_extraction_from_listing_page()
-            print(f"Error with listing {listing_num}. Used failure record.")
+            metrics.inc(
+                "steam_failure_records_total", kind="listing", reason="details"
+            )
+            log_event(
+                "listing_failed",
+                f"Error with listing {listing_num}. Used failure record.",
+                reason="details",
+                **listing_info,
+            )
+        metrics.observe(
+            "steam_parse_duration_seconds",
+            time.time() - parse_start_time,
+            kind="listing",
+        )
 
         # Write to disk
         export_to_csv(
@@ -238,12 +305,27 @@ def scrape_listing(driver, listing_num, page_num, raw_data_dir):
                 './/h2[@class="no_margin"]'
             ).text.lower()
             if collection_text != "items included in this package":
-                print("Listing is collection.")
+                reason = "collection"
+                message = "Listing is collection."
             else:
-                print(f"Listing looks like collection: got {collection_text}")
+                reason = "looks_like_collection"
+                message = (
+                    f"Listing looks like collection: got {collection_text}"
+                )
         except Exception:
-            print("Listing is not single game or collection.")
+            reason = "unknown"
+            message = "Listing is not single game or collection."
+        metrics.inc(
+            "steam_failure_records_total", kind="listing", reason=reason
+        )
+        log_event("listing_skipped", message, reason=reason, **listing_info)
 
     duration = time.time() - start_time
-    print(f"Done with listing {listing_num} in {duration:.3f} sec.")
+    metrics.inc("steam_listings_scraped_total")
+    log_event(
+        "listing_done",
+        f"Done with listing {listing_num} in {duration:.3f} sec.",
+        duration=duration,
+        **listing_info,
+    )
     return driver
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Run-length encoded history of listing prices across repeated crawls."""
+
+
+# pylint: disable=invalid-name,broad-except
+
+
+import os
+import re
+
+import pandas as pd
+
+from src.streaming_merge import add_app_id_from_url
+
+# Attributes of a listing price scraped from the search results
+PRICE_COLS = ["original_price", "discount_price", "discount_pct"]
+
+# Columns of the price history store
+PRICE_HISTORY_COLS = ["app_id", "valid_from"] + PRICE_COLS
+
+# Placeholder used to compare missing prices between crawls
+MISSING_PRICE = "<missing>"
+
+# Placeholder for the (non-existent) price before the first snapshot
+NO_PRICE = "<none>"
+
+
+def get_crawl_timestamp_from_filename(filepath):
+    """Get crawl time from name of search results file (..._%Y%m%d_%H%M%S)."""
+    timestr = re.search(r"_(\d{8}_\d{6})\.", os.path.basename(filepath))
+    return pd.to_datetime(timestr.group(1), format="%Y%m%d_%H%M%S")
+
+
+def load_price_snapshots(filepaths):
+    """Load prices from search results files, with the time of each crawl."""
+    df = pd.concat(
+        [
+            pd.read_parquet(f, engine="auto").assign(
+                crawled_at=get_crawl_timestamp_from_filename(f)
+            )
+            for f in filepaths
+        ],
+        ignore_index=True,
+    )
+    df = add_app_id_from_url(df).dropna(subset=["app_id"])
+    return df[["app_id", "crawled_at"] + PRICE_COLS].astype(
+        {c: "string" for c in ["app_id"] + PRICE_COLS}
+    )
+
+
+def get_price_changes(df_snapshots, df_latest=None):
+    """
+    Keep only snapshots where price differs from previous snapshot of app.
+
+    Parameters
+    ----------
+    df_snapshots : pd.DataFrame
+        Prices of listings (app_id, crawled_at and PRICE_COLS)
+    df_latest : pd.DataFrame
+        Most recent stored price of each app_id (app_id, valid_from and
+        PRICE_COLS), against which the first new snapshot is compared
+    """
+    df = df_snapshots.rename(columns={"crawled_at": "valid_from"})[
+        PRICE_HISTORY_COLS
+    ].assign(is_stored=False)
+    if df_latest is not None and not df_latest.empty:
+        df = pd.concat(
+            [df_latest[PRICE_HISTORY_COLS].assign(is_stored=True), df],
+            ignore_index=True,
+        )
+    df = df.sort_values(
+        by=["app_id", "valid_from", "is_stored"],
+        ascending=[True, True, False],
+        kind="stable",
+    ).drop_duplicates(subset=["app_id", "valid_from"], keep="first")
+    prices = df[PRICE_COLS].astype("string").fillna(MISSING_PRICE)
+    # First snapshot of each app_id is compared against a placeholder that
+    # never matches, so that it is always kept
+    prev_prices = prices.groupby(df["app_id"]).shift(1).fillna(NO_PRICE)
+    is_changed = (prices != prev_prices).any(axis=1)
+    return (
+        df[is_changed & ~df["is_stored"]]
+        .drop(columns=["is_stored"])
+        .reset_index(drop=True)
+    )
+
+
+def load_price_history(store_filepath):
+    """Load price history store, sorted by app_id and time."""
+    if not os.path.exists(store_filepath):
+        return pd.DataFrame(columns=PRICE_HISTORY_COLS).astype(
+            {c: "string" for c in ["app_id"] + PRICE_COLS}
+            | {"valid_from": "datetime64[ns]"}
+        )
+    return pd.read_parquet(store_filepath)
+
+
+def get_latest_prices(df_history):
+    """Get most recent stored price of each app_id."""
+    return df_history.groupby("app_id", sort=False).tail(1)
+
+
+def update_price_history(filepaths, store_filepath):
+    """
+    Append price changes found in search results files to the store.
+
+    Notes
+    -----
+    1. Only changes are stored, so storage grows with the number of price
+       changes and not with the number of crawls.
+    2. Snapshots older than the latest stored price of an app_id are
+       ignored for that app_id.
+    """
+    df_history = load_price_history(store_filepath)
+    df_latest = get_latest_prices(df_history)
+    df_snapshots = load_price_snapshots(filepaths)
+    df_snapshots = df_snapshots.merge(
+        df_latest[["app_id", "valid_from"]], on="app_id", how="left"
+    )
+    df_snapshots = df_snapshots[
+        df_snapshots["valid_from"].isna()
+        | (df_snapshots["crawled_at"] >= df_snapshots["valid_from"])
+    ].drop(columns=["valid_from"])
+    df_changes = get_price_changes(df_snapshots, df_latest)
+    df_history = (
+        pd.concat([df_history, df_changes], ignore_index=True)
+        .sort_values(by=["app_id", "valid_from"], kind="stable")
+        .reset_index(drop=True)
+    )
+    df_history.to_parquet(store_filepath, index=False)
+    print(
+        f"Stored {len(df_changes):,} price changes from "
+        f"{len(df_snapshots):,} snapshots (total = {len(df_history):,})"
+    )
+    return df_history
+
+
+def add_valid_to(df_history):
+    """Append end time of each price (start time of next price of app)."""
+    return df_history.assign(
+        valid_to=df_history.groupby("app_id")["valid_from"].shift(-1)
+    )
+
+
+def get_prices_at(df_history, timestamp):
+    """Get price of every app_id at a point in time."""
+    df = df_history[df_history["valid_from"] <= pd.Timestamp(timestamp)]
+    return (
+        df.sort_values(by=["app_id", "valid_from"], kind="stable")
+        .groupby("app_id", sort=False)
+        .tail(1)
+        .reset_index(drop=True)
+    )
+
+
+def get_sales_in_range(df_history, start, end):
+    """Get all discounted prices that were active during a time range."""
+    df = add_valid_to(df_history)
+    is_discounted = df["discount_pct"].notna() & (df["discount_pct"] != "")
+    overlaps_range = (df["valid_from"] <= pd.Timestamp(end)) & (
+        df["valid_to"].isna() | (df["valid_to"] > pd.Timestamp(start))
+    )
+    return df[is_discounted & overlaps_range].reset_index(drop=True)
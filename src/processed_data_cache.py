@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Memory-mapped Arrow (Feather) cache of the processed dataset."""
+
+
+# pylint: disable=invalid-name,broad-except
+
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Bump this whenever set_processed_dtypes() changes, so that caches written
+# with the previous dtypes are invalidated
+CACHE_SCHEMA_VERSION = "1"
+
+# Key under which the fingerprint of the upstream data is stored in the
+# metadata of the Arrow schema
+FINGERPRINT_METADATA_KEY = b"upstream_fingerprint"
+
+# Low-cardinality string columns of the processed dataset
+CATEGORICAL_COLS = [
+    "overall_review_rating",
+    "pct_overall_threshold",
+    "pct_overall_threshold_lang",
+    "platforms",
+    "rating",
+    "discount_pct",
+]
+
+
+def get_upstream_fingerprint(filepaths):
+    """Get hash of path, size and modification time of upstream files."""
+    file_stats = []
+    for filepath in sorted(filepaths):
+        file_stat = os.stat(filepath)
+        file_stats.append(
+            [
+                os.path.abspath(filepath),
+                file_stat.st_size,
+                file_stat.st_mtime_ns,
+            ]
+        )
+    payload = json.dumps([CACHE_SCHEMA_VERSION, file_stats])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def set_processed_dtypes(df, categorical_cols=CATEGORICAL_COLS):
+    """Apply final datatypes and cleaned columns to processed dataset."""
+    df = df.copy()
+    if "discount_pct" in df:
+        df["discount_pct_cleaned"] = (
+            df["discount_pct"]
+            .str.replace("%", "", regex=False)
+            .str.replace("-", "", regex=False)
+            .astype(float)
+        )
+    if "original_price" in df:
+        original_price = df["original_price"].fillna("0").astype(str)
+        original_price = original_price.mask(
+            original_price.str.contains("Free|Demo", case=False), "0"
+        )
+        df["original_price_cleaned"] = pd.to_numeric(
+            original_price.str.replace(",", "", regex=False),
+            errors="coerce",
+        )
+    if "Release Date" in df:
+        df["release_date_cleaned"] = pd.to_datetime(
+            df["Release Date"].replace("Coming Soon", np.nan, regex=True),
+            errors="coerce",
+        )
+    if "Early Access Release Date" in df:
+        df["early_access_release_date_cleaned"] = pd.to_datetime(
+            df["Early Access Release Date"], errors="coerce"
+        )
+    for col in [c for c in categorical_cols if c in df]:
+        df[col] = df[col].astype("category")
+    return df
+
+
+def export_to_feather(df, cache_filepath, fingerprint):
+    """Export DataFrame to uncompressed Feather file, tagged by fingerprint."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {
+            **(table.schema.metadata or {}),
+            FINGERPRINT_METADATA_KEY: fingerprint.encode("utf-8"),
+        }
+    )
+    # Write to temporary file first, so that an interrupted export never
+    # leaves behind a partial cache that looks valid
+    tmp_filepath = f"{cache_filepath}.tmp"
+    # Compression must be disabled in order to memory-map without copying
+    feather.write_feather(table, tmp_filepath, compression="uncompressed")
+    os.replace(tmp_filepath, cache_filepath)
+    print(f"Exported processed data cache to {cache_filepath}")
+
+
+def get_cached_fingerprint(cache_filepath):
+    """Get the upstream fingerprint stored in a Feather cache, if any."""
+    if not os.path.exists(cache_filepath):
+        return None
+    try:
+        with pa.memory_map(cache_filepath, "r") as source:
+            schema = pa.ipc.open_file(source).schema
+    except Exception:
+        return None
+    fingerprint = (schema.metadata or {}).get(FINGERPRINT_METADATA_KEY)
+    return fingerprint.decode("utf-8") if fingerprint else None
+
+
+def read_feather_cache(cache_filepath, columns=None):
+    """Memory-map Feather cache and load (optionally) selected columns."""
+    with pa.memory_map(cache_filepath, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    # Only the buffers of selected columns are paged in from disk
+    if columns:
+        table = table.select(columns)
+    return table.to_pandas()
+
+
+def load_processed_data(
+    processed_data_filepath,
+    cache_filepath=None,
+    columns=None,
+    read_csv_kwargs=None,
+):
+    """
+    Load processed dataset, using memory-mapped Feather cache if valid.
+
+    Parameters
+    ----------
+    processed_data_filepath : str
+        Path to processed data CSV file (created in
+        6_merge_searches_listings.ipynb)
+    cache_filepath : str
+        Path to Feather cache (defaults to CSV path with .feather extension)
+    columns : List
+        Columns to load (all columns are loaded if not specified)
+    read_csv_kwargs : Dict
+        Keyword arguments passed to pd.read_csv() when rebuilding the cache
+
+    Notes
+    -----
+    1. The cache is rebuilt if the size or modification time of the
+       processed data CSV file changes, or if CACHE_SCHEMA_VERSION changes.
+    """
+    if not cache_filepath:
+        cache_filepath = (
+            os.path.splitext(processed_data_filepath)[0] + ".feather"
+        )
+    fingerprint = get_upstream_fingerprint([processed_data_filepath])
+    if get_cached_fingerprint(cache_filepath) != fingerprint:
+        print(
+            "Processed data cache is missing or stale. Rebuilding from "
+            f"{os.path.basename(processed_data_filepath)}"
+        )
+        df = set_processed_dtypes(
+            pd.read_csv(processed_data_filepath, **(read_csv_kwargs or {}))
+        )
+        export_to_feather(df, cache_filepath, fingerprint)
+        return df[columns] if columns else df
+    print(f"Loading processed data from cache at {cache_filepath}")
+    return read_feather_cache(cache_filepath, columns)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Manifest of processed raw files, to only ingest new or changed files."""
+
+
+# pylint: disable=invalid-name,broad-except
+
+
+import hashlib
+import json
+import os
+import time
+from glob import glob
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Column appended to every processed row, naming the raw file it came from
+# (stored in parts as the absolute path of the raw file)
+SOURCE_FILE_COL = "source_file"
+
+
+def compute_file_hash(filepath, chunk_size=1024 * 1024):
+    """Compute SHA-256 hash of file contents, reading in chunks."""
+    file_hash = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def load_manifest(manifest_filepath):
+    """Load manifest of processed raw files, keyed by absolute file path."""
+    if not os.path.exists(manifest_filepath):
+        return {}
+    with open(manifest_filepath) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, manifest_filepath):
+    """Save manifest to JSON file, replacing the previous one atomically."""
+    tmp_filepath = f"{manifest_filepath}.tmp"
+    with open(tmp_filepath, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_filepath, manifest_filepath)
+
+
+def get_file_record(filepath, file_hash=None):
+    """Get path, size, modification time and content hash of a file."""
+    file_stat = os.stat(filepath)
+    return {
+        "path": os.path.abspath(filepath),
+        "size": file_stat.st_size,
+        "mtime_ns": file_stat.st_mtime_ns,
+        "sha256": file_hash or compute_file_hash(filepath),
+    }
+
+
+def get_new_or_changed_files(filepaths, manifest):
+    """
+    Get files that are not in the manifest or whose contents have changed.
+
+    Notes
+    -----
+    1. Content hashes are only computed for files whose size or
+       modification time differ from those in the manifest, so unchanged
+       files cost a single stat() call.
+    2. Also returns files whose size or modification time changed but
+       whose contents did not (eg. files copied again or touched), whose
+       records should be updated so that they are not hashed again.
+    """
+    new_files, changed_files, touched_files = [], [], []
+    for filepath in filepaths:
+        record = manifest.get(os.path.abspath(filepath))
+        if record is None:
+            new_files.append(filepath)
+            continue
+        file_stat = os.stat(filepath)
+        if (
+            file_stat.st_size == record["size"]
+            and file_stat.st_mtime_ns == record["mtime_ns"]
+        ):
+            continue
+        if compute_file_hash(filepath) != record["sha256"]:
+            changed_files.append(filepath)
+        else:
+            touched_files.append(filepath)
+    return [new_files, changed_files, touched_files]
+
+
+def get_deleted_files(manifest):
+    """Get (absolute) paths of raw files in manifest that no longer exist."""
+    return [path for path in manifest if not os.path.exists(path)]
+
+
+def get_source_paths(source_files, filepaths):
+    """
+    Get absolute paths of the raw files named in the source_file column.
+
+    Notes
+    -----
+    1. Raw files can be named by the path passed to process_func, or by
+       their file name (eg. see src.bulk_listings_reader), if no two files
+       processed together share that name.
+    """
+    paths = {f: os.path.abspath(f) for f in filepaths}
+    filenames = {}
+    for filepath in filepaths:
+        filenames.setdefault(os.path.basename(filepath), []).append(filepath)
+    for filename, same_name_filepaths in filenames.items():
+        if filename not in paths and len(same_name_filepaths) == 1:
+            paths[filename] = os.path.abspath(same_name_filepaths[0])
+    source_paths = source_files.map(paths)
+    unknown_files = source_files[source_paths.isna()].unique().tolist()
+    if unknown_files:
+        raise ValueError(
+            f"Could not find raw files of {len(unknown_files):,} values of "
+            f"{SOURCE_FILE_COL} (eg. {unknown_files[0]}), which must be "
+            "paths of processed files, or unique file names"
+        )
+    return source_paths
+
+
+def remove_rows_from_parts(part_filepaths, source_files):
+    """Remove rows created from source_files from processed store parts.
+
+    Rows are matched on the absolute path of their raw file, so that files
+    with the same name in different directories are told apart.
+    """
+    source_paths = [os.path.abspath(f) for f in source_files]
+    for part_filepath in part_filepaths:
+        if not os.path.exists(part_filepath):
+            continue
+        df_part = pd.read_parquet(part_filepath)
+        df_part = df_part[~df_part[SOURCE_FILE_COL].isin(source_paths)]
+        if df_part.empty:
+            os.remove(part_filepath)
+            print(f"Removed empty part {os.path.basename(part_filepath)}")
+        else:
+            df_part.to_parquet(part_filepath, index=False)
+            print(f"Patched part {os.path.basename(part_filepath)}")
+
+
+def update_processed_store(
+    filepaths,
+    process_func,
+    store_dir,
+    manifest_filepath=None,
+):
+    """
+    Process only new or changed raw files and append to processed store.
+
+    Parameters
+    ----------
+    filepaths : List
+        Paths to all raw files (eg. from glob("data/raw/requests/p*_*.csv"))
+    process_func : Callable
+        Function that reads and cleans a list of raw files, and returns a
+        DataFrame with a source_file column holding the path (or unique
+        file name) of the raw file from which each row was created
+    store_dir : str
+        Directory of parquet files (parts) making up the processed store
+    manifest_filepath : str
+        Path to manifest JSON file (defaults to manifest.json in store_dir)
+
+    Usage
+    -----
+    > def process_listings(filepaths):
+          return pd.concat(
+              [
+                  pd.read_csv(f).assign(source_file=os.path.basename(f))
+                  for f in filepaths
+              ],
+              ignore_index=True,
+          )
+    > update_processed_store(
+          glob("data/raw/requests/p*_*.csv"),
+          process_listings,
+          "data/processed/listings_requests",
+      )
+
+    Notes
+    -----
+    1. Each run writes (at most) one new part, containing the rows of all
+       new or changed raw files. Rows previously created from changed raw
+       files, or from raw files that were deleted, are removed from the
+       parts that they were written to.
+    2. If a run is interrupted after writing its part but before saving
+       the manifest, the next run writes the same rows to another part.
+       Pass dedup_subset (eg. [SOURCE_FILE_COL]) when loading the store to
+       drop such duplicates.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    if not manifest_filepath:
+        manifest_filepath = os.path.join(store_dir, "manifest.json")
+    manifest = load_manifest(manifest_filepath)
+    new_files, changed_files, touched_files = get_new_or_changed_files(
+        filepaths, manifest
+    )
+    deleted_files = get_deleted_files(manifest)
+    print(
+        f"Found {len(new_files):,} new, {len(changed_files):,} changed "
+        f"and {len(deleted_files):,} deleted files (out of "
+        f"{len(filepaths):,})"
+    )
+
+    # Record new size and modification time of files with same contents
+    for filepath in touched_files:
+        record = manifest[os.path.abspath(filepath)]
+        record.update(get_file_record(filepath, record["sha256"]))
+    if touched_files:
+        save_manifest(manifest, manifest_filepath)
+
+    # Remove rows of deleted files
+    if deleted_files:
+        remove_rows_from_parts(
+            sorted({manifest[f]["output"] for f in deleted_files}),
+            deleted_files,
+        )
+        for filepath in deleted_files:
+            del manifest[filepath]
+        save_manifest(manifest, manifest_filepath)
+
+    if not new_files and not changed_files:
+        print("Processed store is up to date. Did nothing.")
+        return None
+
+    # Patch parts fed by changed files
+    if changed_files:
+        parts_to_patch = sorted(
+            {manifest[os.path.abspath(f)]["output"] for f in changed_files}
+        )
+        remove_rows_from_parts(parts_to_patch, changed_files)
+
+    # Process new and changed files into a new part
+    files_to_process = new_files + changed_files
+    df = process_func(files_to_process)
+    assert SOURCE_FILE_COL in df
+    df[SOURCE_FILE_COL] = get_source_paths(
+        df[SOURCE_FILE_COL], files_to_process
+    )
+    # Nanoseconds keep names of parts of runs in the same second unique and
+    # in the order of the runs
+    now_ns = time.time_ns()
+    timestr = time.strftime("%Y%m%d_%H%M%S", time.localtime(now_ns // 10**9))
+    part_filepath = os.path.abspath(
+        os.path.join(store_dir, f"part_{timestr}_{now_ns % 10**9:09d}.parquet")
+    )
+    df.to_parquet(part_filepath, index=False)
+    print(f"Exported {len(df):,} rows to {os.path.basename(part_filepath)}")
+
+    # Record consumed files in the manifest
+    for filepath in files_to_process:
+        record = get_file_record(filepath)
+        record.update({"output": part_filepath, "processed_at": timestr})
+        manifest[record["path"]] = record
+    save_manifest(manifest, manifest_filepath)
+    return part_filepath
+
+
+def get_part_filepaths(store_dir):
+    """Get paths to parts of processed store, in the order of their runs."""
+    return sorted(glob(os.path.join(store_dir, "part_*.parquet")))
+
+
+def load_processed_store(store_dir, columns=None, dedup_subset=None):
+    """Load all parts of processed store, keeping most recent duplicates."""
+    part_filepaths = get_part_filepaths(store_dir)
+    if not part_filepaths:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(
+        [pd.read_parquet(f, columns=columns) for f in part_filepaths],
+        ignore_index=True,
+    )
+    if dedup_subset:
+        df = df.drop_duplicates(subset=dedup_subset, keep="last")
+    return df.reset_index(drop=True)
+
+
+def iter_part_batches(part_filepaths, columns=None, batch_size=50_000):
+    """Yield DataFrames of at most batch_size rows from store parts."""
+    for part_filepath in part_filepaths:
+        parquet_file = pq.ParquetFile(part_filepath)
+        for batch in parquet_file.iter_batches(
+            batch_size=batch_size, columns=columns
+        ):
+            yield batch.to_pandas()
+
+
+def get_row_keys(df, subset):
+    """Get tuple of values of subset columns of each row (None if missing)."""
+    df_keys = df[subset].astype(object)
+    return list(
+        df_keys.where(df_keys.notna(), None).itertuples(index=False, name=None)
+    )
+
+
+def iter_processed_store(
+    store_dir, columns=None, dedup_subset=None, batch_size=50_000
+):
+    """
+    Yield all rows of processed store in batches, keeping recent duplicates.
+
+    Parameters
+    ----------
+    store_dir : str
+        Directory of parquet files (parts) making up the processed store
+    columns : List
+        (Optional) Columns to be read (defaults to all columns)
+    dedup_subset : List
+        (Optional) Columns on which duplicated rows are dropped, keeping the
+        row of the most recent part (as with load_processed_store)
+    batch_size : int
+        Maximum number of rows of each DataFrame
+
+    Notes
+    -----
+    1. Unlike load_processed_store, only a single batch is held in memory,
+       along with the position of the last row of each key in dedup_subset,
+       which are found in a first pass over these columns only.
+    """
+    part_filepaths = get_part_filepaths(store_dir)
+    last_positions = {}
+    if dedup_subset:
+        start = 0
+        for df in iter_part_batches(part_filepaths, dedup_subset, batch_size):
+            end = start + len(df)
+            last_positions.update(
+                zip(get_row_keys(df, dedup_subset), range(start, end))
+            )
+            start = end
+    read_columns = columns
+    if columns and dedup_subset:
+        read_columns = columns + [c for c in dedup_subset if c not in columns]
+    start = 0
+    for df in iter_part_batches(part_filepaths, read_columns, batch_size):
+        end = start + len(df)
+        if dedup_subset:
+            is_last = [
+                last_positions[key] == position
+                for key, position in zip(
+                    get_row_keys(df, dedup_subset), range(start, end)
+                )
+            ]
+            df = df[is_last]
+        start = end
+        if columns:
+            df = df[columns]
+        yield df.reset_index(drop=True)
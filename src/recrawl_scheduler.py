@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Recrawl schedule of listings, prioritized by how often each one changes.
+
+Every crawl of a listing is recorded with a snapshot of the attributes
+that change over time (prices, review counts, tags). From the number of
+changes seen per day of observation, each listing gets a change rate, a
+recrawl interval and a priority (probability that it changed since it was
+last crawled). Listings on sale, recently released or in early access are
+treated as more volatile. A daily budget of requests is then spent on the
+listings with the highest priority.
+
+The schedule is an append-only JSON-lines file, keyed by listing URL, in
+which the latest line of each listing holds its current state (as in
+src.dead_letter_queue).
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import json
+import math
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+# Attributes of a listing (from search results and listing page) whose
+# changes are tracked
+TRACKED_FIELDS = [
+    "original_price",
+    "discount_price",
+    "discount_pct",
+    "review_type_all",
+    "review_type_positive",
+    "review_type_negative",
+    "pct_overall",
+    "user_defined_tags",
+]
+
+# Tracked attributes compared without their currency symbols, since they
+# are formatted differently in search results and on listing pages
+PRICE_FIELDS = ["original_price", "discount_price", "discount_pct"]
+
+# Attributes (other than tracked ones) from which volatility is inferred
+VOLATILITY_FIELDS = [
+    "Release Date",
+    "release_date",
+    "Early Access Release Date",
+]
+
+DAY = 24 * 60 * 60
+
+# Listings released less than this number of days ago are volatile
+RECENT_RELEASE_DAYS = 90
+
+
+def is_missing(value):
+    """Check if attribute value is missing (None or NaN)."""
+    try:
+        return value is None or bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def get_snapshot(listing, fields=None):
+    """Get tracked attributes of listing (missing attributes are dropped)."""
+    snapshot = {}
+    for field in fields or TRACKED_FIELDS:
+        value = listing.get(field)
+        if not is_missing(value):
+            # Counts read from CSV files or DataFrames can be floats
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            value = str(value).strip()
+            if field in PRICE_FIELDS:
+                value = re.sub(r"[^\d.,%-]", "", value)
+            snapshot[field] = value
+    return snapshot
+
+
+def has_changed(previous_snapshot, snapshot):
+    """Check if any attribute found in both snapshots has changed."""
+    return any(
+        previous_snapshot[field] != value
+        for field, value in snapshot.items()
+        if field in previous_snapshot
+    )
+
+
+def get_volatility_reasons(listing, now=None):
+    """Get reasons (sale, early access, recent release) to recrawl often."""
+    reasons = []
+    discount_pct = listing.get("discount_pct")
+    if not is_missing(discount_pct) and str(discount_pct).strip("-%0 "):
+        reasons.append("sale")
+    if not is_missing(listing.get("Early Access Release Date")):
+        reasons.append("early_access")
+    release_date = pd.to_datetime(
+        listing.get("Release Date") or listing.get("release_date"),
+        errors="coerce",
+    )
+    if not is_missing(release_date):
+        age_days = ((now or time.time()) - release_date.timestamp()) / DAY
+        if 0 <= age_days <= RECENT_RELEASE_DAYS:
+            reasons.append("recent_release")
+    return reasons
+
+
+class RecrawlScheduler:
+    """
+    Change history and recrawl schedule of listings, in a JSON-lines file.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to JSON-lines file of schedule
+    min_interval, max_interval : float
+        Bounds (sec.) of the recrawl interval of a listing
+    prior_interval : float
+        Interval (sec.) between changes assumed for a listing before any
+        change is observed (weighted as one observed change)
+    volatility_boost : float
+        Factor by which the change rate of a volatile listing (on sale,
+        in early access or recently released) is increased
+    """
+
+    def __init__(
+        self,
+        filepath,
+        min_interval=DAY,
+        max_interval=60 * DAY,
+        prior_interval=14 * DAY,
+        volatility_boost=4,
+    ):
+        self.filepath = filepath
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.prior_interval = prior_interval
+        self.volatility_boost = volatility_boost
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(filepath):
+            with open(filepath) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["id"]] = entry
+
+    def append(self, entry):
+        """Save new state of listing."""
+        with self.lock:
+            self.entries[entry["id"]] = entry
+            with open(self.filepath, "a") as f:
+                f.write(f"{json.dumps(entry, default=str)}\n")
+        return entry
+
+    def get_change_rate(self, entry):
+        """Get estimated number of changes per second of listing."""
+        # One change over prior_interval is assumed before any observation
+        rate = (entry["num_changes"] + 1) / (
+            entry["observed_sec"] + self.prior_interval
+        )
+        if entry["volatility_reasons"]:
+            rate *= self.volatility_boost
+        return rate
+
+    def get_priority(self, entry, now=None):
+        """Get probability that listing changed since it was last crawled."""
+        elapsed = max((now or time.time()) - entry["last_crawled_at"], 0)
+        return 1 - math.exp(-self.get_change_rate(entry) * elapsed)
+
+    def record_crawl(
+        self,
+        url,
+        listing,
+        page=None,
+        listing_num=None,
+        now=None,
+        is_unchanged=False,
+    ):
+        """
+        Record crawl of listing, and schedule its next crawl.
+
+        Parameters
+        ----------
+        url : str
+            URL of listing
+        listing : Dict
+            Attributes of listing seen in this crawl (search result and/or
+            listing page, including prices)
+        page, listing_num : int
+            Page of search results and position on that page
+        now : float
+            (Optional) Time of crawl
+        is_unchanged : bool
+            Whether the listing page is the same as at the last crawl (eg.
+            see src.page_fingerprint), so that its attributes were not
+            extracted again
+
+        Notes
+        -----
+        1. The snapshot and volatility of a listing only hold attributes
+           seen in this crawl (eg. a discount that ended is dropped), except
+           for unchanged listings, whose attributes from the last crawl are
+           still current.
+        """
+        now = now or time.time()
+        previous = self.entries.get(url)
+        if is_unchanged and previous is not None:
+            listing = dict(
+                previous["snapshot"],
+                **previous.get("volatility_attributes", {}),
+                **listing,
+            )
+        snapshot = get_snapshot(listing)
+        volatility_attributes = get_snapshot(listing, VOLATILITY_FIELDS)
+        entry = {
+            "id": url,
+            "url": url,
+            "page": None if page is None else int(page),
+            "listing_num": None if listing_num is None else int(listing_num),
+            "snapshot": snapshot,
+            "volatility_attributes": volatility_attributes,
+            "num_crawls": 1,
+            "num_changes": 0,
+            "observed_sec": 0,
+            "first_crawled_at": now,
+            "last_crawled_at": now,
+            "last_changed_at": None,
+        }
+        if previous is not None:
+            changed = has_changed(previous["snapshot"], snapshot)
+            entry.update(
+                {
+                    "num_crawls": previous["num_crawls"] + 1,
+                    "num_changes": previous["num_changes"] + int(changed),
+                    "observed_sec": previous["observed_sec"]
+                    + max(now - previous["last_crawled_at"], 0),
+                    "first_crawled_at": previous["first_crawled_at"],
+                    "last_changed_at": now
+                    if changed
+                    else previous["last_changed_at"],
+                    "page": entry["page"] or previous["page"],
+                    "listing_num": entry["listing_num"]
+                    or previous["listing_num"],
+                }
+            )
+        entry["volatility_reasons"] = get_volatility_reasons(
+            dict(volatility_attributes, **snapshot), now
+        )
+        interval = min(
+            max(1 / self.get_change_rate(entry), self.min_interval),
+            self.max_interval,
+        )
+        entry["interval_sec"] = interval
+        entry["next_due_at"] = now + interval
+        return self.append(entry)
+
+    def get_plan(self, budget, now=None):
+        """
+        Get listings to recrawl with a budget of requests (by priority).
+
+        Notes
+        -----
+        1. Listings whose next crawl is due come first, by priority. Any
+           remaining budget is spent on the listings that are not due yet
+           with the highest priority.
+        """
+        now = now or time.time()
+        entries = sorted(
+            self.entries.values(),
+            key=lambda e: (e["next_due_at"] > now, -self.get_priority(e, now)),
+        )
+        return [
+            dict(entry, priority=self.get_priority(entry, now))
+            for entry in entries[:budget]
+        ]
+
+    def get_summary(self, now=None):
+        """Get number of listings, number due and mean interval (days)."""
+        now = now or time.time()
+        entries = list(self.entries.values())
+        return {
+            "num_listings": len(entries),
+            "num_due": sum(e["next_due_at"] <= now for e in entries),
+            "mean_interval_days": (
+                sum(e["interval_sec"] for e in entries) / len(entries) / DAY
+                if entries
+                else None
+            ),
+        }
+
+    def compact(self):
+        """Rewrite file with only the latest line of each listing."""
+        with self.lock:
+            tmp_filepath = f"{self.filepath}.tmp"
+            with open(tmp_filepath, "w") as f:
+                for entry in self.entries.values():
+                    f.write(f"{json.dumps(entry, default=str)}\n")
+            os.replace(tmp_filepath, self.filepath)
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Helper functions for scraping search results or listings with requests."""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-locals,too-many-statements
+
+
+import datetime
+import os
+import re
+import time
+from random import randrange
+
+import pandas as pd
+
+import src.bs4_helpers as bsh
+import src.failure_records as fr
+from src.crawl_metrics import log_event, metrics
+from src.dead_letter_queue import get_entry_id
+from src.failure_records import dict_failed_extraction_from_listing_page
+from src.utils import save_to_parquet_file
+
+# Listings with a smaller fraction of their required attributes extracted are
+# failed (eg. page that is not a listing, or markup of the store changed, see
+# src.bs4_helpers.scrape_game_listing)
+MIN_COMPLETENESS = 0.5
+
+
+def random_human_readable_timestamp_to_unix(
+    start_date=datetime.datetime(1980, 4, 6),
+    end_date=datetime.datetime(2000, 12, 7),
+):
+    """Create random UNIX timestamp to use as birthdate in request cookie."""
+    time_between_dates = end_date - start_date
+    days_between_dates = time_between_dates.days
+    random_number_of_days = randrange(days_between_dates)
+    random_date = start_date + datetime.timedelta(days=random_number_of_days)
+    return int(random_date.timestamp())
+
+
+def get_failed_search_result(current_page_num, request_status_code, k):
+    """Return a dict of Nones for a single search result."""
+    return {
+        "page": current_page_num,
+        "request_status_code": request_status_code,
+        "listing_counter": k + 1,
+        "title": None,
+        "url": None,
+        "platform_names": None,
+        "release_date": None,
+        "discount_pct": None,
+        "original_price": None,
+        "discount_price": None,
+    }
+
+
+def get_single_search_result(search_result):
+    """Get attributes of a single search result from search results page."""
+    listing_info = search_result.find(
+        "div", class_="responsive_search_name_combined"
+    )
+
+    # Get title
+    title_os = listing_info.find("div", class_="col search_name ellipsis")
+    title = title_os.find("span", class_="title").text.strip()
+    title = re.sub(r"\W+", "", title.replace(" ", "_"))
+
+    # Get app_id and listing URL
+    app_id = search_result["data-ds-appid"]
+    url = f"https://store.steampowered.com/app/{app_id}/{title}/"
+
+    # Get supported platforms
+    try:
+        platform_spans = title_os.find("p").find_all("span")
+        platform_names = ",".join([p["class"][-1] for p in platform_spans])
+    except Exception:
+        platform_names = [None, None, None]
+
+    # Get release date
+    try:
+        rel_date = listing_info.find(
+            "div", class_="col search_released responsive_secondrow"
+        )
+        release_date = rel_date.text.strip()
+    except Exception:
+        release_date = None
+
+    # Get discount percent
+    discount_price = listing_info.find(
+        "div", {"class": "search_price_discount_combined"}
+    ).find_all("div")
+    discount_pct = (
+        discount_price[0].text.strip()
+        if discount_price[0].text.strip()
+        else None
+    )
+
+    # Get original and discount price (if any)
+    try:
+        price = listing_info.find(
+            "div", class_="search_price_discount_combined"
+        ).find("div", class_="search_price")
+        price = price.text.strip()
+        _, original_price, discount_price = price.split("$")
+    except Exception:
+        original_price = (
+            discount_price[1].text.strip().replace("$", "")
+            if discount_price[1].text.strip()
+            else None
+        )
+        discount_price = None
+    return {
+        "title": title,
+        "url": url,
+        "platform_names": platform_names,
+        "release_date": release_date,
+        "discount_pct": discount_pct,
+        "original_price": original_price,
+        "discount_price": discount_price,
+    }
+
+
+def scrape_single_page_search_results(
+    soup,
+    raw_data_dir,
+    current_page_num,
+    request_status_code,
+    verbose=False,
+    dead_letters=None,
+    url=None,
+):
+    """Scrape a single page of search results and export to parquet file.
+
+    If a DeadLetterQueue is passed, failures are recorded in it instead of
+    being exported as rows of Nones.
+    """
+    start_time = time.time()
+    k = 0
+    d_search_results = []
+    try:
+        # 1. Get all search results displayed on page
+        search_results_div = soup.find(
+            "div", {"id": "search_resultsRows"}
+        ).find_all("a", class_="search_result_row")
+        # 2. Verify some search results on page
+        assert len(search_results_div) > 0
+        try:
+            # 3. Iterate over all rows of search results found on page
+            for k, search_result in enumerate(search_results_div):
+                search_result_info = get_single_search_result(search_result)
+                if verbose:
+                    log_event(
+                        "search_result_scraped",
+                        " ".join(
+                            str(v)
+                            for v in [
+                                current_page_num,
+                                request_status_code,
+                                k + 1,
+                                *search_result_info.values(),
+                            ]
+                        ),
+                        page=current_page_num,
+                        listing_counter=k + 1,
+                    )
+                d_search_results.append(
+                    {
+                        "page": current_page_num,
+                        "request_status_code": request_status_code,
+                        "listing_counter": k + 1,
+                        **search_result_info,
+                    }
+                )
+            log_event(
+                "search_results_scraped",
+                "Retrieved listings from search results page "
+                f"{current_page_num}.",
+                page=current_page_num,
+                num_listings=len(d_search_results),
+            )
+        # Handle error during scraping of single search results page
+        except Exception as e:
+            if dead_letters is None:
+                d_search_results.append(
+                    get_failed_search_result(
+                        current_page_num, request_status_code, k
+                    )
+                )
+            else:
+                dead_letters.record_failure(
+                    "search_results", "parse", e, url, current_page_num
+                )
+            metrics.inc("steam_failure_records_total", kind="search_results")
+            log_event(
+                "search_results_failed",
+                "Error retrieving listings from search results page "
+                f"{current_page_num}.",
+                page=current_page_num,
+                listing_counter=k + 1,
+            )
+    # Handle error of no search results
+    except Exception as e:
+        if dead_letters is None:
+            d_search_results = [
+                get_failed_search_result(
+                    current_page_num, request_status_code, k
+                )
+                for _ in range(25)
+            ]
+            metrics.inc(
+                "steam_failure_records_total", 25, kind="search_results"
+            )
+        else:
+            dead_letters.record_failure(
+                "search_results", "empty_page", e, url, current_page_num
+            )
+        log_event(
+            "search_results_empty",
+            f"No listings on search results page {current_page_num}.\n",
+            page=current_page_num,
+        )
+    metrics.observe(
+        "steam_parse_duration_seconds",
+        time.time() - start_time,
+        kind="search_results",
+    )
+
+    # 4. Create DataFrame from list of dicts and export to parquet file
+    df_single_page_search_results = pd.DataFrame.from_records(
+        d_search_results,
+        columns=list(get_failed_search_result(current_page_num, None, k)),
+    )
+    if df_single_page_search_results.empty:
+        return df_single_page_search_results
+    if dead_letters is not None and len(d_search_results) == len(
+        search_results_div
+    ):
+        dead_letters.resolve(
+            get_entry_id("search_results", page=current_page_num)
+        )
+    timestr = time.strftime("%Y%m%d_%H%M%S")
+    parquet_filepath = os.path.join(
+        raw_data_dir,
+        f"search_results_page_{current_page_num}_{timestr}.parquet",
+    )
+    if not os.path.exists(parquet_filepath):
+        save_to_parquet_file(
+            [df_single_page_search_results], [parquet_filepath]
+        )
+        log_event(
+            "search_results_exported",
+            f"Exported search results for page {current_page_num}.\n",
+            page=current_page_num,
+            filepath=parquet_filepath,
+        )
+    else:
+        log_event(
+            "search_results_export_skipped",
+            "File was found with search results information for page "
+            f"{current_page_num}. Did nothing.\n",
+            page=current_page_num,
+            filepath=parquet_filepath,
+        )
+    metrics.inc("steam_pages_scraped_total")
+    return df_single_page_search_results
+
+
+def get_listing_title(soup):
+    """Get title of listing, to use in name of exported file."""
+    details_block = soup.find("div", {"id": "genresAndManufacturer"})
+    game_title = (
+        details_block.text.lower()
+        .split("\ngenre: ")[0]
+        .split("title: ")[-1]
+        .title()
+    )
+    return re.sub(r"\W+", "", game_title.replace(" ", "_"))
+
+
+def scrape_listing_requests(
+    soup,
+    listing_num,
+    page_num,
+    raw_data_dir,
+    url,
+    dead_letters=None,
+    min_completeness=MIN_COMPLETENESS,
+):
+    """Scrape a single listing with the requests library.
+
+    If a DeadLetterQueue is passed, failures (including listings with less
+    than min_completeness of their required attributes extracted) are
+    recorded in it instead of being exported.
+
+    Returns the scraped listing and the path to the CSV file to which it was
+    exported (both None if the listing was not exported).
+    """
+    listing_info = {"page": page_num, "listing_num": listing_num, "url": url}
+    log_event(
+        "listing_started",
+        f"Starting with listing {listing_num}",
+        **listing_info,
+    )
+    start_time = time.time()
+    game_title = "Unknown"
+    failure = None
+    # 1. Scrape
+    try:
+        game_title = get_listing_title(soup)
+        log_event(
+            "listing_title_scraped",
+            f"Scraped game title for listing {listing_num} ({game_title})",
+            title=game_title,
+            **listing_info,
+        )
+        try:
+            listing_details = bsh.scrape_game_listing(soup)
+            log_event(
+                "listing_scraped",
+                f"Scraped listing {listing_num}",
+                **listing_info,
+            )
+            fr.record_failed_fields(listing_details, **listing_info)
+            if listing_details["completeness"] < min_completeness:
+                failure = [
+                    "parse",
+                    f"Only {listing_details['completeness']:.0%} of required "
+                    "listing attributes extracted",
+                ]
+        except Exception as e:
+            listing_details = dict_failed_extraction_from_listing_page()
+            failure = ["parse", e]
+            metrics.inc(
+                "steam_failure_records_total", kind="listing", reason="details"
+            )
+            log_event(
+                "listing_failed",
+                f"Error with listing {listing_num}. Used failure record.",
+                reason="details",
+                **listing_info,
+            )
+    except Exception as e:
+        listing_details = dict_failed_extraction_from_listing_page()
+        failure = ["title", e]
+        # Check if the listing is a collection
+        try:
+            collection_text = soup.find(
+                "h2", {"class": "no_margin"}
+            ).text.lower()
+            exp_collection_text = "items included in this package"
+            if collection_text == exp_collection_text:
+                game_title = soup.find("h2", {"class": "pageheader"}).text
+                game_title = re.sub(r"\W+", "", game_title.replace(" ", "_"))
+                reason = "collection"
+                failure = ["collection", "Listing is collection of games"]
+                message = (
+                    "Listing is collection of games. Used failure record. "
+                    "Skipped page scrape."
+                )
+            else:
+                reason = "no_title"
+                message = (
+                    f"For included items, got {collection_text}. "
+                    "Used failure record."
+                )
+        except Exception:
+            reason = "unknown"
+            message = "Unknown reason for error."
+        metrics.inc(
+            "steam_failure_records_total", kind="listing", reason=reason
+        )
+        log_event("listing_failed", message, reason=reason, **listing_info)
+    metrics.observe(
+        "steam_parse_duration_seconds",
+        time.time() - start_time,
+        kind="listing",
+    )
+
+    if dead_letters is not None:
+        if failure:
+            dead_letters.record_failure(
+                "listing",
+                *failure,
+                url=url,
+                page=page_num,
+                listing_num=listing_num,
+            )
+            return [None, None]
+        dead_letters.resolve(get_entry_id("listing", url))
+
+    # 2. Export to CSV
+    fname = f"p{page_num}_l{listing_num}_{game_title}.csv"
+    df_listing_details = (
+        pd.DataFrame.from_records([listing_details])
+        .assign(page_num=page_num)
+        .assign(listing_num=listing_num)
+        .assign(url=url)
+    )
+    listing_filepath = os.path.join(raw_data_dir, fname)
+    df_listing_details.to_csv(listing_filepath, index=False)
+    log_event(
+        "listing_exported",
+        f"Exported listing attributes for {game_title} to CSV file",
+        filepath=listing_filepath,
+        **listing_info,
+    )
+
+    # 3. Print duration
+    duration = time.time() - start_time
+    metrics.inc("steam_listings_scraped_total")
+    log_event(
+        "listing_done",
+        f"Done with page {page_num} listing {listing_num} in "
+        f"{duration:.3f} sec.",
+        duration=duration,
+        **listing_info,
+    )
+    return [df_listing_details, listing_filepath]
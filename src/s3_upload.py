@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Concurrent upload of new or changed raw data files to AWS S3."""
+
+
+# pylint: disable=invalid-name,broad-except
+
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+MB = 1024 * 1024
+
+
+def get_transfer_config(
+    multipart_threshold=8 * MB, multipart_chunksize=8 * MB, max_concurrency=4
+):
+    """Get multipart settings used to upload a single file."""
+    return TransferConfig(
+        multipart_threshold=multipart_threshold,
+        multipart_chunksize=multipart_chunksize,
+        max_concurrency=max_concurrency,
+        use_threads=True,
+    )
+
+
+def get_s3_client(aws_region="us-east-2", max_workers=16, endpoint_url=None):
+    """Get S3 client with a connection pool sized for concurrent uploads."""
+    return boto3.client(
+        "s3",
+        region_name=aws_region,
+        # eg. http://localhost:9000 for a local MinIO server
+        endpoint_url=endpoint_url,
+        config=Config(max_pool_connections=max_workers * 4),
+    )
+
+
+def compute_s3_etag(filepath, multipart_threshold, multipart_chunksize):
+    """Compute ETag that S3 assigns to a file uploaded with these settings."""
+    if os.path.getsize(filepath) < multipart_threshold:
+        file_hash = hashlib.md5()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(MB), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+    # Multipart ETag is MD5 of concatenated part MD5s, with number of parts
+    part_digests = []
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(multipart_chunksize), b""):
+            part_digests.append(hashlib.md5(chunk).digest())
+    etag = hashlib.md5(b"".join(part_digests)).hexdigest()
+    return f"{etag}-{len(part_digests)}"
+
+
+def list_remote_objects(s3_client, s3_bucket_name, prefix=""):
+    """Get size and ETag of every object in S3 bucket, keyed by object key."""
+    remote_objects = {}
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=s3_bucket_name, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            remote_objects[obj["Key"]] = {
+                "size": obj["Size"],
+                "etag": obj["ETag"].strip('"'),
+            }
+    return remote_objects
+
+
+def get_object_key(filepath, data_dir, prefix=""):
+    """Get S3 object key of local file, from path relative to data_dir."""
+    rel_path = os.path.relpath(filepath, data_dir).replace(os.sep, "/")
+    return f"{prefix}{rel_path}"
+
+
+def is_unchanged(filepath, remote_object, transfer_config, compare="etag"):
+    """Check if local file matches the object already in S3 bucket."""
+    if remote_object is None:
+        return False
+    if os.path.getsize(filepath) != remote_object["size"]:
+        return False
+    if compare == "size":
+        return True
+    return remote_object["etag"] == compute_s3_etag(
+        filepath,
+        transfer_config.multipart_threshold,
+        transfer_config.multipart_chunksize,
+    )
+
+
+def sync_file(
+    s3_client,
+    filepath,
+    s3_bucket_name,
+    object_key,
+    remote_object,
+    transfer_config,
+    compare="etag",
+):
+    """Upload single file to S3 bucket, unless it is unchanged."""
+    if is_unchanged(filepath, remote_object, transfer_config, compare):
+        return ["skipped", 0]
+    s3_client.upload_file(
+        filepath, s3_bucket_name, object_key, Config=transfer_config
+    )
+    return ["uploaded", os.path.getsize(filepath)]
+
+
+def sync_dir_to_s3(
+    data_dir,
+    s3_bucket_name,
+    s3_client=None,
+    aws_region="us-east-2",
+    prefix="",
+    search_str="*",
+    max_workers=16,
+    transfer_config=None,
+    compare="etag",
+):
+    """
+    Upload new or changed files in local directory to S3 bucket.
+
+    Parameters
+    ----------
+    data_dir : str
+        Local directory with files to be uploaded
+    s3_bucket_name : str
+        Name of S3 bucket
+    s3_client : boto3.client
+        (Optional) S3 client (eg. with endpoint_url of local S3 server)
+    prefix : str
+        Prefix prepended to S3 object keys (eg. "raw/")
+    search_str : str
+        Glob pattern, relative to data_dir, of files to be uploaded
+    max_workers : int
+        Number of files uploaded at the same time
+    transfer_config : boto3.s3.transfer.TransferConfig
+        Multipart settings (see get_transfer_config)
+    compare : str
+        How to detect unchanged files, using the bucket listing
+        ("etag" = size and content hash, "size" = size only)
+
+    Usage
+    -----
+    > sync_dir_to_s3("data/raw", "my-bucket", aws_region="us-east-2")
+
+    Notes
+    -----
+    1. The bucket is listed once and every local file is compared to its
+       listed size and ETag, so no per-object requests are sent for
+       unchanged files.
+    2. ETags are computed locally with the same multipart settings that are
+       used to upload, so changing the multipart chunk size causes large
+       files to be uploaded again on the next run.
+    """
+    s3_client = s3_client or get_s3_client(aws_region, max_workers)
+    transfer_config = transfer_config or get_transfer_config()
+    filepaths = [
+        f
+        for f in sorted(
+            glob(os.path.join(data_dir, search_str), recursive=True)
+        )
+        if os.path.isfile(f)
+    ]
+    remote_objects = list_remote_objects(s3_client, s3_bucket_name, prefix)
+    print(
+        f"Found {len(filepaths):,} local files and {len(remote_objects):,} "
+        f"objects in bucket {s3_bucket_name}"
+    )
+
+    start_time = time.time()
+    status = {"uploaded": [], "skipped": [], "failed": []}
+    num_bytes = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for filepath in filepaths:
+            object_key = get_object_key(filepath, data_dir, prefix)
+            futures[filepath] = executor.submit(
+                sync_file,
+                s3_client,
+                filepath,
+                s3_bucket_name,
+                object_key,
+                remote_objects.get(object_key),
+                transfer_config,
+                compare,
+            )
+        for filepath, future in futures.items():
+            try:
+                file_status, file_bytes = future.result()
+                num_bytes += file_bytes
+            except Exception as e:
+                file_status = "failed"
+                print(f"Error uploading {filepath}. Got {str(e)}")
+            status[file_status].append(filepath)
+    duration = time.time() - start_time
+    print(
+        f"Uploaded {len(status['uploaded']):,}, skipped "
+        f"{len(status['skipped']):,} unchanged and failed "
+        f"{len(status['failed']):,} files in {duration:.3f} sec. "
+        f"({num_bytes / MB / max(duration, 1e-6):.2f} MB/s)"
+    )
+    return status
@@ -8,12 +8,35 @@
 # pylint: disable=invalid-name,broad-except,too-many-arguments
 
 
-import time
+import math
 from random import choice, randint, sample, shuffle, uniform
 
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.support.ui import Select
 
+import src.navigation_clock as nc
+from src.age_gate import add_cookies_to_driver, is_age_gate_page
+from src.crawl_metrics import log_event, metrics
+
+# Scrolls to each position (first argument) after its delay in ms (second
+# argument), then calls back to end execute_async_script
+SCROLL_TRAJECTORY_SCRIPT = """
+var positions = arguments[0];
+var delays = arguments[1];
+var done = arguments[arguments.length - 1];
+function scrollStep(k) {
+    if (k >= positions.length) {
+        done(window.scrollY);
+        return;
+    }
+    window.setTimeout(function () {
+        window.scrollTo(0, positions[k]);
+        scrollStep(k + 1);
+    }, delays[k]);
+}
+scrollStep(0);
+"""
+
 
 def enter_age(driver):
     """Enter a random date of birth for a listing with age restrictions."""
@@ -47,10 +70,18 @@ def enter_age(driver):
         )
         select.select_by_visible_text(f"{str(randint(1975, 2000))}")
         age_entry = True
-        print("COMPLETED AGE CHECK: Age entry required")
+        log_event(
+            "age_check",
+            "COMPLETED AGE CHECK: Age entry required",
+            age_entry=age_entry,
+        )
     except Exception:
-        print("COMPLETED AGE CHECK: Age entry was not required")
         age_entry = False
+        log_event(
+            "age_check",
+            "COMPLETED AGE CHECK: Age entry was not required",
+            age_entry=age_entry,
+        )
     # Click proceed button
     proceed_button = driver.find_elements_by_xpath(
         './/div[@class="agegate_text_container btns"]/a'
@@ -59,13 +90,50 @@ def enter_age(driver):
     return [driver, age_entry]
 
 
+def pass_age_gate(driver, cookies=None):
+    """
+    Get past age gate of page loaded in browser, if one is shown.
+
+    Parameters
+    ----------
+    driver : selenium.webdriver
+        Browser with listing page loaded
+    cookies : Dict
+        (Optional) Age-check cookies of worker (see
+        src.age_gate.load_age_check_cookies)
+
+    Notes
+    -----
+    1. Checking for the gate is a single lookup. If age-check cookies were
+       already added to the browser, no gate is shown.
+    2. If a gate is shown, the cookies are added and the page is reloaded.
+       A date of birth is only entered (enter_age) if the gate is still
+       shown, in which case the gate is an extra page in the history of
+       the browser (age_entry is True).
+    """
+    if not is_age_gate_page(driver):
+        return [driver, False]
+    metrics.inc("steam_age_gates_total")
+    if cookies:
+        add_cookies_to_driver(driver, cookies, None)
+        driver.refresh()
+        if not is_age_gate_page(driver):
+            log_event(
+                "age_check",
+                "Passed age check with age-check cookies",
+                age_entry=False,
+            )
+            return [driver, False]
+    return enter_age(driver)
+
+
 def sort_search_results(driver):
     """Sort displayed search results."""
     # Get options from the sort dropdown menu
     dropdown_sort = driver.find_element_by_xpath('.//a[@class="trigger"]')
     # Can only click this dropdown once
     dropdown_sort.click()
-    time.sleep(uniform(0.9, 2.1))
+    nc.sleep(uniform(0.9, 2.1))
 
     # Get dropdown options to sort
     dropdown_sort_options = driver.find_element_by_xpath(
@@ -77,13 +145,62 @@ def sort_search_results(driver):
 
     # (Randomly) Scroll through all dropdown options
     for sort_option in dropdown_sort_options:
-        print(f"Scrolled to sort option: {sort_option.text}")
+        # Each read of the text is a round-trip to the browser
+        sort_option_text = sort_option.text
+        log_event(
+            "sort_option_hovered",
+            f"Scrolled to sort option: {sort_option_text}",
+            sort_option=sort_option_text,
+        )
         hover = ActionChains(driver).move_to_element(sort_option)
         hover.perform()
-        time.sleep(uniform(1.1, 2.9))
+        nc.sleep(uniform(1.1, 2.9))
     return driver
 
 
+def get_scroll_trajectory(
+    total_height,
+    by_how_much=22,
+    min_num_pauses=1,
+    max_num_pauses=4,
+    min_pause=0.1,
+    max_pause=2.4,
+    scroll_direction="up",
+    min_step_delay=0.004,
+    max_step_delay=0.012,
+    easing=1.5,
+):
+    """
+    Get scroll positions, and delay (ms) before scrolling to each position.
+
+    Notes
+    -----
+    1. Pauses are placed at randomly selected steps, which are selected
+       once per scroll.
+    2. Steps are slowest at the start and end of the scroll, and fastest
+       in the middle (easing is how many times slower the first and last
+       steps are).
+    """
+    if scroll_direction == "down":
+        positions = list(range(1, total_height, by_how_much))
+    else:
+        positions = list(range(total_height, 1, -by_how_much))
+    num_steps = len(positions)
+    delays = []
+    for k in range(num_steps):
+        # 0 at the start and end of scroll, 1 in the middle
+        progress = math.sin(math.pi * k / max(num_steps - 1, 1))
+        delays.append(
+            uniform(min_step_delay, max_step_delay)
+            * (1 + easing * (1 - progress))
+        )
+    if max_num_pauses > min_num_pauses:
+        num_pauses = min(randint(min_num_pauses, max_num_pauses), num_steps)
+        for k in sample(range(num_steps), num_pauses):
+            delays[k] += uniform(min_pause, max_pause)
+    return [positions, [round(delay * 1000) for delay in delays]]
+
+
 def scroll_up_down_page(
     driver,
     by_how_much=22,
@@ -117,28 +234,30 @@ def scroll_up_down_page(
     Notes
     -----
     1. For no pauses, set min_num_pauses = max_num_pauses.
+    2. A slow scroll is sent to the browser as a single script, with all
+       of its steps and pauses (see get_scroll_trajectory), which returns
+       once the scroll is finished.
     """
     # Get total height of page
     total_height = int(
         driver.execute_script("return document.body.scrollHeight")
     )
 
-    if scroll_direction == "down":
-        scroll_steps = list(range(1, total_height, by_how_much))
-    else:
-        scroll_steps = list(range(total_height, 1, -by_how_much))
-
     if scroll_method == "slow":
-        # Scroll in steps
-        for i in scroll_steps:
-            if max_num_pauses > min_num_pauses:
-                # Pause between steps
-                stop_points = sample(
-                    scroll_steps, randint(min_num_pauses, max_num_pauses)
-                )
-                if i in stop_points:
-                    time.sleep(uniform(min_pause, max_pause))
-            driver.execute_script(f"window.scrollTo(0, {i});")
+        # Scroll in steps, in the browser
+        positions, delays = get_scroll_trajectory(
+            total_height,
+            by_how_much,
+            min_num_pauses,
+            max_num_pauses,
+            min_pause,
+            max_pause,
+            scroll_direction,
+        )
+        driver.set_script_timeout(sum(delays) / 1000 + 30)
+        driver.execute_async_script(
+            SCROLL_TRAJECTORY_SCRIPT, positions, delays
+        )
     else:
         # Scroll in one fluid motion, without steps
         if scroll_direction == "down":
@@ -4,11 +4,12 @@
 
 """Helper functions for navigating a web page with selenium."""
 
-import time
 from random import randint, shuffle, uniform
 
 from selenium.webdriver.common.action_chains import ActionChains
 
+import src.navigation_clock as nc
+from src.crawl_metrics import log_event
 from src.selenium_helpers import smooth_scroll_until_element_in_view
 
 # pylint: disable=invalid-name,broad-except
@@ -24,13 +25,13 @@ def perform_random_navigation_on_page(
             './/div[@data-flyout="genre_flyout"]'
         )
         driver = smooth_scroll_until_element_in_view(driver, categories_flyout)
-        time.sleep(uniform(0.8, 1.4))
+        nc.sleep(uniform(0.8, 1.4))
         # Un-hide categories flyout
         categories_flyout_updated = driver.find_element_by_xpath(
             './/div[@data-flyout="genre_flyout"]'
         )
         categories_flyout_updated.click()
-        print("Clicked on categories fly-out")
+        log_event("categories_flyout_opened", "Clicked on categories fly-out")
     else:
         # Mouse over the categories flyout
         actions = ActionChains(driver)
@@ -38,13 +39,20 @@ def perform_random_navigation_on_page(
             './/div[@data-flyout="genre_flyout"]'
         )
         actions.move_to_element(categories_flyout).perform()
-        print("Moved the mouse cursor over the categories fly-out")
+        log_event(
+            "categories_flyout_opened",
+            "Moved the mouse cursor over the categories fly-out",
+        )
 
     # Get all categories' web elements
     categories_menu = driver.find_element_by_xpath(
         './/div[@id="genre_flyout"]/div'
     ).find_elements_by_tag_name("div")
-    print("Retrieved raw categories and sub-categories, including blanks")
+    log_event(
+        "categories_retrieved",
+        "Retrieved raw categories and sub-categories, including blanks",
+        num_categories=len(categories_menu),
+    )
 
     # Extract a list of web elements for the Genres
     categories_indexes = [0, 2, 8, 10, 18, 26]
@@ -58,7 +66,11 @@ def perform_random_navigation_on_page(
             all_genres.append(single_cat_subsection)
     # Shuffle the list of Genre elements so that order is removed
     shuffle(all_genres)
-    print("Retrieved categories and sub-categories with links")
+    log_event(
+        "genres_retrieved",
+        "Retrieved categories and sub-categories with links",
+        num_genres=len(all_genres),
+    )
 
     # Get a (random) number of hovers (to be performed on the page)
     num_sub_cats_to_hover_over = randint(min_num_hovers, max_num_hovers)
@@ -67,19 +79,25 @@ def perform_random_navigation_on_page(
     for genre in all_genres[:num_sub_cats_to_hover_over]:
         hover = ActionChains(driver).move_to_element(genre)
         hover.perform()
-        time.sleep(uniform(0, 1.8))
-    print(f"Performed {num_sub_cats_to_hover_over} hovers on page")
+        nc.sleep(uniform(0, 1.8))
+    log_event(
+        "genres_hovered",
+        f"Performed {num_sub_cats_to_hover_over} hovers on page",
+        num_hovers=num_sub_cats_to_hover_over,
+    )
 
     # Get Install Steam button
     install_steam_button = driver.find_element_by_xpath(
         './/a[@class="header_installsteam_btn_content"]'
     )
     driver = smooth_scroll_until_element_in_view(driver, install_steam_button)
-    time.sleep(uniform(0.5, 1.2))
+    nc.sleep(uniform(0.5, 1.2))
     # Hover over Install Steam button (also collapses opened Categories menu)
     hover = ActionChains(driver).move_to_element(install_steam_button)
     hover.perform()
-    print("Hovered over the Install Steam button")
+    log_event(
+        "install_button_hovered", "Hovered over the Install Steam button"
+    )
     return driver
 
 
@@ -108,8 +126,12 @@ def randomly_interact_with_tag_based_filters(
                 .find_elements_by_tag_name("span")
             )
             single_tag[0].click()
-            time.sleep(uniform(1, 2.2))
-    print(f"Selected and Un-selected {len(tag_indexes)} tags")
+            nc.sleep(uniform(1, 2.2))
+    log_event(
+        "tag_filters_toggled",
+        f"Selected and Un-selected {len(tag_indexes)} tags",
+        num_tags=len(tag_indexes),
+    )
     return driver
 
 
@@ -122,7 +144,7 @@ def randomly_interact_with_feature_based_filters(
         './/div[@data-collapse-name="category2"]/div'
     )
     feat_header.click()
-    time.sleep(uniform(0.5, 2.2))
+    nc.sleep(uniform(0.5, 2.2))
 
     # Get all features
     narrow_by_feat = driver.find_element_by_xpath(
@@ -145,8 +167,12 @@ def randomly_interact_with_feature_based_filters(
                 .find_elements_by_tag_name("span")
             )
             single_feat[0].click()
-            time.sleep(uniform(1, 2.2))
-    print(f"Selected and Un-selected {len(feat_indexes)} features")
+            nc.sleep(uniform(1, 2.2))
+    log_event(
+        "feature_filters_toggled",
+        f"Selected and Un-selected {len(feat_indexes)} features",
+        num_features=len(feat_indexes),
+    )
 
     # Close narrow by feature expandable block
     feat_header.click()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Cached, concurrent retrieval of StatCounter desktop OS market-share data.
+
+Each monthly series (one per region) is downloaded as a CSV file and kept
+in an on-disk cache, keyed by the region and date range of the series. A
+cached series is re-used without any request until it is older than the
+time-to-live (TTL), after which it is revalidated with a conditional
+request.
+"""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import requests
+
+STATCOUNTER_URL = (
+    "https://gs.statcounter.com/os-market-share/desktop/{path}chart.php?"
+    "device=Desktop&device_hidden=desktop&statType_hidden=os_combined&"
+    "region_hidden={region_hidden}&granularity=monthly&"
+    "statType=Operating%20System&region={region}&"
+    "fromInt={from_int}&toInt={to_int}&"
+    "fromMonthYear={from_month}&toMonthYear={to_month}&csv=1"
+)
+
+# Name of each OS column of the StatCounter CSV file in the output (columns
+# that are not listed are dropped). Chrome OS is combined with Linux, since
+# Chrome OS has always been Linux-based
+OS_NAMES = {
+    "Windows": "Windows",
+    "OS X": "MacOS",
+    "Linux": "Linux",
+    "Chrome OS": "Linux",
+    "Unknown": "Unknown",
+}
+
+# Revalidate cached series after one week
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+thread_local = threading.local()
+
+
+def get_session():
+    """Get requests session of the current thread (one per thread)."""
+    if not hasattr(thread_local, "session"):
+        thread_local.session = requests.Session()
+    return thread_local.session
+
+
+def get_marketshare_url(region, from_month="2013-12", to_month="2021-09"):
+    """Get URL of monthly market-share CSV for region (eg. worldwide, japan).
+
+    Months are formatted as YYYY-MM.
+    """
+    is_worldwide = region == "worldwide"
+    return STATCOUNTER_URL.format(
+        path="worldwide/" if is_worldwide else "",
+        region_hidden="ww" if is_worldwide else "TD",
+        region="Worldwide" if is_worldwide else region,
+        from_int=from_month.replace("-", ""),
+        to_int=to_month.replace("-", ""),
+        from_month=from_month,
+        to_month=to_month,
+    )
+
+
+def get_cache_filepath(cache_dir, region, from_month, to_month, url):
+    """Get path to cached CSV file of a single series."""
+    url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(
+        cache_dir,
+        f"pc_marketshare_{region}_{from_month}_{to_month}_{url_hash}.csv",
+    )
+
+
+def load_cache_metadata(cache_filepath):
+    """Load time of download and validators (ETag, etc.) of cached series."""
+    metadata_filepath = f"{cache_filepath}.json"
+    if not (
+        os.path.exists(cache_filepath) and os.path.exists(metadata_filepath)
+    ):
+        return None
+    with open(metadata_filepath) as f:
+        return json.load(f)
+
+
+def save_to_cache(cache_filepath, contents, metadata):
+    """Save series and its metadata to cache (atomically)."""
+    for filepath, data in [
+        [cache_filepath, contents],
+        [f"{cache_filepath}.json", json.dumps(metadata, indent=1).encode()],
+    ]:
+        tmp_filepath = f"{filepath}.tmp"
+        with open(tmp_filepath, "wb") as f:
+            f.write(data)
+        os.replace(tmp_filepath, filepath)
+
+
+def is_marketshare_csv(contents):
+    """Check if downloaded contents are a market-share CSV file."""
+    return contents.lstrip(b"\xef\xbb\xbf").startswith(b'"Date"')
+
+
+def fetch_series(url, cache_filepath, ttl=DEFAULT_TTL, timeout=30):
+    """
+    Get contents of single CSV series, from cache or by downloading it.
+
+    Parameters
+    ----------
+    url : str
+        URL of CSV file (see get_marketshare_url)
+    cache_filepath : str
+        Path to cached CSV file (see get_cache_filepath)
+    ttl : int
+        Number of seconds for which a cached series is used without any
+        request (None to never revalidate cached series)
+    timeout : int
+        Timeout of request, in seconds
+
+    Notes
+    -----
+    1. Returns the contents and how they were retrieved (cached,
+       revalidated, downloaded or stale).
+    2. If revalidation fails, the cached (stale) series is returned.
+    """
+    metadata = load_cache_metadata(cache_filepath)
+    if metadata is not None and (
+        ttl is None or time.time() - metadata["fetched_at"] < ttl
+    ):
+        with open(cache_filepath, "rb") as f:
+            return [f.read(), "cached"]
+
+    headers = {}
+    if metadata is not None:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+    try:
+        r = get_session().get(url, headers=headers, timeout=timeout)
+        if r.status_code == 304 and metadata is not None:
+            with open(cache_filepath, "rb") as f:
+                contents = f.read()
+            status = "revalidated"
+        else:
+            r.raise_for_status()
+            contents = r.content
+            if not is_marketshare_csv(contents):
+                raise ValueError("Response is not a market-share CSV file")
+            status = "downloaded"
+    except Exception:
+        if metadata is None:
+            raise
+        with open(cache_filepath, "rb") as f:
+            return [f.read(), "stale"]
+    save_to_cache(
+        cache_filepath,
+        contents,
+        {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": r.headers.get("ETag", metadata and metadata.get("etag")),
+            "last_modified": r.headers.get(
+                "Last-Modified", metadata and metadata.get("last_modified")
+            ),
+        },
+    )
+    return [contents, status]
+
+
+def read_marketshare_csv(f, region, os_names=OS_NAMES):
+    """Read market-share CSV file of single region into tidy DataFrame."""
+    df = pd.read_csv(f)
+    os_cols = [c for c in df.columns if c in os_names]
+    df = (
+        df.melt(
+            id_vars=["Date"],
+            value_vars=os_cols,
+            var_name="os",
+            value_name="marketshare",
+        )
+        .assign(os=lambda df: df["os"].map(os_names))
+        .groupby(["Date", "os"], as_index=False, sort=False)["marketshare"]
+        .sum()
+    )
+    return df.assign(
+        region=region, date=pd.to_datetime(df["Date"], format="%Y-%m")
+    )[["region", "date", "os", "marketshare"]]
+
+
+def set_marketshare_dtypes(df):
+    """Apply datatypes of tidy market-share DataFrame."""
+    return df.astype(
+        {
+            "region": "category",
+            "date": "datetime64[ns]",
+            "os": "category",
+            "marketshare": "float64",
+        }
+    )
+
+
+def get_marketshare(
+    regions,
+    cache_dir,
+    from_month="2013-12",
+    to_month="2021-09",
+    ttl=DEFAULT_TTL,
+    max_workers=8,
+    os_names=OS_NAMES,
+):
+    """
+    Get monthly desktop OS market share for many regions.
+
+    Parameters
+    ----------
+    regions : List
+        Names of regions used by StatCounter (eg. worldwide, japan,
+        south-korea)
+    cache_dir : str
+        Directory holding cached CSV files
+    from_month, to_month : str
+        Range of months (YYYY-MM) of series
+    ttl : int
+        Number of seconds for which a cached series is used without any
+        request (None to never revalidate cached series)
+    max_workers : int
+        Number of series downloaded at the same time
+    os_names : Dict
+        Name of each OS column of the CSV file in the output
+
+    Usage
+    -----
+    > df = get_marketshare(["worldwide", "japan"], "data/raw/pc-marketshare")
+
+    Notes
+    -----
+    1. Returns a tidy DataFrame with one row per region, month and OS
+       (region, date, os, marketshare).
+    2. Regions whose series could not be retrieved are skipped.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for region in regions:
+            url = get_marketshare_url(region, from_month, to_month)
+            cache_filepath = get_cache_filepath(
+                cache_dir, region, from_month, to_month, url
+            )
+            futures[region] = executor.submit(
+                fetch_series, url, cache_filepath, ttl
+            )
+        dfs, status = [], {}
+        for region, future in futures.items():
+            try:
+                contents, status[region] = future.result()
+                dfs.append(
+                    read_marketshare_csv(
+                        io.BytesIO(contents), region, os_names
+                    )
+                )
+            except Exception as e:
+                status[region] = "failed"
+                print(f"Could not get data for {region}. Got {str(e)}")
+    duration = time.time() - start_time
+    status_counts = pd.Series(status, dtype=str).value_counts().to_dict()
+    print(
+        f"Got market share for {len(dfs):,} of {len(regions):,} regions "
+        f"in {duration:.3f} sec. ({status_counts})"
+    )
+    if not dfs:
+        return set_marketshare_dtypes(
+            pd.DataFrame(columns=["region", "date", "os", "marketshare"])
+        )
+    return set_marketshare_dtypes(
+        pd.concat(dfs, ignore_index=True)
+        .sort_values(by=["region", "date", "os"])
+        .reset_index(drop=True)
+    )
+
+
+def get_wide_marketshare(df, os_names=OS_NAMES):
+    """Get market share with one column per OS and one row per region/month.
+
+    Months are formatted as YYYY-MM.
+    """
+    df_wide = (
+        df.assign(
+            region=df["region"].astype(str),
+            os=df["os"].astype(str),
+            Date=df["date"].dt.strftime("%Y-%m"),
+        )
+        .pivot_table(
+            index=["region", "Date"],
+            columns="os",
+            values="marketshare",
+            aggfunc="sum",
+        )
+        .reset_index()
+    )
+    df_wide.columns.name = None
+    os_cols = [c for c in dict.fromkeys(os_names.values()) if c in df_wide]
+    return df_wide[["region", "Date"] + os_cols]
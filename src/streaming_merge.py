@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Bounded-memory merge of search results and listings via on-disk buckets."""
+
+
+# pylint: disable=invalid-name,broad-except,too-many-arguments
+
+
+import os
+import shutil
+from glob import glob
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import src.bulk_listings_reader as blr
+import src.processing_manifest as pm
+
+# Column holding the key used to partition and join both datasets
+MERGE_KEY_COL = "app_id"
+
+# Columns of search results files (request_status_code is only found in
+# search results scraped with requests)
+SEARCH_RESULTS_FIELDS = [
+    pa.field("page", pa.int64()),
+    pa.field("request_status_code", pa.float64()),
+    pa.field("listing_counter", pa.int64()),
+    pa.field("title", pa.string()),
+    pa.field("url", pa.string()),
+    pa.field("platform_names", pa.string()),
+    pa.field("release_date", pa.string()),
+    pa.field("discount_pct", pa.string()),
+    pa.field("original_price", pa.string()),
+    pa.field("discount_price", pa.string()),
+]
+
+
+def get_app_id_from_url(urls):
+    """Extract app_id from listing URLs."""
+    return urls.astype("string").str.extract(r"/app/(\d+)", expand=False)
+
+
+def add_app_id_from_url(df, url_col="url"):
+    """Append app_id column to DataFrame, extracted from listing URL."""
+    return df.assign(**{MERGE_KEY_COL: get_app_id_from_url(df[url_col])})
+
+
+def get_search_results_schema():
+    """Get Arrow schema of a single search results file."""
+    return pa.schema(SEARCH_RESULTS_FIELDS)
+
+
+def get_search_results_bucket_schema():
+    """Get Arrow schema of search results buckets."""
+    return get_search_results_schema().append(
+        pa.field(MERGE_KEY_COL, pa.string())
+    )
+
+
+def get_listings_bucket_schema():
+    """Get Arrow schema of listings buckets."""
+    return (
+        blr.get_listings_schema()
+        .append(pa.field("filename", pa.string()))
+        .append(pa.field(MERGE_KEY_COL, pa.string()))
+    )
+
+
+def read_search_results_file(filepath):
+    """Read single file of search results and append app_id."""
+    return add_app_id_from_url(pd.read_parquet(filepath, engine="auto"))
+
+
+def read_listing_file(filepath):
+    """Read single listing CSV file and append app_id and filename."""
+    listings_schema = blr.get_listings_schema()
+    table = blr.read_single_listing_csv(filepath, listings_schema)
+    return add_app_id_from_url(
+        table.rename_columns(listings_schema.names + ["filename"]).to_pandas()
+    )
+
+
+def read_listings_store_batch(df):
+    """Name raw file of listings read from processed store, append app_id."""
+    return add_app_id_from_url(
+        df.rename(columns={pm.SOURCE_FILE_COL: "filename"}).assign(
+            filename=lambda df: df["filename"].map(os.path.basename)
+        )
+    )
+
+
+def get_bucket_numbers(keys, num_buckets):
+    """Assign keys to one of num_buckets hash buckets."""
+    # Missing keys are hashed as an empty key, so rows with a missing key
+    # are kept together in a single bucket
+    return (
+        pd.util.hash_pandas_object(keys.fillna(""), index=False).to_numpy()
+        % num_buckets
+    )
+
+
+def get_bucket_dir(bucket_dir, bucket_num):
+    """Get directory holding all parts of a single bucket."""
+    return os.path.join(bucket_dir, f"bucket={bucket_num:04d}")
+
+
+def flush_to_buckets(dfs, bucket_dir, num_buckets, part_num, schema):
+    """Hash-partition buffered DataFrames and append to on-disk buckets."""
+    df = pd.concat(dfs, ignore_index=True)
+    bucket_nums = get_bucket_numbers(df[MERGE_KEY_COL], num_buckets)
+    for bucket_num, df_bucket in df.groupby(bucket_nums):
+        single_bucket_dir = get_bucket_dir(bucket_dir, bucket_num)
+        os.makedirs(single_bucket_dir, exist_ok=True)
+        pq.write_table(
+            conform_to_schema(df_bucket, schema),
+            os.path.join(single_bucket_dir, f"part-{part_num:06d}.parquet"),
+        )
+    return len(df)
+
+
+def partition_to_buckets(
+    dfs, bucket_dir, schema, num_buckets=64, max_rows_in_memory=50_000
+):
+    """Stream DataFrames with an app_id column into on-disk buckets.
+
+    See partition_files_to_buckets.
+    """
+    buffered_dfs, num_rows_buffered, part_num, num_rows_total = [], 0, 0, 0
+    for df in dfs:
+        buffered_dfs.append(df)
+        num_rows_buffered += len(df)
+        if num_rows_buffered >= max_rows_in_memory:
+            num_rows_total += flush_to_buckets(
+                buffered_dfs, bucket_dir, num_buckets, part_num, schema
+            )
+            buffered_dfs, num_rows_buffered = [], 0
+            part_num += 1
+    if buffered_dfs:
+        num_rows_total += flush_to_buckets(
+            buffered_dfs, bucket_dir, num_buckets, part_num, schema
+        )
+    print(
+        f"Partitioned {num_rows_total:,} rows into "
+        f"{os.path.basename(bucket_dir)} buckets"
+    )
+    return num_rows_total
+
+
+def partition_files_to_buckets(
+    filepaths,
+    read_func,
+    bucket_dir,
+    schema,
+    num_buckets=64,
+    max_rows_in_memory=50_000,
+):
+    """
+    Stream files into num_buckets on-disk buckets, partitioned by app_id.
+
+    Parameters
+    ----------
+    filepaths : List
+        Paths to files to be partitioned
+    read_func : Callable
+        Function that reads a single file into a DataFrame with an app_id
+        column (eg. read_search_results_file)
+    bucket_dir : str
+        Directory in which buckets will be created
+    schema : pa.Schema
+        Schema of bucket files, to which every file read is converted (eg.
+        get_search_results_bucket_schema()), so that all parts of all
+        buckets share the same columns and types
+    num_buckets : int
+        Number of hash buckets
+    max_rows_in_memory : int
+        Maximum number of rows to buffer before appending to buckets
+    """
+    return partition_to_buckets(
+        (read_func(filepath) for filepath in filepaths),
+        bucket_dir,
+        schema,
+        num_buckets,
+        max_rows_in_memory,
+    )
+
+
+def read_bucket(bucket_dir, bucket_num, schema):
+    """Read all parts of a single bucket into a DataFrame."""
+    part_filepaths = sorted(
+        glob(os.path.join(get_bucket_dir(bucket_dir, bucket_num), "*.parquet"))
+    )
+    if not part_filepaths:
+        return schema.empty_table().to_pandas()
+    return pa.concat_tables(
+        [pq.read_table(f, schema=schema) for f in part_filepaths]
+    ).to_pandas()
+
+
+def is_bucket_dir_empty(bucket_dir):
+    """Check if no part file was written to any bucket."""
+    return not glob(os.path.join(bucket_dir, "*", "*.parquet"))
+
+
+def get_output_schema(
+    left_schema, right_schema, how, merge_kwargs, left_func, right_func
+):
+    """Get schema of merged output by merging empty versions of both sides."""
+    df_left = left_schema.empty_table().to_pandas()
+    df_right = right_schema.empty_table().to_pandas()
+    if left_func:
+        df_left = left_func(df_left)
+    if right_func:
+        df_right = right_func(df_right)
+    dfm = df_left.merge(df_right, how=how, **merge_kwargs)
+    table = pa.Table.from_pandas(dfm, preserve_index=False)
+    # Integers are widened to floats since a left merge can introduce
+    # missing values, and all-missing columns are assumed to hold strings
+    fields = []
+    for field in table.schema:
+        if pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_integer(field.type):
+            field = field.with_type(pa.float64())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def conform_to_schema(df, schema):
+    """
+    Convert DataFrame to Arrow table matching output file schema.
+
+    Notes
+    -----
+    1. Columns missing from df are filled with nulls. Values that are not
+       numbers, in numeric columns, are replaced by nulls and all values of
+       string columns are converted to strings (eg. lists of platforms), so
+       that tables of files with differently inferred types match.
+    """
+    df = df.reindex(columns=schema.names)
+    arrays = []
+    for field in schema:
+        values = df[field.name]
+        if pa.types.is_string(field.type):
+            values = values.astype("string")
+        elif pa.types.is_integer(field.type):
+            values = (
+                pd.to_numeric(values, errors="coerce")
+                .astype("Float64")
+                .round()
+                .astype("Int64")
+            )
+        elif pa.types.is_floating(field.type):
+            values = pd.to_numeric(values, errors="coerce").astype("float64")
+        arrays.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def merge_buckets(
+    left_bucket_dir,
+    right_bucket_dir,
+    output_filepath,
+    left_schema,
+    right_schema,
+    num_buckets=64,
+    how="left",
+    left_func=None,
+    right_func=None,
+    merge_kwargs=None,
+):
+    """
+    Merge matching pairs of buckets and append result to a parquet file.
+
+    Parameters
+    ----------
+    left_bucket_dir : str
+        Directory with buckets of the left (eg. search results) dataset
+    right_bucket_dir : str
+        Directory with buckets of the right (eg. listings) dataset
+    output_filepath : str
+        Path to merged parquet file, written one bucket at a time
+    left_schema, right_schema : pa.Schema
+        Schemas with which left and right buckets were partitioned
+    num_buckets : int
+        Number of hash buckets (must match number used to partition)
+    how : str
+        Type of merge to be performed
+    left_func : Callable
+        Function applied to each left bucket before merging (eg. to drop
+        duplicates, which are always found within the same bucket)
+    right_func : Callable
+        Function applied to each right bucket before merging
+    merge_kwargs : Dict
+        Keyword arguments passed to pd.merge() (defaults to merging on
+        app_id)
+    """
+    merge_kwargs = merge_kwargs or dict(on=MERGE_KEY_COL)
+    right_keys = merge_kwargs.get("right_on", merge_kwargs.get("on"))
+    right_keys = [right_keys] if isinstance(right_keys, str) else right_keys
+    if is_bucket_dir_empty(left_bucket_dir) and is_bucket_dir_empty(
+        right_bucket_dir
+    ):
+        print("Found no data to merge. Did nothing.")
+        return 0
+    schema = get_output_schema(
+        left_schema, right_schema, how, merge_kwargs, left_func, right_func
+    )
+    num_rows_merged = 0
+    with pq.ParquetWriter(
+        output_filepath, schema, compression="snappy"
+    ) as writer:
+        for bucket_num in range(num_buckets):
+            df_left = read_bucket(left_bucket_dir, bucket_num, left_schema)
+            df_right = read_bucket(right_bucket_dir, bucket_num, right_schema)
+            # Right (or outer) merges keep listings without search results
+            if df_left.empty and (df_right.empty or how in ["left", "inner"]):
+                continue
+            if left_func:
+                df_left = left_func(df_left)
+            if right_func:
+                df_right = right_func(df_right)
+            # Missing keys would otherwise be matched with each other
+            df_right = df_right.dropna(subset=right_keys)
+            dfm = df_left.merge(df_right, how=how, **merge_kwargs)
+            writer.write_table(conform_to_schema(dfm, schema))
+            num_rows_merged += len(dfm)
+    print(f"Exported {num_rows_merged:,} merged rows to {output_filepath}")
+    return num_rows_merged
+
+
+def streaming_merge_search_results_listings(
+    search_results_filepaths,
+    listings_filepaths,
+    output_filepath,
+    work_dir,
+    num_buckets=64,
+    max_rows_in_memory=50_000,
+    how="left",
+    search_results_func=None,
+    listings_func=None,
+    merge_kwargs=None,
+    delete_buckets=True,
+    listings_dedup_subset=None,
+):
+    """
+    Merge search results with listings in a fixed memory budget.
+
+    Usage
+    -----
+    > from glob import glob
+    > streaming_merge_search_results_listings(
+          glob("data/raw/requests/search_results_page_*.parquet.gzip"),
+          glob("data/raw/requests/p*_l*_*.csv"),
+          "data/processed/merged.parquet",
+          "data/interim/merge_buckets",
+      )
+    > streaming_merge_search_results_listings(
+          glob("data/raw/requests/search_results_page_*.parquet.gzip"),
+          "data/processed/listings_requests",
+          "data/processed/merged.parquet",
+          "data/interim/merge_buckets",
+          listings_dedup_subset=["source_file"],
+      )
+
+    Notes
+    -----
+    1. Peak memory is set by max_rows_in_memory (while partitioning) and by
+       the size of the largest pair of buckets (while merging), which can be
+       reduced by increasing num_buckets.
+    2. Both datasets are partitioned by app_id, so any other merge keys
+       passed in merge_kwargs (eg. title) must be unique to a single app_id.
+    3. Search results and listings are converted to fixed schemas (see
+       get_search_results_bucket_schema and get_listings_bucket_schema), so
+       the output schema does not depend on the files read first.
+    4. Listings are read from CSV files, or from the parts of a processed
+       store (see src.processing_manifest.update_processed_store) if
+       listings_filepaths is the directory of the store. Store parts are
+       read in batches of max_rows_in_memory rows, without the rows that
+       are duplicated on listings_dedup_subset (eg. rows written again
+       after an interrupted update of the store), see
+       src.processing_manifest.iter_processed_store.
+    """
+    left_bucket_dir = os.path.join(work_dir, "search_results")
+    right_bucket_dir = os.path.join(work_dir, "listings")
+    left_schema = get_search_results_bucket_schema()
+    right_schema = get_listings_bucket_schema()
+    for bucket_dir in [left_bucket_dir, right_bucket_dir]:
+        # Remove buckets left behind by a previous (interrupted) run
+        if os.path.exists(bucket_dir):
+            shutil.rmtree(bucket_dir)
+        os.makedirs(bucket_dir)
+    try:
+        partition_files_to_buckets(
+            search_results_filepaths,
+            read_search_results_file,
+            left_bucket_dir,
+            left_schema,
+            num_buckets,
+            max_rows_in_memory,
+        )
+        if isinstance(listings_filepaths, str):
+            listings = (
+                read_listings_store_batch(df)
+                for df in pm.iter_processed_store(
+                    listings_filepaths,
+                    dedup_subset=listings_dedup_subset,
+                    batch_size=max_rows_in_memory,
+                )
+            )
+        else:
+            listings = (read_listing_file(f) for f in listings_filepaths)
+        partition_to_buckets(
+            listings,
+            right_bucket_dir,
+            right_schema,
+            num_buckets,
+            max_rows_in_memory,
+        )
+        num_rows_merged = merge_buckets(
+            left_bucket_dir,
+            right_bucket_dir,
+            output_filepath,
+            left_schema,
+            right_schema,
+            num_buckets,
+            how,
+            search_results_func,
+            listings_func,
+            merge_kwargs,
+        )
+    finally:
+        if delete_buckets:
+            shutil.rmtree(left_bucket_dir, ignore_errors=True)
+            shutil.rmtree(right_bucket_dir, ignore_errors=True)
+    return num_rows_merged
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the discovery of listings from the app list and sitemaps."""
+
+
+# pylint: disable=invalid-name
+
+
+import gzip
+import io
+import os
+
+import pandas as pd
+import requests
+
+import src.app_discovery as ad
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+STORE_URL = "https://store.steampowered.com"
+
+
+def read_fixture(filename):
+    """Read contents of fixture file."""
+    with open(os.path.join(FIXTURES_DIR, filename), "rb") as f:
+        return f.read()
+
+
+def iter_chunks(contents, chunk_size=7):
+    """Split contents into small chunks, as if streamed."""
+    for start in range(0, len(contents), chunk_size):
+        end = start + chunk_size
+        yield contents[start:end]
+
+
+class FakeResponse:
+    """Response streaming contents in small chunks."""
+
+    def __init__(self, contents, status_code=200):
+        self.contents = contents
+        self.status_code = status_code
+        self.raw = io.BytesIO(contents)
+
+    @property
+    def text(self):
+        return self.contents.decode("utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def iter_content(self, chunk_size=1):
+        return iter_chunks(self.contents)
+
+
+class FakeSession:
+    """Session serving fixture files (gzipped if the URL ends with .gz)."""
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+        self.urls = []
+
+    def get(self, url, stream=False, timeout=None):
+        self.urls.append(url)
+        filename = self.fixtures.get(url.removesuffix(".gz"))
+        if filename is None:
+            return FakeResponse(b"Not found", status_code=404)
+        contents = read_fixture(filename)
+        if url.endswith(".gz"):
+            contents = gzip.compress(contents)
+        return FakeResponse(contents)
+
+
+def get_session():
+    """Fake session serving the app list, robots.txt and sitemaps."""
+    return FakeSession(
+        {
+            ad.APP_LIST_URL: "app_list.json",
+            ad.ROBOTS_URL: "robots.txt",
+            f"{STORE_URL}/sitemap_index.xml": "sitemap_index.xml",
+            f"{STORE_URL}/sitemaps/sitemap_1.xml": "sitemap_1.xml",
+            f"{STORE_URL}/sitemaps/sitemap_2.xml": "sitemap_2.xml",
+        }
+    )
+
+
+def test_app_list_is_parsed_from_small_chunks():
+    """Apps are decoded even when split across chunks of the stream."""
+    apps = list(ad.iter_app_list(iter_chunks(read_fixture("app_list.json"))))
+
+    assert [app["app_id"] for app in apps] == [10, 20, 30, 40, 50]
+    assert apps[2]["name"] == 'Day of Defeat [Legacy], "Classic"'
+
+
+def test_sitemap_entries_are_parsed():
+    """Entries of sitemap index and of sitemap are read with lastmod."""
+    with open(os.path.join(FIXTURES_DIR, "sitemap_index.xml"), "rb") as f:
+        entries = list(ad.iter_sitemap_entries(f))
+
+    assert entries == [
+        {
+            "kind": "sitemap",
+            "loc": f"{STORE_URL}/sitemaps/sitemap_1.xml",
+            "lastmod": "2022-11-02",
+        },
+        {
+            "kind": "sitemap",
+            "loc": f"{STORE_URL}/sitemaps/sitemap_2.xml.gz",
+            "lastmod": None,
+        },
+    ]
+
+
+def test_sitemap_apps_follow_index_and_gzipped_sitemaps():
+    """Apps are found in all sitemaps listed by robots.txt."""
+    session = get_session()
+    sitemap_urls = ad.get_sitemap_urls(session)
+
+    apps = list(ad.get_sitemap_apps(session, sitemap_urls))
+
+    assert sitemap_urls == [f"{STORE_URL}/sitemap_index.xml"]
+    assert [app["app_id"] for app in apps] == [20, 30, 60, 70]
+    assert apps[0]["url"] == f"{STORE_URL}/app/20/Team_Fortress_Classic/"
+
+
+def test_max_sitemaps_limits_requests():
+    """No more than max_sitemaps sitemaps are requested."""
+    session = get_session()
+
+    apps = list(
+        ad.get_sitemap_apps(
+            session, [f"{STORE_URL}/sitemap_index.xml"], max_sitemaps=2
+        )
+    )
+
+    assert [app["app_id"] for app in apps] == [20, 30]
+    assert len(session.urls) == 2
+
+
+def test_failed_sitemap_is_skipped():
+    """Sitemaps that cannot be requested do not stop discovery."""
+    session = get_session()
+
+    apps = list(
+        ad.get_sitemap_apps(
+            session,
+            [
+                f"{STORE_URL}/sitemaps/missing.xml",
+                f"{STORE_URL}/sitemaps/sitemap_2.xml",
+            ],
+        )
+    )
+
+    assert [app["app_id"] for app in apps] == [60, 70]
+
+
+def test_discover_apps_drops_known_apps():
+    """Frontier holds new apps of both sources, most recent lastmod first."""
+    df = ad.discover_apps(get_session(), known_app_ids=[10, 60])
+
+    assert list(df) == ad.FRONTIER_COLUMNS
+    assert df["app_id"].tolist() == [30, 20, 70, 40, 50]
+    assert df["source"].tolist() == [
+        "sitemaps",
+        "sitemaps",
+        "sitemaps",
+        "app_list",
+        "app_list",
+    ]
+    # Name comes from the app list, URL from the sitemap
+    assert df.loc[1, "name"] == "Team Fortress Classic"
+    assert df.loc[1, "url"] == f"{STORE_URL}/app/20/Team_Fortress_Classic/"
+    assert df.loc[3, "url"] == f"{STORE_URL}/app/40/"
+    assert pd.isna(df.loc[3, "lastmod"])
+
+
+def test_discover_apps_from_app_list_only():
+    """Only the app list is requested if sitemaps are not a source."""
+    session = get_session()
+
+    df = ad.discover_apps(session, sources=["app_list"])
+
+    assert df["app_id"].tolist() == [10, 20, 30, 40, 50]
+    assert session.urls == [ad.APP_LIST_URL]
+
+
+def test_known_app_ids_are_read_from_raw_files(tmp_path):
+    """App ids are read from search results and listings with a URL."""
+    pd.DataFrame(
+        {"url": [f"{STORE_URL}/app/10/A/", None, f"{STORE_URL}/sub/5/"]}
+    ).to_parquet(
+        tmp_path / "search_results_page_1_20220101_000000.parquet.gzip"
+    )
+    pd.DataFrame({"url": [f"{STORE_URL}/app/20/B/"]}).to_csv(
+        tmp_path / "p1_l0_B.csv", index=False
+    )
+    # Listings scraped with selenium have no url column
+    pd.DataFrame({"Title": ["C"]}).to_csv(
+        tmp_path / "p1_l1_C.csv", index=False
+    )
+
+    assert ad.get_known_app_ids(str(tmp_path)) == {10, 20}
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of streaming zipped archives from (fake) Azure blob storage."""
+
+
+# pylint: disable=invalid-name
+
+
+import io
+from types import SimpleNamespace
+from zipfile import ZipFile
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+pytest.importorskip("azure.storage.blob")
+
+import src.blob_archive_stream as bas  # noqa: E402
+import src.bulk_listings_reader as blr  # noqa: E402
+import src.failure_records as fr  # noqa: E402
+import src.streaming_merge as sm  # noqa: E402
+
+
+class FakeBlobClient:
+    """Blob client serving an in-memory blob, counting ranged downloads."""
+
+    def __init__(self, contents):
+        self.contents = contents
+        self.num_downloads = 0
+
+    def get_blob_properties(self):
+        return SimpleNamespace(size=len(self.contents))
+
+    def download_blob(self, offset=0, length=None):
+        self.num_downloads += 1
+        end = len(self.contents) if length is None else offset + length
+        return SimpleNamespace(readall=lambda: self.contents[offset:end])
+
+
+def get_zip_bytes(members):
+    """Create zipped archive in memory, from names and contents of files."""
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as zip_file:
+        for filename, contents in members.items():
+            zip_file.writestr(filename, contents)
+    return buffer.getvalue()
+
+
+def get_parquet_bytes(df):
+    """Write DataFrame to parquet file in memory."""
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def get_search_results(page, platform_names, discount_pct):
+    """Create single page of search results, as scraped with requests."""
+    return pd.DataFrame(
+        {
+            "page": [page],
+            "request_status_code": [200],
+            "listing_counter": [0],
+            "title": [f"Game {page}"],
+            "url": [f"https://store.steampowered.com/app/{page}/"],
+            "platform_names": [platform_names],
+            "release_date": ["1 Jan, 2022"],
+            "discount_pct": [discount_pct],
+            "original_price": ["$9.99"],
+            "discount_price": ["$8.99"],
+        }
+    )
+
+
+def get_listing_csv(listing_num, review_type_all):
+    """Create listing CSV file contents."""
+    listing = dict(
+        fr.dict_failed_extraction_from_listing_page(),
+        Title=f"Game {listing_num}",
+        review_type_all=review_type_all,
+        page_num=1,
+        listing_num=listing_num,
+        url=f"https://store.steampowered.com/app/{listing_num}/",
+    )
+    return pd.DataFrame([listing]).to_csv(index=False)
+
+
+def test_blob_range_reader_reads_blob_in_cached_blocks():
+    """Reads and seeks return bytes of blob, downloading each block once."""
+    contents = bytes(range(256)) * 40
+    blob_client = FakeBlobClient(contents)
+
+    with bas.BlobRangeReader(blob_client, block_size=1000, max_blocks=16) as f:
+        assert f.read(10) == contents[:10]
+        f.seek(995)
+        assert f.read(10) == contents[995:1005]
+        f.seek(-5, io.SEEK_END)
+        assert f.read() == contents[-5:]
+        f.seek(0)
+        assert f.read() == contents
+        assert f.num_bytes_downloaded == len(contents)
+
+    assert blob_client.num_downloads == 11
+
+
+def test_blob_range_reader_evicts_least_recently_used_block():
+    """Blocks are downloaded again once evicted from the cache."""
+    blob_client = FakeBlobClient(bytes(300))
+
+    with bas.BlobRangeReader(blob_client, block_size=100, max_blocks=2) as f:
+        for offset in [0, 100, 0, 200, 100]:
+            f.seek(offset)
+            f.read(1)
+
+    # Block 1 is evicted when block 2 is read, as block 0 was used later
+    assert blob_client.num_downloads == 4
+
+
+def test_search_results_use_fixed_schema_and_count_errors(tmp_path):
+    """Output schema does not depend on first file, and bad files count."""
+    batched_zip = get_zip_bytes(
+        {
+            # All-missing discount and list of platforms in first file
+            "search_results_page_1_20220101_000000.parquet.gzip": (
+                get_parquet_bytes(
+                    get_search_results(1, [None, None, None], None)
+                )
+            ),
+            "search_results_page_2_20220101_000000.parquet.gzip": (
+                get_parquet_bytes(get_search_results(2, "win,mac", "-10%"))
+            ),
+            "search_results_page_3_20220101_000000.parquet.gzip": b"broken",
+        }
+    )
+    blob_client = FakeBlobClient(
+        get_zip_bytes({"batched_search_results_1.zip": batched_zip})
+    )
+    output_filepath = str(tmp_path / "search_results.parquet.gzip")
+
+    filepath, num_errors = bas.stream_blob_archive_to_parquet(
+        blob_client, output_filepath, "search_results", block_size=256
+    )
+
+    assert filepath == output_filepath
+    assert num_errors == 1
+    table = pq.read_table(output_filepath)
+    assert table.schema == sm.get_search_results_schema().append(
+        pa.field("filename", pa.string())
+    )
+    df = table.to_pandas()
+    assert df["discount_pct"].tolist()[1] == "-10%"
+    assert df["filename"].tolist() == [
+        "search_results_page_1_20220101_000000.parquet.gzip",
+        "search_results_page_2_20220101_000000.parquet.gzip",
+    ]
+
+
+def test_listings_count_errors(tmp_path):
+    """Listings that do not match the listings schema are counted."""
+    blob_client = FakeBlobClient(
+        get_zip_bytes(
+            {
+                "p1_l0_Game0.csv": get_listing_csv(0, 10),
+                "p1_l1_Game1.csv": get_listing_csv(1, "many"),
+                "notes.txt": "not a listing",
+            }
+        )
+    )
+    output_filepath = str(tmp_path / "listings.parquet.gzip")
+
+    _, num_errors = bas.stream_blob_archive_to_parquet(
+        blob_client, output_filepath, "listings"
+    )
+
+    assert num_errors == 1
+    table = pq.read_table(output_filepath)
+    assert table.schema == blr.get_listings_schema().append(
+        pa.field("filename", pa.string())
+    )
+    assert table.column("filename").to_pylist() == ["p1_l0_Game0.csv"]
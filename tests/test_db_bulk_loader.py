@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of bulk loads with upserts, round-tripped through SQLite."""
+
+
+# pylint: disable=invalid-name,redefined-outer-name
+
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import src.db_bulk_loader as dbl
+
+CREATE_TABLE_QUERY = """
+CREATE TABLE listings (
+    app_id TEXT NOT NULL UNIQUE,
+    title TEXT,
+    original_price TEXT,
+    review_type_all REAL
+)
+"""
+
+INDEXES = {"idx_listings_title": "title"}
+
+
+@pytest.fixture
+def cnx():
+    """In-memory SQLite database with empty listings table and index."""
+    connection = sqlite3.connect(":memory:")
+    connection.execute(CREATE_TABLE_QUERY)
+    connection.execute(
+        dbl.get_create_index_query(
+            "listings", "idx_listings_title", "title", "sqlite"
+        )
+    )
+    yield connection
+    connection.close()
+
+
+def get_listings(app_ids, price="$9.99"):
+    """Create listings with app_ids."""
+    return pd.DataFrame(
+        {
+            "app_id": app_ids,
+            "title": [f"Game {app_id}" for app_id in app_ids],
+            "original_price": [price] * len(app_ids),
+            "review_type_all": [10.0] * len(app_ids),
+        }
+    )
+
+
+def read_table(cnx):
+    """Read listings table, sorted by app_id."""
+    return pd.read_sql("SELECT * FROM listings ORDER BY app_id", cnx)
+
+
+def get_object_names(cnx, object_type):
+    """Get names of tables or indexes in database."""
+    return [
+        name
+        for (name,) in cnx.execute(
+            "SELECT name FROM sqlite_master WHERE type = ?", [object_type]
+        )
+    ]
+
+
+def test_load_upserts_rows_on_key(cnx):
+    """Rows with existing keys are updated and new rows are inserted."""
+    dbl.bulk_load_table(cnx, "sqlite", "listings", get_listings(["1", "2"]))
+
+    num_rows = dbl.bulk_load_table(
+        cnx,
+        "sqlite",
+        "listings",
+        get_listings(["2", "3"], price="$4.99"),
+        batch_size=1,
+        rebuild_indexes=INDEXES,
+    )
+
+    assert num_rows == 2
+    df = read_table(cnx)
+    assert df["app_id"].tolist() == ["1", "2", "3"]
+    assert df["original_price"].tolist() == ["$9.99", "$4.99", "$4.99"]
+    # Staging table is dropped and secondary index is re-created
+    assert get_object_names(cnx, "table") == ["listings"]
+    assert "idx_listings_title" in get_object_names(cnx, "index")
+
+
+def test_load_drops_missing_keys_and_keeps_last_duplicate(cnx):
+    """Rows without a key are not loaded, and the last row of a key wins."""
+    df = pd.concat(
+        [
+            get_listings(["1", "2"]),
+            get_listings(["2", None], price="$4.99"),
+        ],
+        ignore_index=True,
+    ).assign(review_type_all=[1.0, 2.0, None, 3.0])
+
+    # Rows of app 2 are in different batches
+    num_rows = dbl.bulk_load_table(cnx, "sqlite", "listings", df, batch_size=2)
+
+    assert num_rows == 2
+    df_table = read_table(cnx)
+    assert df_table["app_id"].tolist() == ["1", "2"]
+    assert df_table["original_price"].tolist() == ["$9.99", "$4.99"]
+    # Missing values are loaded as NULLs
+    assert df_table["review_type_all"].isna().tolist() == [False, True]
+
+
+def test_load_from_parquet_files_keeps_latest_part(cnx, tmp_path):
+    """Row of key in the latest processed store part is loaded."""
+    filepaths = []
+    for k, price in enumerate(["$9.99", "$4.99"]):
+        filepath = str(tmp_path / f"part_{k}.parquet")
+        get_listings(["1"], price=price).to_parquet(filepath, index=False)
+        filepaths.append(filepath)
+
+    dbl.bulk_load_table(cnx, "sqlite", "listings", filepaths)
+
+    assert read_table(cnx)["original_price"].tolist() == ["$4.99"]
+
+
+def test_load_from_parquet_files(cnx, tmp_path):
+    """Batches are read from parquet files (eg. processed store parts)."""
+    filepaths = []
+    for k, app_ids in enumerate([["1", "2"], ["3"]]):
+        filepath = str(tmp_path / f"part_{k}.parquet")
+        get_listings(app_ids).to_parquet(filepath, index=False)
+        filepaths.append(filepath)
+
+    num_rows = dbl.bulk_load_table(
+        cnx,
+        "sqlite",
+        "listings",
+        filepaths,
+        batch_size=1,
+        columns=["app_id", "title"],
+    )
+
+    assert num_rows == 3
+    df = read_table(cnx)
+    assert df["app_id"].tolist() == ["1", "2", "3"]
+    assert df["original_price"].isna().all()
+
+
+def test_load_without_staging_appends_rows(cnx):
+    """Rows are inserted directly into table, without a staging table."""
+    dbl.bulk_load_table(
+        cnx, "sqlite", "listings", get_listings(["1"]), use_staging=False
+    )
+
+    with pytest.raises(sqlite3.IntegrityError):
+        dbl.bulk_load_table(
+            cnx, "sqlite", "listings", get_listings(["1"]), use_staging=False
+        )
+
+
+class RecordingConnection:
+    """Connection (and cursor) recording the queries executed."""
+
+    def __init__(self):
+        self.queries = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, query):
+        self.queries.append(query)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_mysql_unique_checks_are_enabled_before_upsert():
+    """Only loads into the staging table skip unique checks."""
+    cnx = RecordingConnection()
+
+    dbl.bulk_load_table(cnx, "mysql", "listings", get_listings(["1", "2"]))
+
+    queries = [q.split(" ", 2)[:2] for q in cnx.queries]
+    assert queries == [
+        ["SET", "unique_checks"],
+        ["DROP", "TABLE"],
+        ["CREATE", "TABLE"],
+        ["LOAD", "DATA"],
+        ["SET", "unique_checks"],
+        ["INSERT", "INTO"],
+        ["DROP", "TABLE"],
+    ]
+    assert cnx.queries[4] == "SET unique_checks = 1, foreign_key_checks = 1"
+    assert "ON DUPLICATE KEY UPDATE" in cnx.queries[5]
+
+
+def test_mysql_appends_keep_unique_checks():
+    """Unique checks are not disabled when appending to the target table."""
+    cnx = RecordingConnection()
+
+    dbl.bulk_load_table(
+        cnx, "mysql", "listings", get_listings(["1"]), use_staging=False
+    )
+
+    assert not any("unique_checks" in q for q in cnx.queries)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the dead-letter queue of failed pages."""
+
+
+# pylint: disable=invalid-name
+
+
+import src.dead_letter_queue as dlq
+
+URL = "https://store.steampowered.com/app/10/Game/"
+
+
+def get_queue(tmp_path, **kwargs):
+    """Create dead-letter queue in a JSON-lines file of tmp_path."""
+    return dlq.DeadLetterQueue(str(tmp_path / "dead_letters.jsonl"), **kwargs)
+
+
+def get_delay(entry):
+    """Get delay (sec.) before entry can be retried."""
+    return entry["next_retry_at"] - entry["last_failed_at"]
+
+
+def test_backoff_doubles_with_each_attempt(tmp_path):
+    """Delay before retry doubles with attempts, with jitter and a cap."""
+    queue = get_queue(tmp_path, base_delay=60, max_delay=200)
+
+    delays = [
+        get_delay(queue.record_failure("listing", "fetch", "HTTP 500", URL))
+        for _ in range(3)
+    ]
+
+    assert 30 <= delays[0] <= 60
+    assert 60 <= delays[1] <= 120
+    assert 100 <= delays[2] <= 200
+    entry = queue.entries[dlq.get_entry_id("listing", URL)]
+    assert entry["attempts"] == 3
+    assert entry["first_failed_at"] <= entry["last_failed_at"]
+
+
+def test_retry_after_delays_retry(tmp_path):
+    """Retry-After of a 429 response is the minimum delay before retry."""
+    queue = get_queue(tmp_path, base_delay=1)
+
+    entry = queue.record_failure(
+        "search_results", "fetch", "HTTP 429", page=3, retry_after=600
+    )
+
+    assert entry["id"] == "search_results:3"
+    assert get_delay(entry) == 600
+
+
+def test_due_entries_are_retried_until_resolved(tmp_path):
+    """Entries are due once their backoff elapsed, until resolved."""
+    queue = get_queue(tmp_path, base_delay=60)
+    entry = queue.record_failure("listing", "parse", ValueError("bad"), URL)
+    other_url = "https://store.steampowered.com/app/20/Other/"
+    queue.record_failure("listing", "fetch", "HTTP 500", other_url)
+
+    assert entry["error_type"] == "ValueError"
+    assert queue.get_due(now=entry["last_failed_at"]) == []
+    due = queue.get_due(now=entry["last_failed_at"] + 120)
+    assert sorted(e["url"] for e in due) == [URL, other_url]
+
+    resolved = queue.resolve(entry["id"])
+
+    assert resolved["status"] == "resolved"
+    assert queue.resolve(entry["id"]) == resolved
+    assert queue.resolve("listing:unknown") is None
+    assert [e["url"] for e in queue.get_pending()] == [other_url]
+    assert queue.get_status_counts() == {"resolved": 1, "pending": 1}
+
+
+def test_entry_is_exhausted_at_max_attempts(tmp_path):
+    """Entries are no longer retried after max_attempts failures."""
+    queue = get_queue(tmp_path, max_attempts=3, base_delay=0)
+
+    statuses = [
+        queue.record_failure("listing", "fetch", "HTTP 500", URL)["status"]
+        for _ in range(3)
+    ]
+
+    assert statuses == ["pending", "pending", "exhausted"]
+    assert queue.get_due() == []
+
+
+def test_permanent_failure_is_exhausted_at_once(tmp_path):
+    """Collections of games are never retried."""
+    queue = get_queue(tmp_path)
+
+    entry = queue.record_failure("listing", "collection", "Collection", URL)
+
+    assert entry["status"] == "exhausted"
+    assert entry["attempts"] == 1
+
+
+def test_queue_is_reloaded_and_compacted(tmp_path):
+    """Latest state of each entry is loaded, and compaction keeps only it."""
+    queue = get_queue(tmp_path, base_delay=0)
+    for _ in range(2):
+        queue.record_failure("listing", "fetch", "HTTP 500", URL)
+    queue.resolve(dlq.get_entry_id("listing", URL))
+
+    reloaded_queue = get_queue(tmp_path)
+    reloaded_queue.compact()
+
+    assert reloaded_queue.entries == queue.entries
+    with open(queue.filepath) as f:
+        assert len(f.readlines()) == 1
+    assert get_queue(tmp_path).get_status_counts() == {"resolved": 1}
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the completeness of listings scraped field by field."""
+
+
+# pylint: disable=invalid-name
+
+
+import os
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+import src.bs4_helpers as bsh
+import src.requests_scrapers as rsc
+from src.dead_letter_queue import DeadLetterQueue, get_entry_id
+
+URL = "https://store.steampowered.com/app/10/New_Game/"
+
+# Valid listing page of a new game, without reviews, tags, achievements,
+# DRM notice, rating, franchise or early access
+NEW_LISTING_PAGE = """<!DOCTYPE html>
+<html><head><title>New Game on Steam</title></head><body>
+<div class="game_area_purchase_platform">
+ <span class="platform_img win"></span>
+</div>
+<div class="details_block"><div id="genresAndManufacturer">
+<b>Title:</b> New Game<br>
+<b>Genre:</b> <span><a>Indie</a></span><br>
+<b>Developer:</b> <a>Studio</a><br>
+<b>Publisher:</b> <a>Studio</a><br>
+<b>Release Date:</b> 1 Jan, 2022<br>
+</div></div>
+<div id="languageTable"><table>
+ <tr><th></th><th>Interface</th><th>Full Audio</th><th>Subtitles</th></tr>
+ <tr><td>English</td><td>&#10004;</td><td></td><td>&#10004;</td></tr>
+</table></div>
+</body></html>
+"""
+
+# Listing page whose markup changed, so only its title is found
+CHANGED_LISTING_PAGE = """<!DOCTYPE html>
+<html><head><title>New Game on Steam</title></head><body>
+<div class="details_block"><div id="genresAndManufacturer">
+<b>Title:</b> New Game<br>
+</div></div>
+</body></html>
+"""
+
+
+def get_soup(html):
+    """Parse listing page."""
+    return BeautifulSoup(html, "lxml")
+
+
+def test_listing_without_optional_attributes_is_complete():
+    """Missing optional attributes are not failed fields."""
+    listing = bsh.scrape_game_listing(get_soup(NEW_LISTING_PAGE))
+
+    assert listing["completeness"] == 1
+    assert pd.isna(listing["failed_fields"])
+    missing_fields = listing["missing_fields"].split(", ")
+    assert "review_type_all" in missing_fields
+    assert "Franchise" in missing_fields
+    assert "Title" not in missing_fields
+    assert listing["languages"] == "English"
+
+
+def test_empty_page_has_zero_completeness():
+    """Required attributes and extractor errors are failed fields."""
+    listing = bsh.scrape_game_listing(get_soup("<html></html>"))
+
+    assert listing["completeness"] == 0
+    failed_fields = listing["failed_fields"].split(", ")
+    assert set(bsh.REQUIRED_LISTING_FIELDS) <= set(failed_fields)
+    # Extractor of languages raised an error, for both of its attributes
+    assert "num_languages" in failed_fields
+
+
+def test_listing_without_optional_attributes_is_exported(tmp_path):
+    """Complete listing is exported, and not sent to dead-letter queue."""
+    dead_letters = DeadLetterQueue(str(tmp_path / "dead_letters.jsonl"))
+
+    df, filepath = rsc.scrape_listing_requests(
+        get_soup(NEW_LISTING_PAGE), 0, 1, str(tmp_path), URL, dead_letters
+    )
+
+    assert filepath == os.path.join(str(tmp_path), "p1_l0_New_Game.csv")
+    assert os.path.exists(filepath)
+    assert df["completeness"].tolist() == [1]
+    assert dead_letters.get_pending() == []
+
+
+def test_incomplete_listing_is_sent_to_dead_letter_queue(tmp_path):
+    """Listing with few required attributes is a parse failure."""
+    dead_letters = DeadLetterQueue(str(tmp_path / "dead_letters.jsonl"))
+
+    assert rsc.scrape_listing_requests(
+        get_soup(CHANGED_LISTING_PAGE), 0, 1, str(tmp_path), URL, dead_letters
+    ) == [None, None]
+
+    entry = dead_letters.entries[get_entry_id("listing", URL)]
+    assert entry["stage"] == "parse"
+    assert entry["status"] == "pending"
+    assert not os.path.exists(
+        os.path.join(str(tmp_path), "p1_l0_New_Game.csv")
+    )
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the navigation helpers, in simulated time with a fake driver."""
+
+
+# pylint: disable=invalid-name,redefined-outer-name
+
+
+import time
+
+import pytest
+
+pytest.importorskip("selenium")
+
+import src.navigation_benchmark as nb  # noqa: E402
+import src.navigation_clock as nc  # noqa: E402
+import src.selenium_helpers as sh  # noqa: E402
+import src.single_page_navigation_helpers as snh  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_randomness_or_sleep(monkeypatch):
+    """Use the longest pauses and most hovers, and fail on real sleeps."""
+    for module in [sh, snh]:
+        monkeypatch.setattr(module, "uniform", lambda a, b: b)
+    monkeypatch.setattr(snh, "randint", lambda a, b: b)
+
+    def sleep(seconds):
+        raise AssertionError(f"Slept for {seconds} sec.")
+
+    monkeypatch.setattr(time, "sleep", sleep)
+
+
+def test_random_navigation_on_page_in_simulated_time():
+    """Hovers over genres and Install button are paused in simulated time."""
+    driver = nb.FakeDriver(num_children=30)
+
+    with nc.simulated_clock(start=100) as clock:
+        snh.perform_random_navigation_on_page(driver, 2, 5)
+
+    # 5 hovers over genres (1.8 sec. each), and Install Steam button
+    assert clock.num_sleeps == 6
+    assert clock.total_sleep == pytest.approx(5 * 1.8 + 1.2)
+    assert clock.time() == pytest.approx(100 + clock.total_sleep)
+    assert driver.calls == {
+        # fly-out, genres menu and Install Steam button
+        "find_element": 3,
+        # genres menu, and links of 6 categories
+        "find_elements": 7,
+        # mouse over fly-out, 5 genres and Install Steam button
+        "actions": 7,
+        # scroll to Install Steam button
+        "execute_script": 1,
+    }
+    assert driver.get_num_calls() == 18
+
+
+def test_sort_search_results_in_simulated_time():
+    """Each of the sort options is hovered over and paused on."""
+    driver = nb.FakeDriver(num_children=4)
+
+    with nc.simulated_clock() as clock:
+        sh.sort_search_results(driver)
+
+    assert clock.num_sleeps == 1 + 4
+    assert clock.total_sleep == pytest.approx(2.1 + 4 * 2.9)
+    assert driver.calls == {
+        "find_element": 2,
+        "click": 1,
+        "find_elements": 1,
+        "text": 4,
+        "actions": 4,
+    }
+
+
+def test_real_clock_is_restored():
+    """Navigation helpers use the real clock outside simulated_clock."""
+    with nc.simulated_clock():
+        assert isinstance(nc.clock, nc.SimulatedClock)
+
+    assert isinstance(nc.clock, nc.RealClock)
+
+
+def test_benchmark_reports_each_flow():
+    """Benchmark reports delay, calls and round-trips of every flow."""
+    report = nb.run_navigation_benchmark(runs=2, round_trip_ms=10)
+
+    assert list(report) == list(nb.NAVIGATION_FLOWS)
+    summary = report["sort_search_results"]
+    assert summary["simulated_delay_sec"] == pytest.approx(2.1 + 30 * 2.9)
+    assert summary["round_trips_ms"] == summary["num_driver_calls"] * 10
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the notebook DAG runner."""
+
+
+# pylint: disable=invalid-name
+
+
+import os
+
+import pytest
+
+pytest.importorskip("papermill")
+
+import papermill_runner as pr  # noqa: E402
+
+
+def write_cached_dag(dag, root_dir, output_dir):
+    """Create notebooks and outputs of dag, and cache their hashes."""
+    for notebook, nb_spec in dag.items():
+        with open(os.path.join(root_dir, notebook), "w") as f:
+            f.write(f'{{"cells": [], "name": "{notebook}"}}')
+        for nb_output in nb_spec["outputs"]:
+            with open(os.path.join(root_dir, nb_output), "w") as f:
+                f.write("x\n1\n")
+    pr.save_run_cache(
+        {
+            notebook: pr.get_notebook_hash(notebook, nb_spec, root_dir)
+            for notebook, nb_spec in dag.items()
+        },
+        os.path.join(output_dir, ".papermill_cache.json"),
+    )
+
+
+def test_cached_upstream_listed_after_dependent_is_skipped(tmp_path):
+    """Dependent listed before its (cached) upstream is not a cycle."""
+    dag = {
+        "b.ipynb": dict(parameters={}, inputs=["x.csv"], outputs=[]),
+        "a.ipynb": dict(parameters={}, inputs=[], outputs=["x.csv"]),
+    }
+    output_dir = tmp_path / "executed_notebooks"
+    output_dir.mkdir()
+    write_cached_dag(dag, str(tmp_path), str(output_dir))
+
+    status = pr.run_notebook_dag(
+        dag, str(output_dir), root_dir=str(tmp_path), max_workers=1
+    )
+
+    assert status == {"a.ipynb": "skipped", "b.ipynb": "skipped"}
+
+
+def test_circular_dependency_is_detected(tmp_path):
+    """Notebooks that depend on each other raise an error."""
+    dag = {
+        "a.ipynb": dict(parameters={}, inputs=["y.csv"], outputs=["x.csv"]),
+        "b.ipynb": dict(parameters={}, inputs=["x.csv"], outputs=["y.csv"]),
+    }
+    output_dir = tmp_path / "executed_notebooks"
+    output_dir.mkdir()
+    write_cached_dag(dag, str(tmp_path), str(output_dir))
+
+    with pytest.raises(ValueError, match="circular dependency"):
+        pr.run_notebook_dag(
+            dag, str(output_dir), root_dir=str(tmp_path), max_workers=1
+        )
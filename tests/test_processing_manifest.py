@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the manifest of processed raw files."""
+
+
+# pylint: disable=invalid-name
+
+
+import os
+
+import pandas as pd
+import pytest
+
+import src.processing_manifest as pm
+
+
+def process_listings(filepaths):
+    """Read raw CSV files, naming the file each row came from."""
+    return pd.concat(
+        [
+            pd.read_csv(f).assign(**{pm.SOURCE_FILE_COL: os.path.basename(f)})
+            for f in filepaths
+        ],
+        ignore_index=True,
+    )
+
+
+def process_listings_with_paths(filepaths):
+    """Read raw CSV files, naming the path of the file each row came from."""
+    return pd.concat(
+        [pd.read_csv(f).assign(**{pm.SOURCE_FILE_COL: f}) for f in filepaths],
+        ignore_index=True,
+    )
+
+
+def write_csv(filepath, contents, mtime_ns=None):
+    """Write raw CSV file, optionally setting its modification time."""
+    with open(filepath, "w") as f:
+        f.write(contents)
+    if mtime_ns is not None:
+        os.utime(filepath, ns=(mtime_ns, mtime_ns))
+
+
+def test_touched_file_is_recorded_and_not_reprocessed(tmp_path):
+    """File with new modification time but same contents is not hashed."""
+    filepath = str(tmp_path / "p1_l0.csv")
+    store_dir = str(tmp_path / "store")
+    write_csv(filepath, "Title\nA\n", mtime_ns=1_000_000_000)
+    assert pm.update_processed_store([filepath], process_listings, store_dir)
+
+    write_csv(filepath, "Title\nA\n", mtime_ns=2_000_000_000)
+    assert (
+        pm.update_processed_store([filepath], process_listings, store_dir)
+        is None
+    )
+
+    manifest = pm.load_manifest(os.path.join(store_dir, "manifest.json"))
+    assert manifest[os.path.abspath(filepath)]["mtime_ns"] == 2_000_000_000
+    assert pm.get_new_or_changed_files([filepath], manifest) == [[], [], []]
+
+
+def test_changed_file_replaces_its_rows(tmp_path):
+    """Rows of a changed file are replaced by those of its new contents."""
+    filepaths = [str(tmp_path / f"p1_l{k}.csv") for k in range(2)]
+    store_dir = str(tmp_path / "store")
+    write_csv(filepaths[0], "Title\nA\n", mtime_ns=1_000_000_000)
+    write_csv(filepaths[1], "Title\nB\n", mtime_ns=1_000_000_000)
+    pm.update_processed_store(filepaths, process_listings, store_dir)
+
+    write_csv(filepaths[0], "Title\nC\n", mtime_ns=2_000_000_000)
+    pm.update_processed_store(filepaths, process_listings, store_dir)
+
+    df = pm.load_processed_store(store_dir)
+    assert sorted(df["Title"]) == ["B", "C"]
+
+
+def test_empty_store_is_loaded_as_empty_dataframe(tmp_path):
+    """Loading a store without parts gives an empty DataFrame."""
+    df = pm.load_processed_store(str(tmp_path), columns=["Title"])
+
+    assert df.empty
+    assert list(df) == ["Title"]
+
+
+def test_changed_file_is_matched_by_path(tmp_path):
+    """Rows of a file with the same name in another directory are kept."""
+    filepaths = []
+    for subdir, title in [["a", "A"], ["b", "B"]]:
+        os.makedirs(tmp_path / subdir)
+        filepaths.append(str(tmp_path / subdir / "p1_l0.csv"))
+        write_csv(filepaths[-1], f"Title\n{title}\n", mtime_ns=1_000_000_000)
+    store_dir = str(tmp_path / "store")
+    pm.update_processed_store(
+        filepaths, process_listings_with_paths, store_dir
+    )
+
+    write_csv(filepaths[0], "Title\nC\n", mtime_ns=2_000_000_000)
+    pm.update_processed_store(
+        filepaths, process_listings_with_paths, store_dir
+    )
+
+    df = pm.load_processed_store(store_dir)
+    assert sorted(df["Title"]) == ["B", "C"]
+    assert set(df[pm.SOURCE_FILE_COL]) == {
+        os.path.abspath(f) for f in filepaths
+    }
+
+
+def test_same_file_names_must_be_paths(tmp_path):
+    """File names shared by files processed together are ambiguous."""
+    filepaths = []
+    for subdir in ["a", "b"]:
+        os.makedirs(tmp_path / subdir)
+        filepaths.append(str(tmp_path / subdir / "p1_l0.csv"))
+        write_csv(filepaths[-1], "Title\nA\n")
+
+    with pytest.raises(ValueError, match="unique file names"):
+        pm.update_processed_store(
+            filepaths, process_listings, str(tmp_path / "store")
+        )
+
+
+def test_rows_of_deleted_file_are_removed(tmp_path):
+    """Rows of raw files that no longer exist are removed from the store."""
+    filepaths = [str(tmp_path / f"p1_l{k}.csv") for k in range(2)]
+    store_dir = str(tmp_path / "store")
+    write_csv(filepaths[0], "Title\nA\n")
+    write_csv(filepaths[1], "Title\nB\n")
+    pm.update_processed_store(filepaths, process_listings, store_dir)
+
+    os.remove(filepaths[0])
+    assert (
+        pm.update_processed_store(filepaths[1:], process_listings, store_dir)
+        is None
+    )
+
+    assert pm.load_processed_store(store_dir)["Title"].tolist() == ["B"]
+    manifest = pm.load_manifest(os.path.join(store_dir, "manifest.json"))
+    assert list(manifest) == [os.path.abspath(filepaths[1])]
+
+
+def test_rows_of_interrupted_run_are_deduplicated(tmp_path):
+    """Rows written again after a run was interrupted are loaded once."""
+    filepaths = [str(tmp_path / f"p1_l{k}.csv") for k in range(3)]
+    store_dir = str(tmp_path / "store")
+    for filepath, title in zip(filepaths, "ABC"):
+        write_csv(filepath, f"Title\n{title}\n")
+    pm.update_processed_store(filepaths[:2], process_listings, store_dir)
+    # Run interrupted before saving its manifest, so files are processed again
+    os.remove(os.path.join(store_dir, "manifest.json"))
+    pm.update_processed_store(filepaths, process_listings, store_dir)
+    dedup_subset = [pm.SOURCE_FILE_COL]
+
+    assert len(pm.load_processed_store(store_dir)) == 5
+    df = pm.load_processed_store(store_dir, dedup_subset=dedup_subset)
+    batches = list(
+        pm.iter_processed_store(
+            store_dir, ["Title"], dedup_subset=dedup_subset, batch_size=2
+        )
+    )
+
+    assert sorted(df["Title"]) == ["A", "B", "C"]
+    assert [list(df_batch) for df_batch in batches] == [["Title"]] * 3
+    assert pd.concat(batches)["Title"].tolist() == ["A", "B", "C"]
+
+
+def test_empty_store_is_iterated_without_batches(tmp_path):
+    """Iterating over a store without parts yields nothing."""
+    assert (
+        list(pm.iter_processed_store(str(tmp_path), dedup_subset=["A"])) == []
+    )
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the upload of new or changed files to S3 (with moto)."""
+
+
+# pylint: disable=invalid-name,redefined-outer-name
+
+
+import os
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+import src.s3_upload as su  # noqa: E402
+
+BUCKET_NAME = "raw-data"
+
+# Smallest multipart settings accepted by S3, to upload a file in 2 parts
+TRANSFER_CONFIG_KWARGS = dict(
+    multipart_threshold=5 * su.MB, multipart_chunksize=5 * su.MB
+)
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    """S3 client of mocked AWS account, with an empty bucket."""
+    for name in ["AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"]:
+        monkeypatch.setenv(name, "testing")
+    with moto.mock_aws():
+        client = su.get_s3_client("us-east-1", max_workers=2)
+        client.create_bucket(Bucket=BUCKET_NAME)
+        yield client
+
+
+def write_file(filepath, contents):
+    """Write bytes to file, creating its directory."""
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, "wb") as f:
+        f.write(contents)
+
+
+def sync(data_dir, s3_client, compare="etag"):
+    """Sync directory to bucket, with multipart uploads of large files."""
+    return su.sync_dir_to_s3(
+        data_dir,
+        BUCKET_NAME,
+        s3_client=s3_client,
+        prefix="raw/",
+        search_str="**/*",
+        max_workers=2,
+        transfer_config=su.get_transfer_config(**TRANSFER_CONFIG_KWARGS),
+        compare=compare,
+    )
+
+
+def test_unchanged_files_are_skipped(tmp_path, s3_client):
+    """Files already in bucket (including multipart uploads) are skipped."""
+    data_dir = str(tmp_path)
+    write_file(os.path.join(data_dir, "p1_l0.csv"), b"Title\nA\n")
+    write_file(
+        os.path.join(data_dir, "requests", "listings.parquet"),
+        os.urandom(6 * su.MB),
+    )
+
+    status = sync(data_dir, s3_client)
+    assert len(status["uploaded"]) == 2
+
+    status = sync(data_dir, s3_client)
+    assert status["uploaded"] == []
+    assert len(status["skipped"]) == 2
+    remote_objects = su.list_remote_objects(s3_client, BUCKET_NAME, "raw/")
+    assert sorted(remote_objects) == [
+        "raw/p1_l0.csv",
+        "raw/requests/listings.parquet",
+    ]
+    # Large file was uploaded in two parts
+    assert remote_objects["raw/requests/listings.parquet"]["etag"].endswith(
+        "-2"
+    )
+
+
+def test_changed_and_new_files_are_uploaded(tmp_path, s3_client):
+    """Files whose contents changed (same size) and new files are uploaded."""
+    data_dir = str(tmp_path)
+    changed_filepath = os.path.join(data_dir, "p1_l0.csv")
+    unchanged_filepath = os.path.join(data_dir, "p1_l1.csv")
+    write_file(changed_filepath, b"Title\nA\n")
+    write_file(unchanged_filepath, b"Title\nB\n")
+    sync(data_dir, s3_client)
+
+    write_file(changed_filepath, b"Title\nC\n")
+    new_filepath = os.path.join(data_dir, "p1_l2.csv")
+    write_file(new_filepath, b"Title\nD\n")
+    status = sync(data_dir, s3_client)
+
+    assert status["uploaded"] == [changed_filepath, new_filepath]
+    assert status["skipped"] == [unchanged_filepath]
+    obj = s3_client.get_object(Bucket=BUCKET_NAME, Key="raw/p1_l0.csv")
+    assert obj["Body"].read() == b"Title\nC\n"
+
+
+def test_same_size_changes_are_skipped_when_comparing_size(
+    tmp_path, s3_client
+):
+    """Comparing sizes only does not detect changes of the same size."""
+    data_dir = str(tmp_path)
+    filepath = os.path.join(data_dir, "p1_l0.csv")
+    write_file(filepath, b"Title\nA\n")
+    sync(data_dir, s3_client, compare="size")
+
+    write_file(filepath, b"Title\nC\n")
+    status = sync(data_dir, s3_client, compare="size")
+
+    assert status["skipped"] == [filepath]
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the cached retrieval of StatCounter market-share series."""
+
+
+# pylint: disable=invalid-name,redefined-outer-name
+
+
+import json
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+import requests
+
+import src.statcounter_source as scs
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+URL = "https://gs.statcounter.com/chart.php?region=Worldwide&csv=1"
+
+
+def read_fixture(filename):
+    """Read contents of fixture file."""
+    with open(os.path.join(FIXTURES_DIR, filename), "rb") as f:
+        return f.read()
+
+
+class FakeSession:
+    """Session returning queued responses and recording request headers."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append({"url": url, "headers": headers or {}})
+        return self.responses.pop(0)
+
+
+def get_response(status_code=200, content=b"", headers=None):
+    """Create response of fake session."""
+
+    def raise_for_status():
+        if status_code >= 400:
+            raise requests.HTTPError(f"{status_code} Error")
+
+    return SimpleNamespace(
+        status_code=status_code,
+        content=content,
+        headers=headers or {},
+        raise_for_status=raise_for_status,
+    )
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Fake session used by fetch_series (responses are set by tests)."""
+    fake_session = FakeSession([])
+    monkeypatch.setattr(scs, "get_session", lambda: fake_session)
+    return fake_session
+
+
+def expire_cache(cache_filepath, age):
+    """Make cached series older, by changing its time of download."""
+    with open(f"{cache_filepath}.json") as f:
+        metadata = json.load(f)
+    metadata["fetched_at"] -= age
+    with open(f"{cache_filepath}.json", "w") as f:
+        json.dump(metadata, f)
+
+
+def test_cached_series_is_used_without_request(session, tmp_path):
+    """Series downloaded once is read from cache until its TTL expires."""
+    contents = read_fixture("pc_marketshare_worldwide.csv")
+    session.responses = [get_response(content=contents)]
+    cache_filepath = str(tmp_path / "worldwide.csv")
+
+    assert scs.fetch_series(URL, cache_filepath, ttl=60) == [
+        contents,
+        "downloaded",
+    ]
+    assert scs.fetch_series(URL, cache_filepath, ttl=60) == [
+        contents,
+        "cached",
+    ]
+    assert len(session.requests) == 1
+
+
+def test_expired_series_is_revalidated(session, tmp_path):
+    """Expired series is revalidated with its validators (304 response)."""
+    contents = read_fixture("pc_marketshare_worldwide.csv")
+    validators = {
+        "ETag": '"abc"',
+        "Last-Modified": "Wed, 01 Sep 2021 00:00:00 GMT",
+    }
+    session.responses = [
+        get_response(content=contents, headers=validators),
+        get_response(status_code=304),
+    ]
+    cache_filepath = str(tmp_path / "worldwide.csv")
+    scs.fetch_series(URL, cache_filepath, ttl=60)
+    expire_cache(cache_filepath, 120)
+
+    assert scs.fetch_series(URL, cache_filepath, ttl=60) == [
+        contents,
+        "revalidated",
+    ]
+    assert session.requests[1]["headers"] == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Wed, 01 Sep 2021 00:00:00 GMT",
+    }
+    # Revalidation renews the TTL and keeps the validators
+    assert scs.fetch_series(URL, cache_filepath, ttl=60)[1] == "cached"
+    assert scs.load_cache_metadata(cache_filepath)["etag"] == '"abc"'
+
+
+def test_expired_series_is_replaced_when_changed(session, tmp_path):
+    """Expired series is downloaded again if the server sends new data."""
+    session.responses = [
+        get_response(content=read_fixture("pc_marketshare_worldwide.csv")),
+        get_response(content=read_fixture("pc_marketshare_japan.csv")),
+    ]
+    cache_filepath = str(tmp_path / "worldwide.csv")
+    scs.fetch_series(URL, cache_filepath, ttl=60)
+    expire_cache(cache_filepath, 120)
+
+    contents, status = scs.fetch_series(URL, cache_filepath, ttl=60)
+
+    assert status == "downloaded"
+    assert contents == read_fixture("pc_marketshare_japan.csv")
+    with open(cache_filepath, "rb") as f:
+        assert f.read() == contents
+
+
+def test_stale_series_is_used_when_revalidation_fails(session, tmp_path):
+    """Cached series is returned if it cannot be revalidated."""
+    contents = read_fixture("pc_marketshare_worldwide.csv")
+    session.responses = [
+        get_response(content=contents),
+        get_response(content=b"<html>Too many requests</html>"),
+        get_response(status_code=503),
+    ]
+    cache_filepath = str(tmp_path / "worldwide.csv")
+    scs.fetch_series(URL, cache_filepath, ttl=60)
+    expire_cache(cache_filepath, 120)
+
+    assert scs.fetch_series(URL, cache_filepath, ttl=60) == [contents, "stale"]
+    assert scs.fetch_series(URL, cache_filepath, ttl=60) == [contents, "stale"]
+
+
+def test_failed_download_without_cache_raises(session, tmp_path):
+    """Responses that are not CSV files are not cached."""
+    session.responses = [get_response(content=b"<html></html>")]
+    cache_filepath = str(tmp_path / "worldwide.csv")
+
+    with pytest.raises(ValueError, match="not a market-share CSV"):
+        scs.fetch_series(URL, cache_filepath, ttl=60)
+    assert not os.path.exists(cache_filepath)
+
+
+def test_read_marketshare_csv_combines_os_columns():
+    """Chrome OS is combined with Linux and other columns are dropped."""
+    df = scs.read_marketshare_csv(
+        os.path.join(FIXTURES_DIR, "pc_marketshare_worldwide.csv"),
+        "worldwide",
+    )
+
+    assert list(df) == ["region", "date", "os", "marketshare"]
+    assert sorted(df["os"].unique()) == [
+        "Linux",
+        "MacOS",
+        "Unknown",
+        "Windows",
+    ]
+    df_linux = df[df["os"] == "Linux"]
+    assert df_linux["date"].tolist() == [
+        pd.Timestamp("2021-08-01"),
+        pd.Timestamp("2021-09-01"),
+    ]
+    assert df_linux["marketshare"].round(1).tolist() == [4.0, 4.1]
+
+
+def test_get_marketshare_of_many_regions(session, tmp_path):
+    """Series of regions are combined, and failed regions are skipped."""
+    session.responses = [
+        get_response(content=read_fixture("pc_marketshare_worldwide.csv")),
+        get_response(content=read_fixture("pc_marketshare_japan.csv")),
+        get_response(status_code=404),
+    ]
+
+    df = scs.get_marketshare(
+        ["worldwide", "japan", "atlantis"], str(tmp_path), max_workers=1
+    )
+
+    assert df["region"].unique().tolist() == ["japan", "worldwide"]
+    assert len(df) == 2 * 2 * 4
+    df_wide = scs.get_wide_marketshare(df)
+    assert list(df_wide) == [
+        "region",
+        "Date",
+        "Windows",
+        "MacOS",
+        "Linux",
+        "Unknown",
+    ]
+    assert df_wide["Windows"].tolist() == [88.1, 87.5, 75.2, 74.8]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+"""Tests of the bucketed merge of search results and listings."""
+
+
+# pylint: disable=invalid-name
+
+
+import os
+
+import pandas as pd
+
+import src.bulk_listings_reader as blr
+import src.failure_records as fr
+import src.processing_manifest as pm
+import src.streaming_merge as sm
+
+STORE_URL = "https://store.steampowered.com"
+
+
+def write_search_results(filepath, app_ids):
+    """Write page of search results, with a price for each app."""
+    pd.DataFrame(
+        {
+            "page": [1] * len(app_ids),
+            "listing_counter": range(len(app_ids)),
+            "title": [f"Game {app_id}" for app_id in app_ids],
+            "url": [f"{STORE_URL}/app/{app_id}/" for app_id in app_ids],
+            "original_price": [f"${app_id}.99" for app_id in app_ids],
+        }
+    ).to_parquet(filepath, index=False)
+
+
+def write_listings(data_dir, app_ids):
+    """Write a listing CSV file for each app, and get their paths."""
+    filepaths = []
+    for listing_num, app_id in enumerate(app_ids):
+        filepath = os.path.join(data_dir, f"p1_l{listing_num}_{app_id}.csv")
+        listing = dict(
+            fr.dict_failed_extraction_from_listing_page(),
+            Title=f"Game {app_id}",
+            page_num=1,
+            listing_num=listing_num,
+            url=f"{STORE_URL}/app/{app_id}/",
+        )
+        pd.DataFrame([listing]).to_csv(filepath, index=False)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def merge(search_results_filepaths, listings, tmp_path, **kwargs):
+    """Merge search results with listings, and read merged rows."""
+    output_filepath = str(tmp_path / "merged.parquet")
+    sm.streaming_merge_search_results_listings(
+        search_results_filepaths,
+        listings,
+        output_filepath,
+        str(tmp_path / "buckets"),
+        num_buckets=4,
+        max_rows_in_memory=2,
+        merge_kwargs=dict(on=["app_id", "url"]),
+        **kwargs,
+    )
+    return (
+        pd.read_parquet(output_filepath)
+        .sort_values(by="app_id")
+        .reset_index(drop=True)
+    )
+
+
+def test_merge_listings_from_processed_store(tmp_path):
+    """Listings read from store parts are merged once, as from CSV files."""
+    search_results_filepath = str(tmp_path / "search_results.parquet")
+    write_search_results(search_results_filepath, [10, 20, 30])
+    raw_data_dir = str(tmp_path / "raw")
+    os.makedirs(raw_data_dir)
+    filepaths = write_listings(raw_data_dir, [10, 20, 30])
+    store_dir = str(tmp_path / "store")
+    pm.update_processed_store(
+        filepaths[:2], blr.read_listings_csvs_to_df, store_dir
+    )
+    # Run interrupted before saving its manifest, so files are processed again
+    os.remove(os.path.join(store_dir, "manifest.json"))
+    pm.update_processed_store(
+        filepaths, blr.read_listings_csvs_to_df, store_dir
+    )
+
+    dfm = merge(
+        [search_results_filepath],
+        store_dir,
+        tmp_path,
+        listings_dedup_subset=[pm.SOURCE_FILE_COL],
+    )
+    dfm_csv = merge([search_results_filepath], filepaths, tmp_path)
+
+    assert dfm["app_id"].tolist() == ["10", "20", "30"]
+    assert dfm["original_price"].tolist() == ["$10.99", "$20.99", "$30.99"]
+    assert dfm["filename"].tolist() == [os.path.basename(f) for f in filepaths]
+    pd.testing.assert_frame_equal(dfm, dfm_csv)